@@ -16,17 +16,34 @@ import pandas as pd
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_auth
 
 
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 
-from construct_figures import mp_grid_plot, prc_plot
+from construct_figures import mp_grid_plot, prc_plot, nib_map_plot, episode_plot, hrv_plot, attractor_plot, comparison_plot, message_plot
 import mod_para_funs as mp
+import nib_map as nm
+import pattern_funs as pf
+import hrv_funs as hf
+import attractor_funs as af
+from result_store import SessionStore
+import export_funs as ef
+from prefetch import Prefetcher, neighbour_params
+from sim_pool import SimPool
+from disk_store import DiskStore
 
 import os
+import uuid
+import tempfile
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import flask
 
 
 
@@ -60,7 +77,60 @@ server = app.server
 
 # Simulation values
 tmax = 1000
-tburn = 100
+tburn = 'auto' # burn in ends once the NIB statistics settle (see run_mod_para)
+tburn_max = 300 # maximum burn in
+sim_kwargs = {'tmax':tmax, 'tburn':tburn, 'tburn_max':tburn_max}
+
+# Warm start (continue from the final state of nearby parameters)
+warm_dist = 0.1 # maximum distance in (ts,te,theta) to warm start from
+max_states = 1000 # maximum number of final states kept
+dic_states = {} # final states of previous simulations
+
+# Results of simulations for each session, so views derived from them
+# (e.g. zooming the time series) don't re-simulate
+store = SessionStore(max_bytes=500e6, # memory budget of all sessions
+                     max_session_bytes=50e6, # memory budget of each session
+                     max_idle=1800) # results unused for this long are dropped (s)
+
+# HRV over sliding windows (see hrv_funs.py)
+hrv_window = 120 # length of windows (s)
+hrv_step = 20 # time between windows (s)
+
+# Search for coexisting rhythms from a grid of initial states (see attractor_funs.py)
+attractor_kwargs = {'n_phase':32, # number of initial phases of the ectopic focus
+                    'n_ratio':4, # number of initial values of te_mod/te
+                    'tmax':200, # time over which beats are counted
+                    'min_events':50, # minimum number of NIB values counted (runs carry on beyond tmax until reached)
+                    'tburn':200} # burn in
+
+# Comparison of configurations side by side (simulated together in a process pool)
+compare_max = 6 # maximum number of configurations
+compare_default = 'pure\na\nd' # default configurations (PRCs at the slider values)
+
+# Results on disk, shared by server processes and kept across restarts
+# (see disk_store.py). Only simulations without a warm start are written, so
+# stored results don't depend on the order in which parameters were visited.
+use_disk_store = True
+disk_store_bytes = 2e9 # maximum size of the store on disk
+
+# Serving mode: in 'production', simulations run in a process pool (see sim_pool.py)
+# so that request threads are not blocked
+serve_mode = os.environ.get('MP_SERVE_MODE', 'dev')
+sim_workers = None # number of simulation processes (number of cores if None)
+
+# Progressive refinement: while the full simulation runs in the background,
+# show a preview (stored results of nearby parameters, or a short simulation)
+progressive = True
+tmax_preview = 100 # length of preview simulation
+tburn_max_preview = 50 # maximum burn in of preview simulation
+preview_dist = 0.05 # maximum distance in (ts,te,theta) of stored results used as preview
+refine_workers = 2 # number of threads waiting for full simulations (run in a process pool)
+refine_interval = 100 # time between checks for the full simulation (ms)
+text_full = 'Full simulation ({} s)'.format(tmax)
+
+# Prefetch of likely next parameters (see prefetch.py)
+prefetch_workers = 1 # number of low priority worker processes (0 to turn off)
+prefetch_budget = 0.5 # average number of cores used by prefetching
 
 # Default physiological values
 ts = 1
@@ -71,7 +141,8 @@ prc_tag = 'pure'
 
 # Run simulation
 df_beats = mp.run_mod_para(ts=ts, te=te, theta=theta, prc_tag=prc_tag,
-               tmax=tmax, tburn=tburn)
+               tmax=tmax, tburn=tburn, tburn_max=tburn_max)
+dic_states[(prc_tag,ts,te,theta)] = df_beats.attrs['state']
 
 # Compute NIB values
 df_nib = mp.compute_nib(df_beats)
@@ -115,16 +186,21 @@ size_title = '30px'
 # Parameter bounds
 theta_min = 0.1
 theta_max = 0.6
-theta_marks = {x:str(round(x,2)) for x in np.arange(theta_min,theta_max+0.01,0.2)}
+theta_marks = {float(x):str(round(x,2)) for x in np.arange(theta_min,theta_max+0.01,0.2)}
 
 te_min = 1
 te_max = 4
-te_marks = {x:str(round(x,2)) for x in np.arange(te_min,te_max+0.01,0.5)}
+te_marks = {float(x):str(round(x,2)) for x in np.arange(te_min,te_max+0.01,0.5)}
 
 
 ts_min = 0.4
 ts_max = 1.2
-ts_marks = {x:str(round(x,2)) for x in np.arange(ts_min,ts_max+0.01,0.2)}
+ts_marks = {float(x):str(round(x,2)) for x in np.arange(ts_min,ts_max+0.01,0.2)}
+
+
+# Export formats (Parquet only if pyarrow is installed)
+export_opts = [{'label':x, 'value':x} for x in ef.dic_formats
+               if x!='parquet' or ef.parquet_available]
 
 
 # Description md file
@@ -203,6 +279,27 @@ app.layout = html.Div([
                    marks=theta_marks,
                    value=theta
         ),        
+        
+        # Option to warm start from previous parameter values
+        dcc.Checklist(id='warm_start_check',
+                      options=[{'label':'Warm start from previous parameters',
+                                'value':'warm'}],
+                      value=[],
+                      style={'fontSize':size_slider_text}),
+        
+        # Option to search for rhythms reached from other initial conditions
+        dcc.Checklist(id='attractor_check',
+                      options=[{'label':'Search for coexisting rhythms',
+                                'value':'attractors'}],
+                      value=[],
+                      style={'fontSize':size_slider_text}),
+        
+        # Option to compare several configurations side by side
+        dcc.Checklist(id='compare_check',
+                      options=[{'label':'Compare configurations',
+                                'value':'compare'}],
+                      value=[],
+                      style={'fontSize':size_slider_text}),
 
         ],
         
@@ -236,9 +333,105 @@ app.layout = html.Div([
             
     # Grid plot     
     html.Div(
-        [dcc.Graph(id='grid_plot',figure = fig_grid)],
+        [html.Label(text_full,
+                    id='status_text',
+                    style={'fontSize':size_slider_text,
+                           'textAlign':'right',
+                           'padding-right':'5%'}),
+         html.Label('Burn in: {:.0f} s'.format(df_beats.attrs['tburn']),
+                    id='burn_text',
+                    style={'fontSize':size_slider_text,
+                           'textAlign':'right',
+                           'padding-right':'5%'}),
+         dcc.Graph(id='grid_plot',figure = fig_grid)],
+        style={'padding-bottom':'20px'}
+
+    ),
+    
+    # Download data behind the grid plot
+    html.Div(
+        [html.Label('Download data as',
+                    style={'fontSize':size_slider_text,
+                           'display':'inline-block'}),
+         dcc.Dropdown(id='export_format',
+                      options=export_opts,
+                      value='csv.gz',
+                      searchable=False,
+                      clearable=False,
+                      style={'width':'120px',
+                             'display':'inline-block',
+                             'vertical-align':'middle',
+                             'margin-left':'10px',
+                             'margin-right':'10px'}),
+         html.A('Beats', id='download_beats', href='', target='_blank',
+                style={'fontSize':size_slider_text, 'margin-right':'10px'}),
+         html.A('Intervals', id='download_rr', href='', target='_blank',
+                style={'fontSize':size_slider_text, 'margin-right':'10px'}),
+         html.A('NIB', id='download_nib', href='', target='_blank',
+                style={'fontSize':size_slider_text}),
+         ],
+        style={'padding-left':'5%',
+               'padding-bottom':'20px'}
+    ),
+    
+    # Table of rhythm pattern episodes (bigeminy, trigeminy, NIB motifs, ectopic runs)
+    html.Div(
+        [dcc.Graph(id='episode_plot',
+                   config={'displayModeBar': False})],
+        style={'width':'80%',
+               'padding-left':'10%',
+               'padding-bottom':'20px'}
+    ),
+    
+    # Coexisting rhythms (attractors) and their basins (shown when attractor_check is ticked)
+    html.Div(
+        [dcc.Graph(id='attractor_plot',
+                   config={'displayModeBar': False})],
+        id='attractor_div',
+        style={'display':'none'}
+    ),
+    
+    # Configurations side by side (shown when compare_check is ticked)
+    html.Div(
+        [html.Div(
+            [html.Label('Configurations, one per line: PRC, ts, te, theta '
+                        '(values not given follow the sliders)',
+                        style={'fontSize':size_slider_text}),
+             dcc.Textarea(id='compare_text',
+                          value=compare_default,
+                          style={'width':'40%', 'height':'110px'}),
+             html.Button('Add current parameters', id='compare_add', n_clicks=0,
+                         style={'margin-left':'10px', 'vertical-align':'top'}),
+             html.Button('Compare', id='compare_run', n_clicks=0,
+                         style={'margin-left':'10px', 'vertical-align':'top'}),
+             ],
+            style={'padding-left':'5%'}),
+         dcc.Graph(id='compare_plot')],
+        id='compare_div',
+        style={'display':'none'}
+    ),
+    
+    # HRV measures over sliding windows
+    html.Div(
+        [dcc.Graph(id='hrv_plot')],
         style={'padding-bottom':'20px'}
+    ),
+    
+    # Session id and key of current results in the server-side store
+    dcc.Store(id='session_id', storage_type='session'),
+    dcc.Store(id='result_key'),
+    
+    # Checks for the full simulation while a preview is shown
+    dcc.Interval(id='refine_interval', interval=refine_interval, disabled=True),
 
+    
+    # Map of dominant NIB pattern for the selected PRC
+    html.Div(
+        [dcc.Graph(id='nib_map_plot',
+                   config={'displayModeBar': False})],
+        style={'width':'60%',
+               'padding-left':'20%',
+               'padding-bottom':'20px'}
     ),
 
     
@@ -318,23 +511,509 @@ def update_fig_prc(prc):
 
    
 # Update grid plot            
-@app.callback(Output('grid_plot','figure'),
+def time_window(relayout, t_end):
+    '''
+    Time window of the interval time series after a zoom or pan.
+    Input:
+        relayout: relayoutData of the grid plot
+        t_end: time of the last interval
+    Output:
+        (t0,t1), or None if the time axis was not changed
+    '''
+    if relayout is None:
+        return None
+    if 'xaxis.range[0]' in relayout and 'xaxis.range[1]' in relayout:
+        return (float(relayout['xaxis.range[0]']), float(relayout['xaxis.range[1]']))
+    if 'xaxis.range' in relayout:
+        return tuple(float(x) for x in relayout['xaxis.range'])
+    if relayout.get('xaxis.autorange'):
+        return (0, t_end)
+    return None
+
+
+def simulate(prc, ts, te, theta, warm_start, pool=None):
+    '''
+    Simulate at new parameter values
+    Input:
+        pool: process pool to simulate in (sim_pool if None, and in this
+            thread if there is no pool)
+    Output:
+        df_beats, df_rr, df_nib
+    '''
+    if pool is None:
+        pool = sim_pool
+
+    # Results computed before (by any server process)
+    if disk_store is not None:
+        data = disk_store.get((prc,ts,te,theta), sim_kwargs)
+        if data is not None:
+            keep_state((prc,ts,te,theta), data[0])
+            return data
+    
+    # Continue from the final state of the closest previous parameters
+    # (pure parasystole is solved analytically so needs no burn in)
+    state0 = None
+    if 'warm' in warm_start and prc!='pure':
+        state0 = mp.nearest_state(dic_states, prc, ts, te, theta, max_dist=warm_dist)
+    
+    # Run simulation with new parameter values
+    if pool is not None:
+        df_beats, df_rr, df_nib = pool.simulate(prc, ts, te, theta, state0=state0)
+    else:
+        df_beats = mp.run_mod_para(ts=ts, te=te, theta=theta, prc_tag=prc,
+                   tmax=tmax, tburn=tburn, tburn_max=tburn_max,
+                   state0=state0)
+        # Compute NIB values
+        df_nib = mp.compute_nib(df_beats)
+        # Compute intervals data
+        df_rr = mp.compute_rr(df_beats)
+    
+    keep_state((prc,ts,te,theta), df_beats)
+    if disk_store is not None and state0 is None:
+        disk_store.put((prc,ts,te,theta), sim_kwargs, (df_beats, df_rr, df_nib))
+    
+    return df_beats, df_rr, df_nib
+
+
+def simulate_batch(list_params, warm_start):
+    '''
+    Simulate several parameter sets together in the process pool, so it
+    takes about as long as the slowest (results on disk are loaded instead)
+    Input:
+        list_params: list of (prc, ts, te, theta)
+    Output:
+        list of (df_beats, df_rr, df_nib)
+    '''
+    list_data = [None]*len(list_params)
+    if disk_store is not None:
+        list_data = [disk_store.get(params, sim_kwargs) for params in list_params]
+    
+    # Warm start states as in simulate
+    missing = [i for i in range(len(list_params)) if list_data[i] is None]
+    list_jobs = []
+    for i in missing:
+        state0 = None
+        if 'warm' in warm_start and list_params[i][0]!='pure':
+            state0 = mp.nearest_state(dic_states, *list_params[i], max_dist=warm_dist)
+        list_jobs.append(list_params[i] + (state0,))
+    
+    list_results = compare_pool.simulate_batch(list_jobs) if list_jobs else []
+    for i, job, data in zip(missing, list_jobs, list_results):
+        list_data[i] = data
+        if disk_store is not None and job[-1] is None:
+            disk_store.put(list_params[i], sim_kwargs, data)
+    
+    for params, data in zip(list_params, list_data):
+        keep_state(params, data[0])
+    
+    return list_data
+
+
+def keep_state(params, df_beats):
+    # Store final state (dropping the oldest if there are too many)
+    dic_states[params] = df_beats.attrs['state']
+    if len(dic_states) > max_states:
+        dic_states.pop(next(iter(dic_states)), None)
+
+
+# Store on disk
+disk_store = None
+if use_disk_store:
+    disk_store = DiskStore(root='result_cache', max_bytes=disk_store_bytes)
+
+
+# Background full simulations (latest parameters and running job of each
+# session, removed when the job is done)
+refiner = ThreadPoolExecutor(refine_workers)
+refine_lock = threading.Lock()
+dic_latest = {}
+dic_refine = {}
+
+
+# Process pool for simulations in production mode
+sim_pool = None
+if serve_mode=='production':
+    sim_pool = SimPool(sim_kwargs=sim_kwargs,
+                       n_workers=sim_workers)
+
+# Process pool for comparisons (the simulation pool in production mode;
+# processes only start on first use)
+compare_pool = sim_pool
+if compare_pool is None:
+    compare_pool = SimPool(sim_kwargs=sim_kwargs,
+                           n_workers=compare_max)
+
+# Full simulations of progressive refinement also run in a process pool (the
+# comparison pool in dev mode), so the threads waiting for them hold no GIL
+refine_pool = compare_pool
+
+
+# Simulate likely next parameters in the background
+prefetcher = Prefetcher(store,
+                        sim_kwargs=sim_kwargs,
+                        n_workers=prefetch_workers,
+                        cpu_budget=prefetch_budget,
+                        on_result=keep_state)
+
+
+def prefetch(session, prc, ts, te, theta, warm_start):
+    # Prefetch neighbouring slider values and other PRCs
+    if prefetch_workers > 0:
+        def state_fun(params):
+            if 'warm' in warm_start and params[0]!='pure':
+                return mp.nearest_state(dic_states, *params, max_dist=warm_dist)
+            return None
+        prefetcher.submit(session,
+                          neighbour_params(prc, ts, te, theta, prcTags,
+                                           bounds={'ts':(ts_min,ts_max),
+                                                   'te':(te_min,te_max),
+                                                   'theta':(theta_min,theta_max)}),
+                          state_fun=state_fun)
+
+
+def preview(session, prc, ts, te, theta, warm_start):
+    '''
+    Quick preview while the full simulation runs: stored results of the same
+    PRC within preview_dist, or else a short simulation
+    Output:
+        key of preview results in the store, status text
+    '''
+    list_params = [params for params in store.session_params(session)
+                   if len(params)==4 and params[0]==prc]
+    if len(list_params) > 0:
+        dist = np.sqrt(((np.array([x[1:] for x in list_params])-np.array([ts,te,theta]))**2).sum(axis=1))
+        i = np.argmin(dist)
+        key = store.find(session, list_params[i])
+        if dist[i] <= preview_dist and key is not None:
+            text = 'Preview from ts = {}, te = {}, theta = {}. Full simulation running...'.format(
+                *list_params[i][1:])
+            return key, text
+    
+    state0 = None
+    if 'warm' in warm_start:
+        state0 = mp.nearest_state(dic_states, prc, ts, te, theta, max_dist=warm_dist)
+    df_beats = mp.run_mod_para(ts=ts, te=te, theta=theta, prc_tag=prc,
+               tmax=tmax_preview, tburn=tburn, tburn_max=tburn_max_preview,
+               state0=state0)
+    key = store.put(session, (prc,ts,te,theta,'preview'),
+                    (df_beats, mp.compute_rr(df_beats), mp.compute_nib(df_beats)))
+    text = 'Preview from a {} s simulation. Full simulation running...'.format(tmax_preview)
+    
+    return key, text
+
+
+def refine(session, params, warm_start):
+    # Full simulation in the background (skipped if the session has moved on)
+    if dic_latest.get(session)!=params or store.find(session, params) is not None:
+        return
+    store.put(session, params, simulate(*params, warm_start, pool=refine_pool))
+
+
+def forget_refine(session, future):
+    # Remove the job of a session when done (unless replaced by a newer one)
+    with refine_lock:
+        if dic_refine.get(session) is future:
+            del dic_refine[session]
+            dic_latest.pop(session, None)
+
+
+@app.callback([Output('result_key','data'),
+               Output('session_id','data'),
+               Output('refine_interval','disabled'),
+               Output('status_text','children')],
               [Input('prc_drop_down','value'),
                Input('ts_slider','value'),
                Input('te_slider','value'),
-               Input('theta_slider','value')])
+               Input('theta_slider','value'),
+               Input('warm_start_check','value'),
+               Input('refine_interval','n_intervals')],
+              [State('session_id','data')])
+
+def run_simulation(prc, ts, te, theta, warm_start, n_intervals, session):
+    # New session
+    session_new = dash.no_update
+    if session is None:
+        session = session_new = uuid.uuid4().hex
+    params = (prc,ts,te,theta)
     
-def update_grid(prc, ts, te, theta):
-    # Run simulation with new parameter values
-    df_beats = mp.run_mod_para(ts=ts, te=te, theta=theta, prc_tag=prc,
-               tmax=tmax, tburn=tburn)
-    # Compute NIB values
-    df_nib = mp.compute_nib(df_beats)
-    # Compute intervals data
-    df_rr = mp.compute_rr(df_beats)
+    # Results already stored (simulated before, prefetched or just refined)
+    key = store.find(session, params)
+    if key is not None:
+        prefetch(session, *params, warm_start)
+        return key, session_new, True, text_full
+    
+    # Waiting for the full simulation
+    trigger = dash.callback_context.triggered[0]['prop_id']
+    if trigger=='refine_interval.n_intervals':
+        future = dic_refine.get(session)
+        if future is None or future.done():
+            # Background simulation failed or was skipped (or its results were evicted): simulate now
+            key = store.put(session, params, simulate(prc, ts, te, theta, warm_start))
+            return key, session_new, True, text_full
+        raise PreventUpdate
+    
+    # Simulate directly if fast (pure parasystole is solved analytically,
+    # and results on disk only need loading)
+    on_disk = disk_store is not None and disk_store.has(params, sim_kwargs)
+    if not progressive or prc=='pure' or on_disk:
+        key = store.put(session, params, simulate(prc, ts, te, theta, warm_start))
+        prefetch(session, *params, warm_start)
+        return key, session_new, True, text_full
+    
+    # Show a preview and run the full simulation in the background
+    key, text = preview(session, prc, ts, te, theta, warm_start)
+    with refine_lock:
+        dic_latest[session] = params
+        future = dic_refine[session] = refiner.submit(refine, session, params, warm_start)
+    future.add_done_callback(partial(forget_refine, session))
+    
+    return key, session_new, False, text
+
+
+
+@app.callback([Output('grid_plot','figure'),
+               Output('burn_text','children')],
+              [Input('result_key','data'),
+               Input('grid_plot','relayoutData')],
+              [State('session_id','data'),
+               State('prc_drop_down','value'),
+               State('ts_slider','value'),
+               State('te_slider','value'),
+               State('theta_slider','value'),
+               State('warm_start_check','value')])
+    
+def update_grid(key, relayout, session, prc, ts, te, theta, warm_start):
+    if key is None:
+        raise PreventUpdate
+    
+    # Results from the store (simulate again if they were evicted)
+    data = store.get(key)
+    if data is None:
+        data = simulate(prc, ts, te, theta, warm_start)
+        store.put(session, (prc,ts,te,theta), data, key=key)
+    df_beats, df_rr, df_nib = data
+    
+    # Zoom or pan of the time series only redraws the visible window
+    # (other relayout events, e.g. zooming the histograms, need no update)
+    trigger = dash.callback_context.triggered[0]['prop_id']
+    if trigger=='grid_plot.relayoutData':
+        t_range = time_window(relayout, df_rr['Time (s)'].max())
+        if t_range is None:
+            raise PreventUpdate
+    else:
+        t_range = (0, tmax_plot)
 
     # Updated figure
-    fig = mp_grid_plot(df_rr=df_rr, df_beats=df_beats,df_nib=df_nib, tmax_plot=tmax_plot)
+    fig = mp_grid_plot(df_rr=df_rr, df_beats=df_beats,df_nib=df_nib, tmax_plot=tmax_plot,
+                       t_range=t_range)
+    
+    # Report burn in used
+    text_burn = 'Burn in: {:.0f} s'.format(df_beats.attrs['tburn'])
+    
+    return fig, text_burn
+
+
+
+# Update download links
+@app.callback([Output('download_beats','href'),
+               Output('download_rr','href'),
+               Output('download_nib','href')],
+              [Input('result_key','data'),
+               Input('export_format','value')])
+
+def update_downloads(key, fmt):
+    if key is None:
+        raise PreventUpdate
+    return ['/download/{}/{}/{}'.format(key, table, fmt) for table in ['beats','rr','nib']]
+
+
+# Download data of stored results (not re-simulated)
+@server.route('/download/<key>/<table>/<fmt>')
+def download(key, table, fmt):
+    data = store.get(key)
+    if data is None:
+        return 'Results have expired. Change a parameter to simulate again.', 404
+    if (table not in ['beats','rr','nib']) or (fmt not in ef.dic_formats):
+        return 'Unknown table or format', 404
+    df = data[['beats','rr','nib'].index(table)]
+    filename = 'mod_para_{}.{}'.format(table, fmt)
+    
+    # Compressed CSV is streamed as it is made
+    if fmt=='csv.gz':
+        return flask.Response(ef.csv_gz_chunks(df, labels=ef.dic_labels[table]),
+                              mimetype=ef.dic_formats[fmt],
+                              headers={'Content-Disposition':'attachment; filename='+filename})
+    
+    # Other formats are written to a temporary file (deleted once sent)
+    if fmt=='parquet' and not ef.parquet_available:
+        return 'Parquet export requires pyarrow', 404
+    f = tempfile.TemporaryFile()
+    if fmt=='npz':
+        ef.write_npz(df, f, labels=ef.dic_labels[table])
+    else:
+        ef.write_parquet(df, f, labels=ef.dic_labels[table])
+    f.seek(0)
+    return flask.send_file(f, mimetype=ef.dic_formats[fmt],
+                           as_attachment=True, download_name=filename)
+
+
+
+# Update table of pattern episodes
+@app.callback(Output('episode_plot','figure'),
+              [Input('result_key','data')])
+
+def update_episodes(key):
+    data = None if key is None else store.get(key)
+    if data is None:
+        raise PreventUpdate
+    return episode_plot(pf.episode_table(data[0]))
+
+
+
+# Update attractors
+@app.callback([Output('attractor_plot','figure'),
+               Output('attractor_div','style')],
+              [Input('attractor_check','value'),
+               Input('prc_drop_down','value'),
+               Input('ts_slider','value'),
+               Input('te_slider','value'),
+               Input('theta_slider','value')],
+              [State('session_id','data')])
+
+def update_attractors(check, prc, ts, te, theta, session):
+    if 'attractors' not in check:
+        return dash.no_update, {'display':'none'}
+    
+    # Stored with the results of the session, as they are viewed again while
+    # dragging back (not before the session has an id)
+    params = (prc, ts, te, theta, 'attractors')
+    key = None if session is None else store.find(session, params)
+    data = None if key is None else store.get(key)
+    if data is None:
+        data = af.find_attractors(ts=ts, te=te, theta=theta, prc_tag=prc, **attractor_kwargs)
+        if session is not None:
+            store.put(session, params, data)
+    
+    return attractor_plot(*data), {'padding-bottom':'20px'}
+
+
+
+# Configurations of the comparison view
+def parse_configs(text, prc, ts, te, theta):
+    '''
+    Configurations from the lines of text, each a PRC followed by ts, te and
+    theta (values not given are those of the sliders), e.g. 'd 1 2.3 0.4'
+    Output:
+        list of (prc, ts, te, theta), error message (None if valid)
+    '''
+    list_params = []
+    for line in (text or '').splitlines():
+        words = line.replace(',', ' ').split()
+        if len(words)==0:
+            continue
+        if words[0].lower() not in prcTags or len(words) > 4:
+            return [], 'Cannot read "{}": expected a PRC ({}) followed by ts, te and theta'.format(
+                line.strip(), ', '.join(prcTags))
+        try:
+            values = [float(x) for x in words[1:]] + [ts, te, theta][len(words)-1:]
+        except ValueError:
+            return [], 'Cannot read "{}": ts, te and theta should be numbers'.format(line.strip())
+        if not (ts_min <= values[0] <= ts_max and te_min <= values[1] <= te_max
+                and theta_min <= values[2] <= theta_max):
+            return [], 'Parameters of "{}" are outside the range of the sliders'.format(line.strip())
+        list_params.append((words[0].lower(), *values))
+    
+    if not 2 <= len(list_params) <= compare_max:
+        return [], 'Enter 2 to {} configurations'.format(compare_max)
+    return list_params, None
+
+
+# Add the current parameters to the comparison
+@app.callback(Output('compare_text','value'),
+              [Input('compare_add','n_clicks')],
+              [State('compare_text','value'),
+               State('prc_drop_down','value'),
+               State('ts_slider','value'),
+               State('te_slider','value'),
+               State('theta_slider','value')])
+
+def add_configuration(n_clicks, text, prc, ts, te, theta):
+    lines = [line for line in (text or '').splitlines() if line.strip()]
+    if not n_clicks or len(lines) >= compare_max:
+        raise PreventUpdate
+    return '\n'.join(lines + ['{} {} {} {}'.format(prc, ts, te, theta)])
+
+
+# Update comparison
+@app.callback([Output('compare_plot','figure'),
+               Output('compare_div','style')],
+              [Input('compare_check','value'),
+               Input('compare_run','n_clicks')],
+              [State('prc_drop_down','value'),
+               State('ts_slider','value'),
+               State('te_slider','value'),
+               State('theta_slider','value'),
+               State('compare_text','value'),
+               State('warm_start_check','value'),
+               State('session_id','data')])
+
+def update_compare(check, n_clicks, prc, ts, te, theta, text, warm_start, session):
+    # Only run when ticked or when Compare is pressed (not on every slider move)
+    if 'compare' not in check:
+        return dash.no_update, {'display':'none'}
+    style = {'padding-bottom':'20px'}
+    
+    list_params, error = parse_configs(text, prc, ts, te, theta)
+    if error is not None:
+        return message_plot(error), style
+    
+    # Results stored for the session (shared with the main view), and the
+    # others simulated together
+    dic_data = {}
+    for params in dict.fromkeys(list_params):
+        key = store.find(session, params)
+        data = None if key is None else store.get(key)
+        if data is not None:
+            dic_data[params] = data
+    missing = [params for params in dict.fromkeys(list_params) if params not in dic_data]
+    for params, data in zip(missing, simulate_batch(missing, warm_start)):
+        store.put(session, params, data)
+        dic_data[params] = data
+    
+    labels = ['{}: ts = {}, te = {}, theta = {}'.format(params[0].upper(), *params[1:])
+              for params in list_params]
+    
+    return comparison_plot([dic_data[params] for params in list_params], labels, tmax_plot), style
+
+
+
+# Update HRV plot
+@app.callback(Output('hrv_plot','figure'),
+              [Input('result_key','data')])
+
+def update_hrv(key):
+    data = None if key is None else store.get(key)
+    if data is None:
+        raise PreventUpdate
+    return hrv_plot(hf.compute_hrv(data[1], window=hrv_window, step=hrv_step))
+
+
+
+# Update NIB map
+@app.callback(Output('nib_map_plot','figure'),
+              [Input('prc_drop_down','value'),
+               Input('ts_slider','value'),
+               Input('te_slider','value'),
+               Input('theta_slider','value')])
+
+def update_nib_map(prc, ts, te, theta):
+    # Load precomputed map (built by running nib_map.py)
+    df_map = nm.load_nib_map(prc)
+    if df_map is None:
+        return message_plot('No NIB map for PRC {}. Run nib_map.py to build it.'.format(prc.upper()))
+    
+    # Mark current parameters (the model only depends on te/ts and theta/ts)
+    fig = nib_map_plot(df_map, ratio=te/ts, theta_ratio=theta/ts)
     
     return fig
 
@@ -347,7 +1026,10 @@ def update_grid(prc, ts, te, theta):
 #–-----------------
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    if serve_mode=='production':
+        app.run_server(debug=False, threaded=True)
+    else:
+        app.run_server(debug=True)
     
     
 
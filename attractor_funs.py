@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Search for coexisting attractors (stable rhythms) of the modulated
+parasystole model by simulating from many initial conditions.
+
+run_mod_para always starts with the ectopic beat at the same phase, so
+rhythms that are only reached from other initial conditions are never seen.
+Here a batch of simulations starts from a grid of initial states (phase of
+the ectopic focus at the first sinus beat, and te_mod/te, as in the warm
+start states of simulate_beats). The batch is stepped in lockstep with one
+array operation per beat for all simulations (the same event rules as
+simulate_beats), and only summary counts are kept after burn in:
+    - the distribution of NIB values
+    - the fraction and mean length of each type of interval (NN, NV, VN, VV)
+Simulations with similar NIB patterns and interval distributions are
+grouped into one attractor (see cluster_signatures), and the basin size of an
+attractor is the fraction of initial conditions that reach it.
+
+@author: tbury
+"""
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+
+
+
+def initial_conditions(n_phase=32, n_ratio=4, ratio_range=(0.7,1.3)):
+    '''
+    Grid of initial states
+    Input:
+        n_phase: number of phases of the ectopic focus (evenly spaced in [0,1))
+        n_ratio: number of values of te_mod/te
+        ratio_range: range of te_mod/te
+    Output:
+        phase, te_ratio: arrays with an element for each initial state
+    '''
+    phase = (np.arange(n_phase)+0.5)/n_phase
+    te_ratio = np.linspace(*ratio_range, n_ratio) if n_ratio > 1 else np.ones(1)
+    phase, te_ratio = np.meshgrid(phase, te_ratio)
+    return phase.ravel(), te_ratio.ravel()
+
+
+
+def simulate_batch(ts, te, theta, prc_tag, phase=None, te_ratio=None,
+                   tmax=200, tburn=200, max_nib=20, prc_params=None,
+                   min_events=0, tmax_max=None):
+    '''
+    Simulate from a batch of initial states and count NIB values and
+    intervals after burn in.
+    Input:
+        ts, te, theta, prc_tag: see run_mod_para. ts, te and theta can be
+            arrays with a value for each simulation.
+        phase, te_ratio: initial states (see initial_conditions), i.e.
+            state0 = {'phase':phase[i], 'te_ratio':te_ratio[i], 'sinus_type':BEAT_S}
+            for simulation i. If None, simulations start from the default
+            initial condition of run_mod_para.
+        tmax: length of time over which beats are counted
+        tburn: burn in period
+        max_nib: NIB values above max_nib are counted as max_nib
+        prc_params: dictionary of parameters of the PRC (see run_mod_para),
+            as values or arrays with a value for each simulation
+        min_events: simulations with fewer than min_events NIB values after
+            tmax carry on counting until they have them (rhythms with long
+            NIB have few ectopic beats in tmax)
+        tmax_max: maximum length of time over which beats are counted when
+            carrying on (default 10*tmax)
+    Output:
+        nib_counts: array (number of simulations, max_nib+1) of counts of NIB values
+        rr_counts: array (number of simulations, 4) of counts of each type of interval
+        rr_sums: array (number of simulations, 4) of total length of each type of interval
+    '''
+
+    prc = mp.dic_prc[prc_tag]
+    prc_params = {} if prc_params is None else prc_params
+    ts, te, theta = (np.asarray(x, dtype=float) for x in (ts, te, theta))
+    if phase is None:
+        n = np.broadcast(ts, te, theta, *prc_params.values()).size
+    else:
+        n = len(phase)
+    lanes = np.arange(n)
+
+    if phase is None:
+        # Expressed sinus beat at t=0 and expressed ectopic beat at
+        # t=theta+(ts-theta)/2 (as run_mod_para)
+        te_mod = np.broadcast_to(te, n)
+        t_sinus = np.zeros(n)
+        t_ectopic = np.broadcast_to(theta + (ts-theta)/(2+0.01*np.pi), n)
+        last_type = np.full(n, mp.BEAT_E)
+        last_time = t_ectopic
+        last_expr = np.full(n, mp.BEAT_E)
+        last_expr_time = t_ectopic
+        nib_count = np.zeros(n, dtype=int)
+    else:
+        # Sinus beat at t=0 with the ectopic focus at the given phase and modulation
+        te_mod = np.asarray(te_ratio, dtype=float)*te
+        t_sinus = np.zeros(n)
+        t_ectopic = -np.asarray(phase, dtype=float)*te_mod
+        last_type = np.full(n, mp.BEAT_S)
+        last_time = np.zeros(n)
+        # Type and time of the last expressed beat
+        last_expr = np.full(n, mp.BEAT_S)
+        last_expr_time = np.zeros(n)
+        # Number of 's' since the last 'e' (-1 until there is one)
+        nib_count = np.full(n, -1)
+
+    nib_counts = np.zeros((n, max_nib+1), dtype=int)
+    n_events = np.zeros(n, dtype=int)
+    rr_counts = np.zeros((n, 4), dtype=int)
+    rr_sums = np.zeros((n, 4))
+    if tmax_max is None:
+        tmax_max = 10*tmax
+
+    active = t_sinus < tmax+tburn
+    while active.any():
+
+        # Projected time of next ectopic beat (using PRC if last beat was expressed sinus)
+        prc_applied = active & (last_type==mp.BEAT_S)
+        with np.errstate(all='ignore'):
+            phi = (t_sinus - t_ectopic)/te_mod
+            te_mod = np.where(prc_applied, prc(phi, **prc_params)*te_mod, te_mod)
+        t_sinus_next = t_sinus + ts
+        t_ectopic_next = t_ectopic + te_mod
+        is_sinus = active & (t_sinus_next < t_ectopic_next)
+        is_ectopic = active & ~is_sinus
+
+        # Sinus beats are concealed if preceded directly by an expressed ectopic beat,
+        # and ectopic beats if in the refractory period of an expressed sinus beat
+        beat_type = np.where(is_sinus,
+                             np.where(last_type==mp.BEAT_E, mp.BEAT_XS, mp.BEAT_S),
+                             np.where((last_type==mp.BEAT_S) & (t_ectopic_next < last_time+theta),
+                                      mp.BEAT_XE, mp.BEAT_E))
+        beat_time = np.where(is_sinus, t_sinus_next, t_ectopic_next)
+        t_sinus = np.where(is_sinus, t_sinus_next, t_sinus)
+        t_ectopic = np.where(is_ectopic, t_ectopic_next, t_ectopic)
+        te_mod = np.where(is_ectopic, te, te_mod)
+        last_type = np.where(active, beat_type, last_type)
+        last_time = np.where(active, beat_time, last_time)
+
+        # Counts after burn in
+        kept = active & (beat_time >= tburn)
+        expr_s = active & (beat_type==mp.BEAT_S)
+        expr_e = active & (beat_type==mp.BEAT_E)
+        nib_count = np.where(expr_s & (nib_count >= 0), nib_count+1, nib_count)
+        done = expr_e & kept & (nib_count >= 0)
+        nib_counts[lanes[done], np.minimum(nib_count[done], max_nib)] += 1
+        n_events += done
+        nib_count = np.where(expr_e, 0, nib_count)
+
+        expr = expr_s | expr_e
+        rr = expr & kept
+        rr_type = 2*(last_expr[rr]==mp.BEAT_E) + (beat_type[rr]==mp.BEAT_E)
+        rr_counts[lanes[rr], rr_type] += 1
+        rr_sums[lanes[rr], rr_type] += beat_time[rr] - last_expr_time[rr]
+        last_expr = np.where(expr, beat_type, last_expr)
+        last_expr_time = np.where(expr, beat_time, last_expr_time)
+
+        active = (t_sinus < tmax+tburn) | ((n_events < min_events) & (t_sinus < tmax_max+tburn))
+
+    return nib_counts, rr_counts, rr_sums
+
+
+
+def cluster_signatures(nib_counts, rr_counts, tol=0.1, tol_pattern=0.01):
+    '''
+    Group simulations with similar NIB and interval distributions.
+    Two simulations are linked if they
+        - have the same NIB pattern (NIB values that occur with probability
+          at least tol_pattern, as nib_map.nib_pattern), or NIB
+          distributions within tol of each other
+        - have distributions of interval types within tol of each other
+    and groups are the sets of simulations connected by links. Distances
+    are total variation distances (see nib_distance). NIB patterns are
+    compared as well as distributions, and chains of links are followed, as
+    in quasiperiodic and chaotic rhythms the probabilities of NIB values
+    vary between finite windows.
+    Input:
+        nib_counts, rr_counts: see simulate_batch
+        tol: maximum distance between distributions
+        tol_pattern: minimum probability of NIB values in the pattern
+    Output:
+        labels: array of group index of each simulation (groups ordered by size)
+    '''
+
+    # NIB distributions (no ectopic beats is a separate NIB value, so that
+    # it only agrees with itself)
+    silent = nib_counts.sum(axis=1)==0
+    p_nib = np.column_stack((nib_counts, silent)).astype(float)
+    p_nib /= p_nib.sum(axis=1, keepdims=True)
+    patterns = p_nib >= tol_pattern
+    p_rr = rr_counts/np.maximum(rr_counts.sum(axis=1, keepdims=True), 1)
+
+    # Links between each pair of simulations
+    same_nib = ((patterns[:,None]==patterns[None,:]).all(axis=2)
+                | (0.5*np.abs(p_nib[:,None]-p_nib[None,:]).sum(axis=2) <= tol))
+    same_rr = 0.5*np.abs(p_rr[:,None]-p_rr[None,:]).sum(axis=2) <= tol
+    linked = same_nib & same_rr
+
+    # Connected groups: each simulation takes the smallest index among the
+    # simulations linked to it until nothing changes
+    n = len(nib_counts)
+    labels = np.arange(n)
+    while True:
+        labels_new = np.where(linked, labels[None,:], n).min(axis=1)
+        if (labels_new==labels).all():
+            break
+        labels = labels_new
+
+    # Relabel in order of size (then of first simulation)
+    labels = np.unique(labels, return_inverse=True)[1]
+    order = np.argsort(-np.bincount(labels), kind='stable')
+    return np.argsort(order)[labels]
+
+
+
+def find_attractors(ts=1, te=1.8, theta=0.2, prc_tag='pure',
+                    n_phase=32, n_ratio=4, ratio_range=(0.7,1.3),
+                    tmax=200, tburn=200, max_nib=20, min_events=50, tmax_max=None,
+                    tol=0.1, tol_pattern=0.01):
+    '''
+    Attractors reached from a grid of initial states, and their basin sizes.
+    Input:
+        ts, te, theta, prc_tag: see run_mod_para
+        n_phase, n_ratio, ratio_range: grid of initial states (see initial_conditions)
+        tmax, tburn, max_nib, min_events, tmax_max: see simulate_batch
+        tol, tol_pattern: see cluster_signatures
+    Output:
+        df_attractors: dataframe with a row for each attractor (largest basin first)
+            'Attractor': index of attractor (from 1)
+            'NIB pattern': NIB values with probability at least tol_pattern
+                (as nib_map.nib_pattern, with max_nib meaning max_nib or more)
+            'Basin': fraction of initial states that reach the attractor
+            'Ectopic fraction': fraction of expressed beats that are ectopic
+            'Mean RR (s)': mean interval between expressed beats
+            'NN', 'NV', 'VN', 'VV': fraction of intervals of each type
+            'Phase', 'te ratio': an initial state that reaches the attractor
+        df_ic: dataframe with a row for each initial state
+            'Phase', 'te ratio', 'Attractor'
+    '''
+
+    phase, te_ratio = initial_conditions(n_phase, n_ratio, ratio_range)
+    nib_counts, rr_counts, rr_sums = simulate_batch(ts, te, theta, prc_tag, phase, te_ratio,
+                                                    tmax=tmax, tburn=tburn, max_nib=max_nib,
+                                                    min_events=min_events, tmax_max=tmax_max)
+    labels = cluster_signatures(nib_counts, rr_counts, tol=tol, tol_pattern=tol_pattern)
+
+    list_rows = []
+    for k in range(labels.max()+1):
+        members = labels==k
+        nib = nib_counts[members].sum(axis=0)
+        rr = rr_counts[members].sum(axis=0)
+        n_rr = max(rr.sum(), 1)
+        if nib.sum()==0:
+            pattern = 'silence'
+        else:
+            pattern = ','.join(str(x) for x in np.flatnonzero(nib/nib.sum() >= tol_pattern))
+        i = np.flatnonzero(members)[0]
+        row = {'Attractor': k+1,
+               'NIB pattern': pattern,
+               'Basin': members.mean(),
+               # Intervals ending in an ectopic beat (NV and VV)
+               'Ectopic fraction': (rr[mp.RR_SE]+rr[mp.RR_EE])/n_rr,
+               'Mean RR (s)': rr_sums[members].sum()/n_rr}
+        row.update({label: rr[j]/n_rr for j, label in enumerate(mp.rr_labels)})
+        row.update({'Phase': phase[i], 'te ratio': te_ratio[i]})
+        list_rows.append(row)
+
+    df_attractors = pd.DataFrame(list_rows)
+    df_ic = pd.DataFrame({'Phase': phase, 'te ratio': te_ratio, 'Attractor': labels+1})
+
+    return df_attractors, df_ic
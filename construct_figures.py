@@ -13,9 +13,12 @@ import numpy as np
 import pandas as pd
 
 import plotly.graph_objects as go
+import plotly.colors as px_colors
 from plotly.subplots import make_subplots
 
 import prc_functions as pf
+import mod_para_funs as mp
+
 dic_prc = {'a':pf.prc_a,'b':pf.prc_b,'c':pf.prc_c,'d':pf.prc_d,
            'e':pf.prc_e,'pure':pf.prc_pure,
            # 'moe_1':pf.prc_moe_1,
@@ -25,36 +28,83 @@ dic_prc = {'a':pf.prc_a,'b':pf.prc_b,'c':pf.prc_c,'d':pf.prc_d,
            }
 
 
-def mp_grid_plot(df_beats, df_rr, df_nib, tmax_plot):
+def histogram_bars(x, edges, weights=None):
+    '''
+    Bars of a histogram normalised to probabilities
+    Input:
+        x: values
+        edges: edges of the bins
+        weights: count of each value (e.g. x are bin centres of a finer histogram)
+    Output:
+        centres and probabilities of the non-empty bins
+    '''
+    counts, edges = np.histogram(x, bins=edges, weights=weights)
+    centres = (edges[:-1]+edges[1:])/2
+    keep = counts > 0
+    return centres[keep], counts[keep]/max(counts.sum(), 1)
+
+
+
+def mp_grid_plot(df_beats, df_rr, df_nib, tmax_plot, df_hist=None,
+                 t_range=None, max_points=2000, n_bins_poincare=100,
+                 bin_rr=0.02, bin_vv=0.2):
+    '''
+    Grid plot of interval time series, NIB distribution, interval histograms
+    and Poincare map of intervals.
+    Input:
+        df_beats, df_rr, df_nib: beats, intervals and NIB (see mod_para_funs)
+        tmax_plot: max time for time series plot of intervals (if t_range not given)
+        df_hist: histograms of intervals (see rr_data.RRStats.output). If provided,
+            these are used for the interval distributions instead of df_rr and df_beats.
+        t_range: time window (t0,t1) shown in the time series plot
+        max_points: maximum number of points of each interval type in the
+            time series plot (see mod_para_funs.rr_window)
+        n_bins_poincare: number of bins on each axis of the Poincare map
+            (see mod_para_funs.poincare_density)
+        bin_rr, bin_vv: bin widths of the histograms of NV and VN intervals,
+            and of inter-ectopic intervals (s)
+    Output:
+        figure
+    '''
     
     # Figure parameters
     ms = 7 # Marker size    
 
-    # Plotting data up to tmax_plot
-    df_rr_plot = df_rr[df_rr['Time (s)']<=tmax_plot]
+    # Plotting data in the time window (decimated to max_points for each type)
+    if t_range is None:
+        t_range = (0, tmax_plot)
+    dic_rr_plot = {}
+    for code in range(len(mp.rr_labels)):
+        df_type = df_rr[df_rr['Type']==code]
+        idx = mp.rr_window(df_type['Time (s)'].values, df_type['RR interval (s)'].values,
+                           t_range[0], t_range[1], max_points)
+        dic_rr_plot[code] = df_type.iloc[idx]
     
 
     ##-----------Create grid figure------------#
     
     # Geometry of grid
     fig = make_subplots(
-        rows=2, cols=3,
+        rows=3, cols=3,
         specs=[[{"colspan": 3}, None,None],
-               [{}, {}, {}]])
+               [{}, {}, {}],
+               [{"colspan": 3}, None,None]],
+        row_heights=[0.3,0.3,0.4],
+        vertical_spacing=0.08)
     
             
     ## Add traces
   
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             mode='markers',
-            x=df_rr_plot[df_rr_plot['Type']=='ss']['Time (s)'],
-            y=df_rr_plot[df_rr_plot['Type']=='ss']['RR interval (s)'],
+            x=dic_rr_plot[mp.RR_SS]['Time (s)'],
+            y=dic_rr_plot[mp.RR_SS]['RR interval (s)'],
             marker=dict(
                 color='Blue',
                 size=ms
                 ),
-            name='NN'
+            name=mp.rr_labels[mp.RR_SS]
         ),
         row=1, col=1            
                     
@@ -62,15 +112,15 @@ def mp_grid_plot(df_beats, df_rr, df_nib, tmax_plot):
             
     # Add trace of NV beats
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             mode='markers',
-            x=df_rr_plot[df_rr_plot['Type']=='se']['Time (s)'],
-            y=df_rr_plot[df_rr_plot['Type']=='se']['RR interval (s)'],
+            x=dic_rr_plot[mp.RR_SE]['Time (s)'],
+            y=dic_rr_plot[mp.RR_SE]['RR interval (s)'],
             marker=dict(
                 color='Red',
                 size=ms
                 ),
-            name='NV'
+            name=mp.rr_labels[mp.RR_SE]
         ),
         row=1, col=1            
                     
@@ -78,30 +128,30 @@ def mp_grid_plot(df_beats, df_rr, df_nib, tmax_plot):
             
     # Add trace of VN beats
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             mode='markers',
-            x=df_rr_plot[df_rr_plot['Type']=='es']['Time (s)'],
-            y=df_rr_plot[df_rr_plot['Type']=='es']['RR interval (s)'],
+            x=dic_rr_plot[mp.RR_ES]['Time (s)'],
+            y=dic_rr_plot[mp.RR_ES]['RR interval (s)'],
             marker=dict(
                 color='Green',
                 size=ms
                 ),
-            name='VN'
+            name=mp.rr_labels[mp.RR_ES]
         ),
         row=1, col=1            
     )
             
     # Add trace of VV beats
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             mode='markers',
-            x=df_rr_plot[df_rr_plot['Type']=='ee']['Time (s)'],
-            y=df_rr_plot[df_rr_plot['Type']=='ee']['RR interval (s)'],
+            x=dic_rr_plot[mp.RR_EE]['Time (s)'],
+            y=dic_rr_plot[mp.RR_EE]['RR interval (s)'],
             marker=dict(
                 color='Purple',
                 size=ms
                 ),
-            name='VV'
+            name=mp.rr_labels[mp.RR_EE]
         ),
         row=1, col=1
     )
@@ -119,42 +169,98 @@ def mp_grid_plot(df_beats, df_rr, df_nib, tmax_plot):
     
     
     
-    # Trace for distribution of NV and VN beats
-    data_nv = df_rr[df_rr['Type']=='se']['RR interval (s)']
-    data_vn = df_rr[df_rr['Type']=='es']['RR interval (s)']
-    
-    fig.add_trace(go.Histogram(x = data_nv,
-                               histnorm='probability',
-                               marker_color='Red',
-                               showlegend=False), row=2, col=2)
-    fig.add_trace(go.Histogram(x = data_vn,
-                               histnorm='probability',
-                               marker_color='Green',
-                               showlegend=False), row=2, col=2)
+    # Trace for distribution of NV and VN beats (binned here, so that only
+    # the bars are sent to the browser)
+    ymax = np.ceil(max(df_rr['RR interval (s)'])+0.01)
+    edges_rr = np.arange(0, ymax+bin_rr, bin_rr)
+    if df_hist is None:
+        data_nv = df_rr[df_rr['Type']==mp.RR_SE]['RR interval (s)']
+        data_vn = df_rr[df_rr['Type']==mp.RR_ES]['RR interval (s)']
+        counts_nv = counts_vn = None
+    # Binned data (bin centres weighted by counts)
+    else:
+        data_nv = data_vn = df_hist['Interval (s)']
+        counts_nv = df_hist[mp.rr_labels[mp.RR_SE]]
+        counts_vn = df_hist[mp.rr_labels[mp.RR_ES]]
+    
+    # NV bars in the left half of each bin and VN bars in the right half
+    x, y = histogram_bars(data_nv, edges_rr, counts_nv)
+    fig.add_trace(go.Bar(x=x, y=y,
+                         width=bin_rr/2,
+                         offset=-bin_rr/2,
+                         marker_color='Red',
+                         name=mp.rr_labels[mp.RR_SE],
+                         showlegend=False), row=2, col=2)
+    x, y = histogram_bars(data_vn, edges_rr, counts_vn)
+    fig.add_trace(go.Bar(x=x, y=y,
+                         width=bin_rr/2,
+                         offset=0,
+                         marker_color='Green',
+                         name=mp.rr_labels[mp.RR_ES],
+                         showlegend=False), row=2, col=2)
     
     
     
     
     # Trace for distribution of VV intervals
-    # Dataframe of ectopic beats and times
-    df_vbeats = df_beats[df_beats['Type']=='e']
-    # Compute interval between each V beat (round to 2dp)
-    v_intervals = df_vbeats['Time'].diff().dropna().values
-    v_intervals_round = [round(v,2) for v in v_intervals]
-    
-    fig.add_trace(go.Histogram(x = v_intervals_round,
-                               histnorm='probability',
-                               marker_color='Purple',
-                               xbins={'start':0,'end':50,'size':0.2},
-                               showlegend=False), row=2, col=3)
+    if df_hist is None:
+        # Interval between each V beat
+        times_v = df_beats['Time'].values[df_beats['Type'].values==mp.BEAT_E]
+        v_intervals = np.diff(times_v)
+        counts_v = None
+    else:
+        v_intervals = df_hist['Interval (s)']
+        counts_v = df_hist['Inter-ectopic']
+    
+    x, y = histogram_bars(v_intervals, np.arange(0, 50+bin_vv, bin_vv), counts_v)
+    fig.add_trace(go.Bar(x=x, y=y,
+                         width=bin_vv,
+                         offset=-bin_vv/2,
+                         marker_color='Purple',
+                         name='VV',
+                         showlegend=False), row=2, col=3)
+    
+    
+    
+    # Trace for Poincare map: density of (RR_n, RR_n+1) on a fixed grid, as one
+    # heatmap (separate heatmaps for each type would hide each other). Each bin
+    # has the colour of the most common type of RR_n in it, from a light tint
+    # for a single interval to the full colour for the largest count (log
+    # scale, empty bins transparent), and the hover text gives the counts of
+    # each type.
+    counts, edges = mp.poincare_density(df_rr['Time (s)'].values, df_rr['RR interval (s)'].values,
+                                        df_rr['Type'].values, n_bins=n_bins_poincare, rr_max=ymax)
+    centres = (edges[:-1]+edges[1:])/2
+    n_types = len(mp.rr_labels)
+    total = counts.sum(axis=0)
+    level = np.log10(np.maximum(total,1))/max(np.log10(max(total.max(),1)), 1e-9)
+    z = np.where(total>0, (counts.argmax(axis=0) + 0.999*level)/n_types, np.nan)
+    # Colour scale made of a segment for each type
+    colorscale = []
+    for code, color in enumerate(['rgb(0,0,255)','rgb(255,0,0)','rgb(0,128,0)','rgb(128,0,128)']):
+        light = px_colors.find_intermediate_color('rgb(255,255,255)', color, 0.15, colortype='rgb')
+        colorscale += [[code/n_types, light], [(code+1)/n_types, color]]
+    hovertemplate = 'RR_n = %{x:.2f} s<br>RR_n+1 = %{y:.2f} s'
+    for code, label in enumerate(mp.rr_labels):
+        hovertemplate += '<br>{} count = %{{customdata[{}]}}'.format(label, code)
+    fig.add_trace(go.Heatmap(x=centres,
+                             y=centres,
+                             z=z,
+                             customdata=np.moveaxis(counts, 0, -1),
+                             zmin=0,
+                             zmax=1,
+                             colorscale=colorscale,
+                             showscale=False,
+                             name='Poincare map',
+                             hovertemplate=hovertemplate + '<extra></extra>'),
+                  row=3, col=1)
     
     
     
     ## Set axes properties
     
     # RR Interval axes
-    fig.update_xaxes(title="Time (s)", row=1, col=1)
-    ymax = np.ceil(max(df_rr['RR interval (s)'])+0.01)
+    fig.update_xaxes(title="Time (s)", range=list(t_range), row=1, col=1)
     fig.update_yaxes(title="Interval (s)",
                      range=[0,ymax],
                      fixedrange=True,
@@ -179,11 +285,23 @@ def mp_grid_plot(df_beats, df_rr, df_nib, tmax_plot):
                      range=[0,20],
                      row=2,col=3)
     fig.update_yaxes(range=[-0.05,1.05], row=2,col=3)
+    
+    # Poincare map (equal scales)
+    fig.update_xaxes(title="Interval RR_n (s)",
+                     range=[0,ymax],
+                     constrain='domain',
+                     row=3,col=1)
+    fig.update_yaxes(title="Interval RR_n+1 (s)",
+                     range=[0,ymax],
+                     scaleanchor=fig.get_subplot(3,1).yaxis.anchor,
+                     constrain='domain',
+                     row=3,col=1)
 
 
 
     # Adjust image padding
-    fig.update_layout(margin={'l':0,'r':0,'t':40,'b':0}) 
+    fig.update_layout(margin={'l':0,'r':0,'t':40,'b':0},
+                      height=1000) 
     
     return fig
 
@@ -320,5 +438,295 @@ def prc_plot(prc):
     return fig
 
 
+def nib_map_plot(df_map, ratio=None, theta_ratio=None):
+    '''
+    Plots map of NIB patterns as a heatmap at the finest resolution of the tiles.
+    Input:
+        df_map: dataframe of tiles (see nib_map.compute_nib_map)
+        ratio: te/ts of current parameters (marked if provided)
+        theta_ratio: theta/ts of current parameters
+    Output:
+        figure
+    '''
+    
+    # Finest resolution of tiles
+    dx = (df_map['te/ts max']-df_map['te/ts min']).min()
+    dy = (df_map['theta/ts max']-df_map['theta/ts min']).min()
+    x0 = df_map['te/ts min'].min()
+    y0 = df_map['theta/ts min'].min()
+    nx = int(round((df_map['te/ts max'].max()-x0)/dx))
+    ny = int(round((df_map['theta/ts max'].max()-y0)/dy))
+    
+    # Patterns ordered by the area they cover
+    area = (df_map['te/ts max']-df_map['te/ts min'])*(df_map['theta/ts max']-df_map['theta/ts min'])
+    patterns = area.groupby(df_map['Pattern']).sum().sort_values(ascending=False).index
+    dic_codes = {x:i for i,x in enumerate(patterns)}
+    
+    # Fill in image tile by tile
+    z = np.zeros((ny,nx))
+    i0 = np.rint((df_map['te/ts min'].values-x0)/dx).astype(int)
+    i1 = np.rint((df_map['te/ts max'].values-x0)/dx).astype(int)
+    j0 = np.rint((df_map['theta/ts min'].values-y0)/dy).astype(int)
+    j1 = np.rint((df_map['theta/ts max'].values-y0)/dy).astype(int)
+    codes = df_map['Pattern'].map(dic_codes).values
+    for k in range(len(df_map)):
+        z[j0[k]:j1[k], i0[k]:i1[k]] = codes[k]
+    text = np.array(patterns, dtype=object)[z.astype(int)]
+    
+    # Discrete colour scale (one colour per pattern)
+    colors = px_colors.qualitative.Alphabet
+    n = len(patterns)
+    colorscale = []
+    for i in range(n):
+        colorscale += [[i/n, colors[i%len(colors)]], [(i+1)/n, colors[i%len(colors)]]]
+    
+    fig = go.Figure()
+    fig.add_trace(go.Heatmap(x=x0+(np.arange(nx)+0.5)*dx,
+                             y=y0+(np.arange(ny)+0.5)*dy,
+                             z=z,
+                             text=text,
+                             zmin=-0.5,
+                             zmax=n-0.5,
+                             colorscale=colorscale,
+                             showscale=False,
+                             hovertemplate='te/ts: %{x:.3f}<br>theta/ts: %{y:.3f}<br>NIB: %{text}<extra></extra>'))
+    
+    # Mark current parameter values
+    title = 'Dominant NIB pattern'
+    if ratio is not None:
+        fig.add_trace(go.Scatter(x=[ratio], y=[theta_ratio],
+                                 mode='markers',
+                                 marker={'color':'black','size':12,'symbol':'x'},
+                                 hoverinfo='skip',
+                                 showlegend=False))
+        # Say so if the current parameters are not covered by the map
+        if not (x0 <= ratio <= x0+nx*dx and y0 <= theta_ratio <= y0+ny*dy):
+            title += ' (current parameters outside the map)'
+    
+    fig.update_layout(
+            title={
+                'text':title,
+                'font':{'size':15},
+                'y':0.95,
+                'x':0.5,
+                'xanchor': 'center',
+                'yanchor': 'top'},
+            xaxis_title='te/ts',
+            yaxis_title='theta/ts',
+            margin={'l':0,'r':0,'t':40,'b':0},
+            height=350)
+    
+    return fig
+
+
+def episode_plot(df_episodes, max_rows=100):
+    '''
+    Table of rhythm pattern episodes.
+    Input:
+        df_episodes: dataframe of episodes (see pattern_funs.episode_table)
+        max_rows: maximum number of episodes shown (the longest)
+    Output:
+        figure
+    '''
+    
+    df_show = df_episodes.nlargest(max_rows, 'Duration (s)').sort_values('Start (s)')
+    if len(df_episodes) > max_rows:
+        title = '{} pattern episodes (showing the {} longest)'.format(len(df_episodes), max_rows)
+    else:
+        title = '{} pattern episodes'.format(len(df_episodes))
+    
+    fig = go.Figure(
+        go.Table(
+            header={'values':list(df_show.columns),
+                    'align':'left'},
+            cells={'values':[df_show[col] for col in df_show.columns],
+                   'format':[None, None, '.1f', '.1f', '.1f', None],
+                   'align':'left'},
+        )
+    )
+    fig.update_layout(
+            title={'text':title, 'x':0.5},
+            margin={'l':0,'r':0,'t':40,'b':0},
+            height=350)
+    
+    return fig
+
+
+
+def hrv_plot(df_hrv):
+    '''
+    HRV measures over time.
+    Input:
+        df_hrv: dataframe of HRV measures over sliding windows (see hrv_funs.compute_hrv)
+    Output:
+        figure
+    '''
+    
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.05)
+    
+    # Time domain measures
+    for col, color in [('SDNN (ms)','Blue'), ('RMSSD (ms)','Red')]:
+        fig.add_trace(go.Scatter(x=df_hrv['Time (s)'], y=df_hrv[col],
+                                 mode='lines', name=col, line={'color':color}),
+                      row=1, col=1)
+    
+    # Power in frequency bands
+    for col, color in [('LF (ms^2)','Green'), ('HF (ms^2)','Purple')]:
+        fig.add_trace(go.Scatter(x=df_hrv['Time (s)'], y=df_hrv[col],
+                                 mode='lines', name=col, line={'color':color}),
+                      row=2, col=1)
+    
+    fig.add_trace(go.Scatter(x=df_hrv['Time (s)'], y=df_hrv['LF/HF'],
+                             mode='lines', name='LF/HF', line={'color':'Black'}),
+                  row=3, col=1)
+    
+    fig.update_yaxes(title='ms', row=1, col=1)
+    fig.update_yaxes(title='ms^2', row=2, col=1)
+    fig.update_yaxes(title='LF/HF', row=3, col=1)
+    fig.update_xaxes(title='Time (s) (centre of window)', row=3, col=1)
+    fig.update_layout(margin={'l':0,'r':0,'t':40,'b':0},
+                      height=500)
+    
+    return fig
+
+
+
+def attractor_plot(df_attractors, df_ic):
+    '''
+    Table of attractors and map of their basins over the initial states.
+    Input:
+        df_attractors, df_ic: see attractor_funs.find_attractors
+    Output:
+        figure
+    '''
+
+    fig = make_subplots(rows=1, cols=2, column_widths=[0.6,0.4],
+                        specs=[[{'type':'table'},{}]],
+                        horizontal_spacing=0.08)
+
+    cols = ['Attractor','NIB pattern','Basin','Ectopic fraction','Mean RR (s)','NN','NV','VN','VV']
+    fig.add_trace(
+        go.Table(
+            header={'values':cols, 'align':'left'},
+            cells={'values':[df_attractors[col] for col in cols],
+                   'format':[None, None, '.0%', '.3f', '.3f', '.2f', '.2f', '.2f', '.2f'],
+                   'align':'left'}),
+        row=1, col=1)
+
+    # Basins (one colour per attractor, as nib_map_plot)
+    phases = np.unique(df_ic['Phase'])
+    ratios = np.unique(df_ic['te ratio'])
+    z = df_ic.pivot(index='te ratio', columns='Phase', values='Attractor').values
+    text = df_attractors.set_index('Attractor')['NIB pattern'].reindex(z.ravel()).values.reshape(z.shape)
+    colors = px_colors.qualitative.Alphabet
+    n = len(df_attractors)
+    colorscale = []
+    for i in range(n):
+        colorscale += [[i/n, colors[i%len(colors)]], [(i+1)/n, colors[i%len(colors)]]]
+    fig.add_trace(go.Heatmap(x=phases, y=ratios, z=z, text=text,
+                             zmin=0.5, zmax=n+0.5,
+                             colorscale=colorscale,
+                             showscale=False,
+                             hovertemplate='Phase: %{x:.3f}<br>te_mod/te: %{y:.2f}<br>'+
+                                 'Attractor %{z}<br>NIB: %{text}<extra></extra>'),
+                  row=1, col=2)
+    fig.update_xaxes(title='Initial phase of ectopic focus', row=1, col=2)
+    fig.update_yaxes(title='Initial te_mod/te', row=1, col=2)
+
+    fig.update_layout(
+            title={'text':'{} attractor{} from {} initial states'.format(
+                           n, '' if n==1 else 's', len(df_ic)),
+                   'x':0.5},
+            margin={'l':0,'r':0,'t':40,'b':0},
+            height=350)
+
+    return fig
+
+
+
+def comparison_plot(list_data, list_labels, tmax_plot, max_points=2000):
+    '''
+    Configurations side by side: interval time series (top) and NIB
+    distribution (bottom) of each, with the axes of each row shared.
+    Input:
+        list_data: list of (df_beats, df_rr, df_nib) of each configuration
+        list_labels: title of each configuration
+        tmax_plot: max time for time series plot of intervals
+        max_points: maximum number of points of each interval type in each
+            time series plot (see mod_para_funs.rr_window)
+    Output:
+        figure
+    '''
+
+    n = len(list_data)
+    fig = make_subplots(rows=2, cols=n,
+                        shared_xaxes='rows', shared_yaxes='rows',
+                        subplot_titles=list_labels,
+                        row_heights=[0.6,0.4],
+                        horizontal_spacing=0.02,
+                        vertical_spacing=0.12)
+
+    ymax = 0
+    for j, (df_beats, df_rr, df_nib) in enumerate(list_data):
+        for code, color in zip(range(len(mp.rr_labels)), ['Blue','Red','Green','Purple']):
+            df_type = df_rr[df_rr['Type']==code]
+            idx = mp.rr_window(df_type['Time (s)'].values, df_type['RR interval (s)'].values,
+                               0, tmax_plot, max_points)
+            # Legend only for the first configuration
+            fig.add_trace(go.Scattergl(mode='markers',
+                                       x=df_type['Time (s)'].values[idx],
+                                       y=df_type['RR interval (s)'].values[idx],
+                                       marker={'color':color, 'size':5},
+                                       name=mp.rr_labels[code],
+                                       legendgroup=mp.rr_labels[code],
+                                       showlegend=(j==0)),
+                          row=1, col=j+1)
+        if len(df_rr):
+            ymax = max(ymax, df_rr['RR interval (s)'].max())
+
+        fig.add_trace(go.Bar(x=df_nib['NIB'].astype(str),
+                             y=df_nib['Probability'],
+                             width=0.8,
+                             marker_color='Blue',
+                             showlegend=False),
+                      row=2, col=j+1)
+
+    fig.update_xaxes(title='Time (s)', range=[0,tmax_plot], row=1)
+    fig.update_yaxes(range=[0,np.ceil(ymax+0.01)], fixedrange=True, row=1)
+    fig.update_yaxes(title='Interval (s)', row=1, col=1)
+    # NIB values in numerical order in all columns (a shared category axis
+    # otherwise orders them by first appearance)
+    nib_values = {str(x) for (df_beats, df_rr, df_nib) in list_data for x in df_nib['NIB']}
+    order = sorted(nib_values, key=lambda x: (not x.isdigit(), int(x) if x.isdigit() else 0))
+    fig.update_xaxes(title='NIB', type='category',
+                     categoryorder='array', categoryarray=order, row=2)
+    fig.update_yaxes(range=[-0.05,1.05], row=2)
+    fig.update_yaxes(title='Probability', row=2, col=1)
+
+    fig.update_layout(margin={'l':0,'r':0,'t':40,'b':0},
+                      height=600)
+
+    return fig
+
+
+
+def message_plot(text):
+    '''
+    Empty figure displaying a message.
+    '''
+    fig = go.Figure()
+    fig.update_layout(
+            xaxis={'visible':False},
+            yaxis={'visible':False},
+            annotations=[{'text':text,
+                          'xref':'paper',
+                          'yref':'paper',
+                          'showarrow':False,
+                          'font':{'size':15}}],
+            margin={'l':0,'r':0,'t':40,'b':0},
+            height=350)
+    return fig
+
+
 #fig2 = mp_grid_plot(df_beats, df_rr, df_nib, tmax_plot)
 #fig2.write_html('test2.html')
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Functions for parameter sweeps by continuation:
+each simulation is warm started from the final state of the previous
+parameter value, so only a short burn in is needed and the system follows
+the attractor it is on. Sweeping up and then down exposes hysteresis.
+
+@author: tbury
+"""
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+from nib_map import nib_pattern
+
+
+
+def sweep_summary(df_beats):
+    '''
+    Summary statistics of a simulation used in sweeps.
+    Input:
+        df_beats: dataframe of beats (see run_mod_para)
+    Output:
+        dictionary with
+            'Pattern': NIB pattern (see nib_map.nib_pattern)
+            'Mean NIB': mean NIB value (nan if the ectopic focus is silent)
+            'Ectopic burden': proportion of expressed beats that are ectopic
+    '''
+
+    df_nib = mp.compute_nib(df_beats)
+    if df_nib['NIB'].iloc[0]=='silence':
+        mean_nib = np.nan
+    else:
+        mean_nib = (df_nib['NIB']*df_nib['Probability']).sum()
+
+    types = df_beats['Type'].values
+    n_express = np.sum(types<mp.BEAT_XS)
+    burden = np.sum(types==mp.BEAT_E)/n_express if n_express else np.nan
+
+    return {'Pattern': nib_pattern(df_nib),
+            'Mean NIB': mean_nib,
+            'Ectopic burden': burden}
+
+
+
+def continuation_sweep(param, values,
+                       prc_tag='pure', ts=1, te=1.8, theta=0.2,
+                       tmax=1000, tburn=100, tburn_cont=20,
+                       state0=None):
+    '''
+    Sweep a parameter along a path of values, warm starting each simulation
+    from the final state of the previous one.
+
+    Input:
+        param: parameter to sweep from {'ts','te','theta'}
+        values: values of the parameter in the order they are visited
+        prc_tag, ts, te, theta: other parameters (see run_mod_para)
+        tmax: length of each simulation
+        tburn: burn in for the first simulation (if not warm started)
+        tburn_cont: burn in for simulations continued from the previous value
+        state0: state to warm start the first simulation from
+    Output:
+        df_sweep: dataframe with the summary (see sweep_summary) and burn in used at each value.
+            The attribute 'state' gives the final state of the last simulation.
+    '''
+
+    list_rows = []
+    state = state0
+    for value in values:
+        params = {'ts':ts, 'te':te, 'theta':theta}
+        params[param] = value
+        df_beats = mp.run_mod_para(prc_tag=prc_tag, tmax=tmax,
+                                   tburn=tburn if state is None else tburn_cont,
+                                   state0=state, **params)
+        state = df_beats.attrs['state']
+        list_rows.append({param:value, **sweep_summary(df_beats),
+                          'Burn in': df_beats.attrs['tburn']})
+
+    df_sweep = pd.DataFrame(list_rows)
+    df_sweep.attrs['state'] = state
+
+    return df_sweep
+
+
+
+def hysteresis_sweep(param, values, **kwargs):
+    '''
+    Continuation sweep along values and then back along the reversed values,
+    starting from the final state of the forward sweep.
+
+    Input:
+        param, values: see continuation_sweep
+        kwargs: other arguments passed to continuation_sweep
+    Output:
+        df_sweep: dataframe with the summary at each value and a column
+            'Direction' ('up' for the forward sweep and 'down' for the reverse)
+    '''
+
+    kwargs_fwd = dict(kwargs)
+    df_up = continuation_sweep(param, values, **kwargs_fwd)
+
+    kwargs_bwd = dict(kwargs, state0=df_up.attrs['state'])
+    df_down = continuation_sweep(param, values[::-1], **kwargs_bwd)
+
+    df_up['Direction'] = 'up'
+    df_down['Direction'] = 'down'
+
+    return pd.concat([df_up, df_down], ignore_index=True)
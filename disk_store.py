@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Persistent store of simulation results on disk, shared by the worker
+processes of the app on one host and kept across restarts.
+
+Entries are addressed by a hash of the parameters and the simulation
+settings, in a directory for each version of the source code of the
+simulation (code_files), so changing the simulation or the PRC functions
+means old results are never returned. Several versions can share a store
+(e.g. during a deployment): the directories of other versions are only
+deleted once unused for stale_age.
+
+Each entry is a directory with an .npy file for each array and a JSON file
+for the attributes and NIB distribution. It is written under a temporary
+name and renamed into place, so readers only ever see complete entries,
+and if two workers write the same entry the first one wins. Arrays are
+returned memory-mapped. The time of last use of an entry is its
+modification time, and the least recently used entries of a version are
+deleted when they take more than max_bytes. To avoid listing every entry on
+each write, the size is a running total (from a listing when the store is
+opened, plus the entries written since), and entries are only listed again
+when the total goes over max_bytes, or scan_interval after the last listing
+(to count the writes of other processes). Eviction then brings the size
+down to evict_fraction*max_bytes.
+
+@author: tbury
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+# Source files of the simulation (results depend on their contents)
+code_files = ['mod_para_funs.py', 'prc_functions.py', 'pure_para.py']
+
+# Time after which the directory of an unused code version is deleted (s)
+stale_age = 7*24*3600
+# Time after which the size of the store is counted again (s)
+scan_interval = 600
+# Fraction of max_bytes the store is brought down to by eviction
+evict_fraction = 0.9
+
+
+
+def code_version():
+    '''
+    Hash of the source code of the simulation
+    '''
+    h = hashlib.sha256()
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for filename in code_files:
+        with open(os.path.join(folder, filename), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+
+class DiskStore:
+    '''
+    Content-addressed store of results on disk.
+    '''
+
+    def __init__(self, root='result_cache', max_bytes=2e9):
+        '''
+        Input:
+            root: directory of the store (created if necessary)
+            max_bytes: size of the store above which old entries are deleted (bytes)
+        '''
+
+        self.root = root
+        self.max_bytes = max_bytes
+        self.version = code_version()
+        # Entries of this version
+        self.folder = os.path.join(root, self.version)
+        os.makedirs(self.folder, exist_ok=True)
+        self.remove_stale()
+        self.evict()
+
+
+    def key(self, params, sim_kwargs):
+        '''
+        Key of results
+        Input:
+            params: (prc, ts, te, theta)
+            sim_kwargs: other arguments of run_mod_para (e.g. tmax, tburn, tburn_max)
+        '''
+        prc, ts, te, theta = params
+        text = json.dumps({'prc':prc, 'ts':float(ts), 'te':float(te), 'theta':float(theta),
+                           'sim_kwargs':sim_kwargs},
+                          sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+    def has(self, params, sim_kwargs):
+        '''
+        Whether results for parameters are stored
+        '''
+        return os.path.exists(os.path.join(self.folder, self.key(params, sim_kwargs), 'meta.json'))
+
+
+    def get_arrays(self, key):
+        '''
+        Memory-mapped arrays and metadata of an entry (None if absent)
+        Output:
+            dictionary of arrays, dictionary of metadata
+        '''
+
+        folder = os.path.join(self.folder, key)
+        try:
+            with open(os.path.join(folder, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+            dic_arrays = {name: np.load(os.path.join(folder, name + '.npy'), mmap_mode='r')
+                          for name in meta['arrays']}
+            # Mark as recently used
+            os.utime(folder)
+        except (FileNotFoundError, NotADirectoryError):
+            # Absent, or deleted while reading
+            return None
+
+        return dic_arrays, meta
+
+
+    def get(self, params, sim_kwargs):
+        '''
+        Results for parameters (None if absent)
+        Output:
+            df_beats, df_rr, df_nib (as run_mod_para, compute_rr and compute_nib),
+            with columns backed by memory-mapped arrays
+        '''
+
+        entry = self.get_arrays(self.key(params, sim_kwargs))
+        if entry is None:
+            return None
+        dic_arrays, meta = entry
+
+        df_beats = pd.DataFrame({'Time': dic_arrays['times'], 'Type': dic_arrays['types']},
+                                copy=False)
+        df_beats.attrs.update(meta['attrs'])
+        df_rr = pd.DataFrame({'Time (s)': dic_arrays['rr_times'],
+                              'RR interval (s)': dic_arrays['rr_lengths'],
+                              'Type': dic_arrays['rr_types']}, copy=False)
+        df_nib = pd.DataFrame(meta['nib'])
+
+        return df_beats, df_rr, df_nib
+
+
+    def put(self, params, sim_kwargs, data):
+        '''
+        Write results for parameters
+        Input:
+            params: (prc, ts, te, theta)
+            sim_kwargs: other arguments of run_mod_para
+            data: df_beats, df_rr, df_nib
+        '''
+
+        df_beats, df_rr, df_nib = data
+        key = self.key(params, sim_kwargs)
+        folder = os.path.join(self.folder, key)
+        if os.path.exists(folder):
+            return
+
+        dic_arrays = {'times': df_beats['Time'].to_numpy(),
+                      'types': df_beats['Type'].to_numpy(),
+                      'rr_times': df_rr['Time (s)'].to_numpy(),
+                      'rr_lengths': df_rr['RR interval (s)'].to_numpy(),
+                      'rr_types': df_rr['Type'].to_numpy()}
+        meta = {'params': list(params),
+                'sim_kwargs': sim_kwargs,
+                'version': self.version,
+                'arrays': list(dic_arrays),
+                'attrs': json.loads(json.dumps(df_beats.attrs, default=float)),
+                'nib': {'NIB': [x if isinstance(x, str) else int(x) for x in df_nib['NIB']],
+                        'Probability': [float(x) for x in df_nib['Probability']]}}
+
+        # Write to a temporary directory and rename into place
+        folder_tmp = os.path.join(self.folder, 'tmp.{}.{}'.format(key, os.getpid()))
+        os.makedirs(folder_tmp, exist_ok=True)
+        for name, x in dic_arrays.items():
+            np.save(os.path.join(folder_tmp, name + '.npy'), x)
+        with open(os.path.join(folder_tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        size = sum(entry.stat().st_size for entry in os.scandir(folder_tmp))
+        try:
+            os.rename(folder_tmp, folder)
+        except OSError:
+            # Written by another worker in the meantime
+            shutil.rmtree(folder_tmp, ignore_errors=True)
+            return
+
+        # List entries only when the running total is over the limit or old
+        self.nbytes += size
+        if self.nbytes > self.max_bytes or time.monotonic()-self.t_scan > scan_interval:
+            self.evict()
+
+
+    def remove(self, key):
+        # Rename first, so readers see the entry disappear all at once
+        folder = os.path.join(self.folder, key)
+        folder_del = os.path.join(self.folder, 'del.{}.{}'.format(key, os.getpid()))
+        try:
+            os.rename(folder, folder_del)
+        except OSError:
+            return
+        shutil.rmtree(folder_del, ignore_errors=True)
+
+
+    def entries(self):
+        '''
+        Entries of this version in the store
+        Output:
+            list of (key, size in bytes, time of last use)
+        '''
+
+        list_entries = []
+        for key in os.listdir(self.folder):
+            if key.startswith(('tmp.','del.')):
+                continue
+            folder = os.path.join(self.folder, key)
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(folder))
+                list_entries.append((key, size, os.path.getmtime(folder)))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        return list_entries
+
+
+    def evict(self):
+        '''
+        Count the size of the entries, and if it is larger than max_bytes,
+        delete least recently used entries down to evict_fraction*max_bytes
+        '''
+
+        list_entries = sorted(self.entries(), key=lambda x: x[2])
+        total = sum(x[1] for x in list_entries)
+        if total > self.max_bytes:
+            for key, size, t_used in list_entries:
+                if total <= evict_fraction*self.max_bytes:
+                    break
+                self.remove(key)
+                total -= size
+        self.nbytes = total
+        self.t_scan = time.monotonic()
+        # Mark this version as in use
+        os.utime(self.folder)
+
+
+    def remove_stale(self):
+        '''
+        Delete the directories of other code versions unused for stale_age,
+        and temporary directories left by workers that crashed (older than an hour)
+        '''
+
+        for name in os.listdir(self.root):
+            folder = os.path.join(self.root, name)
+            # Only version directories (and their deletions cut short) live in root
+            if name==self.version or not (len(name)==len(self.version) or name.startswith('del.')):
+                continue
+            try:
+                if time.time()-os.path.getmtime(folder) > stale_age:
+                    # Rename first, so readers see the directory disappear all at once
+                    folder_del = os.path.join(self.root, 'del.{}.{}'.format(name, os.getpid()))
+                    os.rename(folder, folder_del)
+                    shutil.rmtree(folder_del, ignore_errors=True)
+            except OSError:
+                continue
+
+        for name in os.listdir(self.folder):
+            folder = os.path.join(self.folder, name)
+            try:
+                if name.startswith(('tmp.','del.')) and time.time()-os.path.getmtime(folder) > 3600:
+                    shutil.rmtree(folder, ignore_errors=True)
+            except FileNotFoundError:
+                continue
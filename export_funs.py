@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Functions to export beats, intervals and NIB data (df_beats, df_rr, df_nib)
+as compressed CSV, npz or Parquet.
+
+Tables are written in chunks of rows so that a large export never needs a
+second full copy of the data in memory:
+    - 'csv.gz': CSV compressed chunk by chunk and yielded as it is made,
+      so it can be streamed in a response
+    - 'npz': one array per column, each written into the zip archive of a
+      file in buffered pieces
+    - 'parquet': one row group per chunk (requires pyarrow)
+
+Beat and interval types are stored as integer codes (see mod_para_funs), so
+exports carry their labels ('s', 'e', ... and 'NN', 'NV', ...): CSV has the
+labels in place of the codes, npz keeps the codes with an array of labels
+(e.g. 'Type_labels', where code k has label Type_labels[k]), and Parquet
+stores a dictionary column.
+
+@author: tbury
+"""
+
+import zipfile
+import zlib
+
+import numpy as np
+
+import mod_para_funs as mp
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    parquet_available = True
+except ImportError:
+    parquet_available = False
+
+
+# Export formats (file extension and mimetype)
+dic_formats = {'csv.gz': 'application/gzip',
+               'npz': 'application/zip',
+               'parquet': 'application/vnd.apache.parquet'}
+
+# Number of rows written at a time
+chunk_rows = 100000
+
+# Labels of the codes in each table
+dic_labels = {'beats': {'Type': mp.beat_labels},
+              'rr': {'Type': mp.rr_labels},
+              'nib': {}}
+
+
+
+def column_values(df, col):
+    '''
+    Values of a column as an array, with mixed columns (e.g. NIB values
+    and 'silence') as strings
+    '''
+    values = df[col].to_numpy()
+    if values.dtype==object:
+        values = values.astype(str)
+    return values
+
+
+
+def csv_gz_chunks(df, chunk_rows=chunk_rows, labels=None):
+    '''
+    Gzip compressed CSV of a dataframe, made chunk by chunk
+    Input:
+        df: dataframe
+        chunk_rows: number of rows per chunk
+        labels: dictionary mapping columns of codes to arrays of their
+            labels (see dic_labels), written in place of the codes
+    Output:
+        generator of bytes
+    '''
+
+    labels = labels or {}
+    # wbits=31 gives the gzip format
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for i in range(0, max(len(df),1), chunk_rows):
+        df_chunk = df.iloc[i:i+chunk_rows]
+        if labels:
+            df_chunk = df_chunk.assign(**{col: labels[col][df_chunk[col].to_numpy()]
+                                          for col in labels})
+        text = df_chunk.to_csv(index=False, header=(i==0))
+        data = compressor.compress(text.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+
+def write_npz(df, f, labels=None):
+    '''
+    Write the columns of a dataframe as arrays in an npz archive
+    (load with np.load, keyed by column name)
+    Input:
+        df: dataframe
+        f: filename or open binary file
+        labels: dictionary mapping columns of codes to arrays of their
+            labels (see dic_labels), written as <column>_labels
+    '''
+
+    dic_arrays = {col: column_values(df, col) for col in df.columns}
+    dic_arrays.update({col + '_labels': np.asarray(x, dtype=str)
+                       for col, x in (labels or {}).items()})
+
+    with zipfile.ZipFile(f, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for key, values in dic_arrays.items():
+            with zf.open(key + '.npy', mode='w', force_zip64=True) as f_col:
+                np.lib.format.write_array(f_col, values, allow_pickle=False)
+
+
+
+def write_parquet(df, f, chunk_rows=chunk_rows, labels=None):
+    '''
+    Write a dataframe as Parquet with a row group for each chunk (requires pyarrow)
+    Input:
+        df: dataframe
+        f: filename or open binary file
+        chunk_rows: number of rows per row group
+        labels: dictionary mapping columns of codes to arrays of their
+            labels (see dic_labels), written as dictionary columns
+    '''
+
+    if not parquet_available:
+        raise ImportError('Parquet export requires pyarrow')
+
+    labels = labels or {}
+    writer = None
+    for i in range(0, max(len(df),1), chunk_rows):
+        table = pa.table({col: pa.DictionaryArray.from_arrays(
+                                   column_values(df, col)[i:i+chunk_rows], list(labels[col]))
+                              if col in labels else column_values(df, col)[i:i+chunk_rows]
+                          for col in df.columns})
+        if writer is None:
+            writer = pq.ParquetWriter(f, table.schema, compression='zstd')
+        writer.write_table(table)
+    writer.close()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Functions to fit the model of modulated parasystole to observed RR intervals.
+
+Observed and simulated data are reduced to summaries (NIB distribution,
+proportion of each interval type and quantiles of the interval lengths of
+each type), and compared with a distance between summaries. The parameters
+(ts, te, theta) are fitted for each PRC by differential evolution, with the
+candidates of all PRCs in a generation simulated as one parallel batch.
+Candidates are snapped to a grid of resolution `resolution` and cached for
+the duration of a fit, so repeated candidates are not simulated again.
+
+@author: tbury
+"""
+
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+
+
+# Quantiles used to summarise the distribution of interval lengths
+quantile_grid = np.linspace(0,1,101)
+
+
+
+def summarise(df_rr, df_nib):
+    '''
+    Summary of RR intervals and NIB values used to compare observed and
+    simulated data.
+    Input:
+        df_rr: dataframe of intervals (see compute_rr)
+        df_nib: dataframe for NIB (see compute_nib)
+    Output:
+        summary: dictionary with
+            'nib': dictionary mapping NIB values to their probability
+            'counts': number of intervals of each type (indexed by type code)
+            'quantiles': quantiles of interval lengths of each type (None if absent)
+            'mean_rr': mean interval length
+    '''
+
+    types = df_rr['Type'].values
+    lengths = df_rr['RR interval (s)'].values
+    counts = np.bincount(types, minlength=len(mp.rr_labels))
+    quantiles = [np.quantile(lengths[types==k], quantile_grid) if counts[k] else None
+                 for k in range(len(counts))]
+
+    summary = {'nib': dict(zip(df_nib['NIB'], df_nib['Probability'])),
+               'counts': counts,
+               'quantiles': quantiles,
+               'mean_rr': lengths.mean() if len(lengths) else np.nan}
+
+    return summary
+
+
+
+def summary_distance(summary_obs, summary_sim, weight_nib=1, weight_rr=1):
+    '''
+    Distance between an observed and a simulated summary, given by
+        weight_nib * (total variation distance between NIB distributions)
+      + weight_rr * (total variation distance between proportions of interval types
+                     + sum over types of proportion * Wasserstein distance between
+                       interval lengths, relative to the observed mean interval)
+    Input:
+        summary_obs, summary_sim: summaries (see summarise)
+        weight_nib, weight_rr: weights of the NIB and interval terms
+    Output:
+        dist: distance (0 for identical summaries)
+    '''
+
+    d_nib = mp.nib_distance(summary_obs['nib'], summary_sim['nib'])
+
+    n_obs = summary_obs['counts'].sum()
+    n_sim = summary_sim['counts'].sum()
+    if (n_obs==0) | (n_sim==0):
+        return weight_nib*d_nib + weight_rr*float((n_obs>0) | (n_sim>0))
+
+    p_obs = summary_obs['counts']/n_obs
+    p_sim = summary_sim['counts']/n_sim
+    d_rr = 0.5*np.abs(p_obs-p_sim).sum()
+
+    # Wasserstein-1 distance from the difference in quantile functions
+    for k in range(len(p_obs)):
+        q_obs = summary_obs['quantiles'][k]
+        q_sim = summary_sim['quantiles'][k]
+        if (q_obs is not None) & (q_sim is not None):
+            d_rr += p_obs[k]*np.abs(q_obs-q_sim).mean()/summary_obs['mean_rr']
+
+    return weight_nib*d_nib + weight_rr*d_rr
+
+
+
+def simulate_summary(args):
+    '''
+    Simulate and summarise.
+    Input:
+        args: tuple (prc_tag, ts, te, theta, tmax, tburn)
+    Output:
+        summary (see summarise)
+    '''
+
+    prc_tag, ts, te, theta, tmax, tburn = args
+    df_beats = mp.run_mod_para(ts=ts, te=te, theta=theta, prc_tag=prc_tag,
+                               tmax=tmax, tburn=tburn)
+
+    return summarise(mp.compute_rr(df_beats), mp.compute_nib(df_beats))
+
+
+
+def evaluate_batch(list_args, dic_cache, pool=None):
+    '''
+    Summaries for a batch of parameter sets, using cached summaries where available.
+    Input:
+        list_args: list of tuples (prc_tag, ts, te, theta, tmax, tburn)
+        dic_cache: summaries of previous simulations, keyed by these tuples
+            (new summaries are added)
+        pool: multiprocessing pool used to simulate in parallel (serial if None)
+    Output:
+        list of summaries
+        number of simulations run
+    '''
+
+    list_new = list(dict.fromkeys(args for args in list_args if args not in dic_cache))
+    if pool is not None:
+        list_summaries = pool.map(simulate_summary, list_new)
+    else:
+        list_summaries = [simulate_summary(args) for args in list_new]
+    dic_cache.update(zip(list_new, list_summaries))
+
+    return [dic_cache[args] for args in list_args], len(list_new)
+
+
+
+def fit_mod_para(df_rr_obs, df_nib_obs,
+                 prc_tags=('pure','a','b','c','d','e'),
+                 bounds=None,
+                 pop_size=20,
+                 n_gen=30,
+                 tmax=500,
+                 tburn='auto',
+                 resolution=0.001,
+                 weight_nib=1,
+                 weight_rr=1,
+                 n_workers=1,
+                 seed=0):
+    '''
+    Fit (ts, te, theta) for each PRC to observed data by differential evolution.
+    Input:
+        df_rr_obs: dataframe of observed intervals (see compute_rr)
+        df_nib_obs: dataframe of observed NIB (see compute_nib)
+        prc_tags: PRC functions to fit
+        bounds: range of each parameter (use equal bounds to fix a parameter).
+            Default {'ts':(0.4,1.2), 'te':(1,4), 'theta':(0.1,0.6)}
+        pop_size: population size for each PRC
+        n_gen: number of generations
+        tmax, tburn: simulation parameters (see run_mod_para)
+        resolution: parameters are rounded to multiples of resolution
+        weight_nib, weight_rr: weights in the distance (see summary_distance)
+        n_workers: number of processes used to simulate
+        seed: seed of the random number generator
+    Output:
+        df_fit: dataframe with the best parameters and distance for each PRC,
+            sorted by distance. The attributes 'wall_time', 'n_evals' and
+            'n_sims' give the time taken, number of evaluations and number of
+            simulations run (evaluations not found in the cache).
+    '''
+
+    if bounds is None:
+        bounds = {'ts':(0.4,1.2), 'te':(1,4), 'theta':(0.1,0.6)}
+    t0 = time.time()
+    rng = np.random.default_rng(seed)
+    summary_obs = summarise(df_rr_obs, df_nib_obs)
+    # Summaries of the simulations of this fit
+    dic_cache = {}
+
+    names = ['ts','te','theta']
+    low = np.array([bounds[x][0] for x in names])
+    high = np.array([bounds[x][1] for x in names])
+
+    # Differential evolution settings (DE/rand/1/bin)
+    F = 0.7
+    CR = 0.8
+
+    def snap(x):
+        x = np.clip(x, low, high)
+        return np.round(np.round(x/resolution)*resolution, 10)
+
+    def evaluate(pops):
+        list_args = [(prc_tag, *x, tmax, tburn)
+                     for prc_tag, pop in zip(prc_tags, pops) for x in pop]
+        list_summaries, n_new = evaluate_batch(list_args, dic_cache, pool)
+        dist = np.array([summary_distance(summary_obs, summary, weight_nib, weight_rr)
+                         for summary in list_summaries])
+        return dist.reshape(len(prc_tags), pop_size), n_new
+
+    pool = Pool(n_workers) if n_workers > 1 else None
+    try:
+        # Initial population for each PRC
+        pops = snap(low + rng.random((len(prc_tags), pop_size, 3))*(high-low))
+        dist, n_sims = evaluate(pops)
+        n_evals = dist.size
+
+        for gen in range(n_gen):
+            # Mutation from three distinct other members of the same population
+            idx = np.array([rng.choice(np.delete(np.arange(pop_size), i), 3, replace=False)
+                            for i in range(pop_size)])
+            mutant = pops[:,idx[:,0]] + F*(pops[:,idx[:,1]]-pops[:,idx[:,2]])
+            # Crossover (at least one parameter from the mutant)
+            cross = rng.random(pops.shape) < CR
+            j = rng.integers(3, size=pops.shape[:2])
+            np.put_along_axis(cross, j[...,None], True, axis=2)
+            trial = snap(np.where(cross, mutant, pops))
+
+            dist_trial, n_new = evaluate(trial)
+            n_sims += n_new
+            n_evals += dist_trial.size
+
+            # Selection
+            better = dist_trial <= dist
+            pops[better] = trial[better]
+            dist[better] = dist_trial[better]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # Best parameters for each PRC
+    i_best = np.argmin(dist, axis=1)
+    df_fit = pd.DataFrame({'prc_tag': list(prc_tags),
+                           'ts': pops[np.arange(len(prc_tags)), i_best, 0],
+                           'te': pops[np.arange(len(prc_tags)), i_best, 1],
+                           'theta': pops[np.arange(len(prc_tags)), i_best, 2],
+                           'Distance': dist[np.arange(len(prc_tags)), i_best]})
+    df_fit = df_fit.sort_values('Distance', ignore_index=True)
+
+    df_fit.attrs['wall_time'] = time.time()-t0
+    df_fit.attrs['n_evals'] = n_evals
+    df_fit.attrs['n_sims'] = n_sims
+
+    return df_fit
+
+
+
+
+if __name__ == '__main__':
+
+    # Fit to a simulation with known parameters
+    df_beats = mp.run_mod_para(ts=1, te=2.3, theta=0.4, prc_tag='d', tmax=500)
+    df_fit = fit_mod_para(mp.compute_rr(df_beats), mp.compute_nib(df_beats),
+                          bounds={'ts':(1,1), 'te':(1,4), 'theta':(0.1,0.6)})
+    print(df_fit)
+    print('Wall time {:.1f}s for {} evaluations ({} simulations)'.format(
+        df_fit.attrs['wall_time'], df_fit.attrs['n_evals'], df_fit.attrs['n_sims']))
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Heart rate variability (HRV) over sliding windows of an RR interval series,
+from simulations (compute_rr) or recordings (rr_data).
+
+For each window:
+    - mean interval, SDNN (standard deviation of intervals) and RMSSD (root
+      mean square of successive differences), from cumulative sums so the
+      cost does not depend on the window length
+    - LF (0.04-0.15 Hz) and HF (0.15-0.4 Hz) power and LF/HF, from Welch
+      spectra of the interval series resampled on a uniform grid (linear
+      interpolation at fs Hz). Windows and Welch segments are strided views
+      of the resampled series, and the FFTs of a batch of windows are done
+      together.
+Long series can be processed chunk by chunk with stream_hrv, which only
+keeps the intervals of windows that are not yet complete.
+
+Successive differences are only taken between consecutive intervals, so
+intervals next to beats missing from a recording are handled.
+
+@author: tbury
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import mod_para_funs as mp
+
+
+# Frequency bands (Hz)
+band_lf = (0.04, 0.15)
+band_hf = (0.15, 0.4)
+
+
+
+def resample_rr(rr_times, rr_lengths, t0, n, fs=4):
+    '''
+    Interval series on a uniform time grid (linear interpolation)
+    Input:
+        rr_times, rr_lengths: intervals (see rr_intervals)
+        t0: start of grid
+        n: number of grid points
+        fs: sampling frequency (Hz)
+    Output:
+        rr_grid: interval length at times t0 + arange(n)/fs
+    '''
+    return np.interp(t0 + np.arange(n)/fs, rr_times, rr_lengths)
+
+
+
+def welch_power(x, fs=4, nperseg=256):
+    '''
+    Welch power spectra of a batch of series (Hann window, 50% overlap,
+    mean removed from each segment)
+    Input:
+        x: array (number of series, length of series)
+        fs: sampling frequency (Hz)
+        nperseg: length of segments
+    Output:
+        freqs: frequencies (Hz)
+        psd: one-sided power spectral density of each series (s^2/Hz)
+    '''
+
+    nperseg = min(nperseg, x.shape[1])
+    segs = sliding_window_view(x, nperseg, axis=1)[:, ::nperseg-nperseg//2]
+    win = 0.5 - 0.5*np.cos(2*np.pi*np.arange(nperseg)/nperseg)
+    segs = (segs - segs.mean(axis=2, keepdims=True))*win
+    psd = (np.abs(np.fft.rfft(segs, axis=2))**2).mean(axis=1)/(fs*(win**2).sum())
+    # One-sided (double all but the zero and Nyquist frequencies)
+    psd[:, 1:(nperseg+1)//2] *= 2
+
+    return np.fft.rfftfreq(nperseg, 1/fs), psd
+
+
+
+def hrv_windows(rr_times, rr_lengths, starts, window=300, fs=4, nperseg=256, batch=256):
+    '''
+    HRV measures in windows [start, start+window)
+    Input:
+        rr_times, rr_lengths: intervals (see rr_intervals), in time order
+        starts: start time of each window
+        window: length of windows (s)
+        fs: sampling frequency of resampled series (Hz)
+        nperseg: length of Welch segments (samples)
+        batch: number of windows per batch of FFTs
+    Output:
+        df_hrv: dataframe with a row for each window with columns
+            'Time (s)' (centre of window), 'Mean RR (s)', 'SDNN (ms)',
+            'RMSSD (ms)', 'LF (ms^2)', 'HF (ms^2)' and 'LF/HF'.
+            Measures are NaN for windows with fewer than 2 intervals.
+    '''
+
+    rr_times = np.asarray(rr_times, dtype=float)
+    rr_lengths = np.asarray(rr_lengths, dtype=float)
+    starts = np.asarray(starts, dtype=float)
+
+    # Intervals in each window
+    i0 = np.searchsorted(rr_times, starts, side='left')
+    i1 = np.searchsorted(rr_times, starts+window, side='left')
+    n_rr = i1 - i0
+
+    # Mean and SDNN from cumulative sums
+    cs = np.concatenate(([0], np.cumsum(rr_lengths)))
+    cs2 = np.concatenate(([0], np.cumsum(rr_lengths**2)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_rr = (cs[i1]-cs[i0])/n_rr
+        sdnn = np.sqrt(np.maximum((cs2[i1]-cs2[i0]) - n_rr*mean_rr**2, 0)/(n_rr-1))
+
+    # RMSSD from successive differences of consecutive intervals
+    # (difference k is between intervals k and k+1)
+    consecutive = np.isclose(np.diff(rr_times), rr_lengths[1:])
+    d2 = np.where(consecutive, np.diff(rr_lengths)**2, 0)
+    cd = np.concatenate(([0], np.cumsum(d2)))
+    cn = np.concatenate(([0], np.cumsum(consecutive)))
+    j0 = i0
+    j1 = np.maximum(i1-1, i0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rmssd = np.sqrt((cd[j1]-cd[j0])/(cn[j1]-cn[j0]))
+
+    # Spectral power from the resampled series
+    lf = np.full(len(starts), np.nan)
+    hf = np.full(len(starts), np.nan)
+    n_win = int(round(window*fs))
+    if len(starts) and len(rr_times):
+        n_grid = int(round((starts[-1]-starts[0])*fs)) + n_win
+        rr_grid = resample_rr(rr_times, rr_lengths, starts[0], n_grid, fs=fs)
+        offsets = np.round((starts-starts[0])*fs).astype(int)
+        views = sliding_window_view(rr_grid, n_win)
+        for b in range(0, len(starts), batch):
+            freqs, psd = welch_power(views[offsets[b:b+batch]], fs=fs, nperseg=nperseg)
+            df = freqs[1]-freqs[0]
+            in_lf = (freqs>=band_lf[0]) & (freqs<band_lf[1])
+            in_hf = (freqs>=band_hf[0]) & (freqs<band_hf[1])
+            lf[b:b+batch] = psd[:, in_lf].sum(axis=1)*df
+            hf[b:b+batch] = psd[:, in_hf].sum(axis=1)*df
+
+    valid = n_rr >= 2
+    df_hrv = pd.DataFrame({'Time (s)': starts + window/2,
+                           'Mean RR (s)': np.where(valid, mean_rr, np.nan),
+                           'SDNN (ms)': np.where(valid, 1000*sdnn, np.nan),
+                           'RMSSD (ms)': np.where(valid, 1000*rmssd, np.nan),
+                           'LF (ms^2)': np.where(valid, 1e6*lf, np.nan),
+                           'HF (ms^2)': np.where(valid, 1e6*hf, np.nan)})
+    with np.errstate(invalid='ignore', divide='ignore'):
+        df_hrv['LF/HF'] = df_hrv['LF (ms^2)']/df_hrv['HF (ms^2)']
+
+    return df_hrv
+
+
+
+def compute_hrv(df_rr, window=300, step=30, nn_only=False, **kwargs):
+    '''
+    HRV measures over sliding windows of an interval series
+    Input:
+        df_rr: dataframe of intervals (see compute_rr)
+        window: length of windows (s)
+        step: time between window starts (s)
+        nn_only: if True, only NN intervals (between two sinus beats) are used
+        kwargs: passed to hrv_windows (fs, nperseg, batch)
+    Output:
+        df_hrv: dataframe of HRV measures (see hrv_windows)
+    '''
+
+    if nn_only:
+        df_rr = df_rr[df_rr['Type']==mp.RR_SS]
+    rr_times = df_rr['Time (s)'].to_numpy()
+    rr_lengths = df_rr['RR interval (s)'].to_numpy()
+    if len(rr_times)==0:
+        return hrv_windows(rr_times, rr_lengths, [], window=window, **kwargs)
+
+    # Windows that fit within the series
+    starts = rr_times[0] + step*np.arange(max(int((rr_times[-1]-rr_times[0]-window)//step)+1, 0))
+
+    return hrv_windows(rr_times, rr_lengths, starts, window=window, **kwargs)
+
+
+
+def stream_hrv(chunks, window=300, step=30, **kwargs):
+    '''
+    HRV measures over sliding windows of an interval series given in chunks
+    (e.g. from rr_data.read_rr_chunks), keeping only the intervals of windows
+    that are not yet complete.
+    Input:
+        chunks: iterable of (rr_times, rr_lengths) arrays, in time order
+        window, step: see compute_hrv
+        kwargs: passed to hrv_windows (fs, nperseg, batch)
+    Output:
+        generator of df_hrv for the windows completed by each chunk
+    '''
+
+    buf_t = np.zeros(0)
+    buf_rr = np.zeros(0)
+    t_next = None
+
+    for rr_times, rr_lengths in chunks:
+        buf_t = np.concatenate((buf_t, rr_times))
+        buf_rr = np.concatenate((buf_rr, rr_lengths))
+        if len(buf_t)==0:
+            continue
+        if t_next is None:
+            t_next = buf_t[0]
+
+        # Windows completed by this chunk
+        n_new = max(int((buf_t[-1]-t_next-window)//step)+1, 0)
+        if n_new > 0:
+            starts = t_next + step*np.arange(n_new)
+            yield hrv_windows(buf_t, buf_rr, starts, window=window, **kwargs)
+            t_next = starts[-1] + step
+
+        # Keep intervals from the start of the next window (and the one
+        # before, which the resampled series interpolates from)
+        i = max(np.searchsorted(buf_t, t_next, side='left')-1, 0)
+        buf_t = buf_t[i:]
+        buf_rr = buf_rr[i:]
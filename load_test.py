@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Load test of the dash app with simulated users dragging sliders.
+
+Each user is a small client that behaves like the dash renderer: it reads
+the layout and callbacks from the server, changes a component value, posts
+the callbacks with that value as input to /_dash-update-component, applies
+their outputs and posts the callbacks that depend on those outputs in turn
+(including polling the refine_interval while a preview is shown). As in the
+browser, the callbacks triggered by the same change are posted concurrently
+(a thread for each), so a user can have several requests in flight. Users
+alternate between
+    - drag bursts: several consecutive steps of ts_slider, te_slider or theta_slider
+    - switches of the PRC dropdown
+with pauses in between. Latency is recorded for each callback (named by
+its outputs), and the report gives the number of requests, p50/p95/p99
+latency, throughput and error rate of each.
+
+Only the standard library is used, so the load generator can run anywhere.
+
+Usage:
+    python load_test.py <url> [n_users] [duration]
+        (test a running server, e.g. http://127.0.0.1:8050)
+    python load_test.py compare <mode_1> <mode_2> [n_users] [duration]
+        (start the app locally in each serving mode, e.g. dev and production,
+         and compare them with the same user behaviour)
+
+@author: tbury
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import socket
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+
+
+# Polled components and their interval (s)
+dic_intervals = {'refine_interval':0.1}
+max_polls = 600
+
+# User behaviour
+p_dropdown = 0.2 # probability that an action is a dropdown switch
+burst_steps = (3,12) # range of number of steps in a drag burst
+step_pause = (0.03,0.08) # range of pause between steps of a drag (s)
+think_time = (1,3) # range of pause between actions (s)
+slider_step = 0.01
+
+
+
+def request_json(url, body=None, timeout=60):
+    '''
+    GET (or POST body as JSON) and decode the response
+    Output:
+        status code, decoded JSON (None if empty)
+    '''
+    data = None if body is None else json.dumps(body).encode()
+    req = urllib.request.Request(url, data=data, headers={'Content-Type':'application/json'})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        text = response.read()
+        return response.status, (json.loads(text) if text else None)
+
+
+
+def layout_props(node, props=None):
+    '''
+    Properties of each component with an id in the layout
+    Output:
+        dictionary mapping (id, property) to value
+    '''
+    if props is None:
+        props = {}
+    if isinstance(node, list):
+        for child in node:
+            layout_props(child, props)
+    elif isinstance(node, dict) and 'props' in node:
+        if 'id' in node['props']:
+            for prop, value in node['props'].items():
+                props[(node['props']['id'], prop)] = value
+        layout_props(node['props'].get('children'), props)
+    return props
+
+
+
+def parse_outputs(output):
+    '''
+    Outputs of a callback from its name in /_dash-dependencies
+    ('id.prop' or '..id1.prop1...id2.prop2..')
+    Output:
+        list of (id, property), whether the callback has multiple outputs
+    '''
+    multi = output.startswith('..')
+    parts = output.strip('.').split('...') if multi else [output]
+    return [tuple(x.rsplit('.',1)) for x in parts], multi
+
+
+
+class DashUser:
+    '''
+    Simulated user of a dash app.
+    '''
+
+    def __init__(self, url, deps, layout, stats, seed):
+        self.url = url
+        self.deps = deps
+        self.props = dict(layout)
+        self.stats = stats
+        self.rng = random.Random(seed)
+        # Outputs are applied by the threads posting callbacks
+        self.lock = threading.Lock()
+
+
+    def callback_body(self, dep, changed):
+        # Request body of a callback with the current property values
+        outputs, multi = parse_outputs(dep['output'])
+        def value_list(items):
+            return [{'id':x['id'], 'property':x['property'],
+                     'value':self.props.get((x['id'], x['property']))} for x in items]
+        return {'output': dep['output'],
+                'outputs': ([{'id':x[0], 'property':x[1]} for x in outputs] if multi
+                            else {'id':outputs[0][0], 'property':outputs[0][1]}),
+                'inputs': value_list(dep['inputs']),
+                'state': value_list(dep['state']),
+                'changedPropIds': ['{}.{}'.format(*x) for x in changed]}
+
+
+    def post_callback(self, dep, body):
+        # Post one callback and apply its outputs
+        t0 = time.perf_counter()
+        try:
+            status, response = request_json(self.url + '/_dash-update-component', body)
+            error = False
+        except urllib.error.HTTPError as e:
+            status, response, error = e.code, None, e.code!=204
+        except (urllib.error.URLError, socket.timeout, ConnectionError):
+            status, response, error = None, None, True
+        self.stats.record(dep['output'], time.perf_counter()-t0, error)
+
+        # Apply outputs (figures are not kept as no callback uses them)
+        updated = []
+        if status==200 and response is not None:
+            with self.lock:
+                for comp_id, dic_props in response['response'].items():
+                    for prop, value in dic_props.items():
+                        if prop!='figure' and self.props.get((comp_id, prop))!=value:
+                            self.props[(comp_id, prop)] = value
+                            updated.append((comp_id, prop))
+        return updated
+
+
+    def post_callbacks(self, list_calls):
+        '''
+        Post callbacks concurrently (with the property values before any of
+        them returns) and apply their outputs
+        Input:
+            list_calls: list of (dep, list of changed (id, property))
+        Output:
+            list of (id, property) updated by the callbacks
+        '''
+        bodies = [self.callback_body(dep, changed) for dep, changed in list_calls]
+        list_updated = [[] for _ in list_calls]
+        def post(i):
+            list_updated[i] = self.post_callback(list_calls[i][0], bodies[i])
+        threads = [threading.Thread(target=post, args=(i,), daemon=True)
+                   for i in range(len(list_calls))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [x for updated in list_updated for x in updated]
+
+
+    def propagate(self, changed):
+        # Post callbacks with changed inputs, then those depending on their outputs
+        while changed:
+            list_calls = []
+            for dep in self.deps:
+                triggers = [x for x in changed
+                            if any((i['id'], i['property'])==x for i in dep['inputs'])]
+                if triggers:
+                    list_calls.append((dep, triggers))
+            changed = self.post_callbacks(list_calls)
+
+        # Poll intervals while they are switched on (for at most max_polls)
+        for comp_id, dt in dic_intervals.items():
+            n_polls = 0
+            while self.props.get((comp_id, 'disabled'))==False and n_polls < max_polls:
+                time.sleep(dt)
+                n_polls += 1
+                n = self.props.get((comp_id, 'n_intervals')) or 0
+                self.props[(comp_id, 'n_intervals')] = n+1
+                self.propagate([(comp_id, 'n_intervals')])
+
+
+    def start(self):
+        # Initial callbacks fired on page load (those not waiting on other callbacks)
+        outputs = set(x for dep in self.deps for x in parse_outputs(dep['output'])[0])
+        list_calls = [(dep, []) for dep in self.deps
+                      if not any((i['id'], i['property']) in outputs for i in dep['inputs'])]
+        self.propagate(self.post_callbacks(list_calls))
+
+
+    def set_value(self, comp_id, value):
+        self.props[(comp_id, 'value')] = value
+        self.propagate([(comp_id, 'value')])
+
+
+    def drag(self):
+        # Drag burst on a random slider
+        comp_id = self.rng.choice(['ts_slider','te_slider','theta_slider'])
+        sign = self.rng.choice([-1,1])
+        lo = self.props.get((comp_id, 'min'), -float('inf'))
+        hi = self.props.get((comp_id, 'max'), float('inf'))
+        for i in range(self.rng.randint(*burst_steps)):
+            value = round(self.props[(comp_id, 'value')] + sign*slider_step, 2)
+            if not lo <= value <= hi:
+                break
+            self.set_value(comp_id, value)
+            time.sleep(self.rng.uniform(*step_pause))
+
+
+    def switch(self):
+        # Choose another PRC from the dropdown
+        options = [x['value'] for x in self.props[('prc_drop_down', 'options')]]
+        current = self.props[('prc_drop_down', 'value')]
+        self.set_value('prc_drop_down', self.rng.choice([x for x in options if x!=current]))
+
+
+    def run(self, t_end):
+        self.start()
+        while time.time() < t_end:
+            if self.rng.random() < p_dropdown:
+                self.switch()
+            else:
+                self.drag()
+            time.sleep(min(self.rng.uniform(*think_time), max(t_end-time.time(), 0)))
+
+
+
+class Stats:
+    '''
+    Latency and errors of each callback (shared by all users)
+    '''
+
+    def __init__(self):
+        self.dic_latency = {}
+        self.dic_errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, latency, error):
+        with self.lock:
+            self.dic_latency.setdefault(name, []).append(latency)
+            self.dic_errors[name] = self.dic_errors.get(name, 0) + error
+
+    def report(self, wall_time):
+        '''
+        Output:
+            list of rows (callback, requests, p50, p95, p99 (ms), requests/s, error rate)
+        '''
+        rows = []
+        for name in sorted(self.dic_latency):
+            x = sorted(self.dic_latency[name])
+            q = lambda p: 1000*x[min(int(p*len(x)), len(x)-1)]
+            rows.append((name.strip('.').replace('...', ', '), len(x), q(0.5), q(0.95), q(0.99),
+                         len(x)/wall_time, self.dic_errors[name]/len(x)))
+        n_total = sum(len(x) for x in self.dic_latency.values())
+        x = sorted(latency for v in self.dic_latency.values() for latency in v)
+        if x:
+            q = lambda p: 1000*x[min(int(p*len(x)), len(x)-1)]
+            rows.append(('all', n_total, q(0.5), q(0.95), q(0.99), n_total/wall_time,
+                         sum(self.dic_errors.values())/n_total))
+        return rows
+
+
+
+def run_load_test(url, n_users=50, duration=60, seed=0):
+    '''
+    Run simulated users against a server.
+    Input:
+        url: address of the app
+        n_users: number of concurrent users
+        duration: length of the test (s)
+        seed: seed of user behaviour (users behave the same for the same seed)
+    Output:
+        rows of report (see Stats.report)
+    '''
+
+    url = url.rstrip('/')
+    status, deps = request_json(url + '/_dash-dependencies')
+    status, layout = request_json(url + '/_dash-layout')
+    layout = layout_props(layout)
+
+    stats = Stats()
+    t_start = time.time()
+    t_end = t_start + duration
+    users = [DashUser(url, deps, layout, stats, seed=seed*100000+i) for i in range(n_users)]
+    threads = [threading.Thread(target=user.run, args=(t_end,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return stats.report(time.time()-t_start)
+
+
+
+def start_server(mode, port):
+    '''
+    Start the app locally in a serving mode (see MP_SERVE_MODE in app.py)
+    Output:
+        process
+    '''
+
+    env = dict(os.environ, MP_SERVE_MODE=mode)
+    code = 'import app; app.server.run(port={}, threaded=True)'.format(port)
+    # New session, so that the server and its worker processes can be stopped together
+    process = subprocess.Popen([sys.executable, '-c', code], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+
+    # Wait until the server responds
+    for i in range(600):
+        try:
+            request_json('http://127.0.0.1:{}/_dash-dependencies'.format(port), timeout=1)
+            return process
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            if process.poll() is not None:
+                raise RuntimeError('Server in mode {} failed to start'.format(mode))
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError('Server in mode {} did not respond'.format(mode))
+
+
+
+def stop_server(process):
+    # Stop the server and its worker processes
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait()
+
+
+
+def compare_modes(modes, n_users=50, duration=60, port=8060, seed=0):
+    '''
+    Run the same load test against the app in each serving mode
+    Output:
+        dictionary mapping mode to rows of report
+    '''
+
+    dic_reports = {}
+    for mode in modes:
+        process = start_server(mode, port)
+        try:
+            dic_reports[mode] = run_load_test('http://127.0.0.1:{}'.format(port),
+                                              n_users=n_users, duration=duration, seed=seed)
+        finally:
+            stop_server(process)
+
+    return dic_reports
+
+
+
+def print_report(rows, title=''):
+    width = max([len(row[0]) for row in rows] + [8])
+    print(title)
+    print('{:<{w}} {:>8} {:>9} {:>9} {:>9} {:>8} {:>7}'.format(
+        'Callback', 'Requests', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Req/s', 'Errors', w=width))
+    for row in rows:
+        print('{:<{w}} {:>8} {:>9.1f} {:>9.1f} {:>9.1f} {:>8.2f} {:>7.1%}'.format(*row, w=width))
+    print()
+
+
+
+if __name__ == '__main__':
+
+    if sys.argv[1]=='compare':
+        modes = sys.argv[2:4]
+        n_users = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+        duration = float(sys.argv[5]) if len(sys.argv) > 5 else 60
+        dic_reports = compare_modes(modes, n_users=n_users, duration=duration)
+        for mode in modes:
+            print_report(dic_reports[mode], 'Mode: {}'.format(mode))
+    else:
+        n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+        duration = float(sys.argv[3]) if len(sys.argv) > 3 else 60
+        print_report(run_load_test(sys.argv[1], n_users=n_users, duration=duration),
+                     'Server: {}'.format(sys.argv[1]))
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Command line interface to run simulations of modulated parasystole without
+the app, for batch pipelines. Only numpy (and the standard library) is
+imported, so a process starts in about the time it takes to import numpy.
+
+Commands:
+    run: a single simulation, writing the beats, intervals and NIB
+        distribution (.npz), or the beats (.csv)
+    sweep: simulations over a grid of ts, te and theta, writing a summary of
+        each (burn in, number of beats, ectopic fraction, mean interval, NIB
+        pattern and NIB distribution) (.npz or .csv)
+    ensemble: simulations at one parameter set from random initial states
+        (phase of the ectopic focus and te_mod/te at the first sinus beat, as
+        warm start states), writing a summary of each member (.npz or .csv),
+        and with --beats the beats of all members (.npz)
+Values of ts, te and theta in a sweep are given as a single value (2.3), a
+list (2.1,2.3) or a range start:stop:step (1.5:3.5:0.1, stop included).
+With --sinus-times, the sinus beats follow a schedule saved by
+sinus_schedule.py (memory-mapped) in place of the periodic rhythm.
+Sweeps run in one go; for long sweeps that can be resumed after a crash
+and shared between machines, see sweep_jobs.py.
+
+Examples:
+    python mod_para_cli.py run --prc a --te 2.3 --theta 0.4 -o run.npz
+    python mod_para_cli.py sweep --prc d --te 1.5:3.5:0.05 --theta 0.2,0.4 --workers 4 -o sweep.csv
+    python mod_para_cli.py ensemble --prc e --te 2.85 --n 200 --seed 1 -o ensemble.npz
+
+@author: tbury
+"""
+
+import sys
+import csv
+import argparse
+
+import numpy as np
+
+import mod_para_funs as mp
+import sinus_schedule as ss
+
+
+# NIB values above max_nib are counted as max_nib in summaries
+max_nib = 20
+# Minimum probability of NIB values in NIB patterns (as nib_map.nib_pattern)
+tol_pattern = 0.01
+
+
+
+def parse_values(text):
+    '''
+    Values of a parameter from '2.3', '2.1,2.3' or 'start:stop:step' (stop included)
+    '''
+    if ':' in text:
+        start, stop, step = (float(x) for x in text.split(':'))
+        n = int(np.floor((stop-start)/step + 1e-9)) + 1
+        return np.round(start + step*np.arange(n), 10)
+    return np.array([float(x) for x in text.split(',')])
+
+
+
+def parse_tburn(text):
+    return text if text=='auto' else float(text)
+
+
+
+def summarise(times, types):
+    '''
+    Summary of a simulation
+    Input:
+        times, types: beats (see simulate_beats)
+    Output:
+        dictionary with 'beats' (number of beats), 'ectopic_fraction'
+        (fraction of expressed beats that are ectopic), 'mean_rr' (mean
+        interval between expressed beats), 'nib_pattern' (NIB values with
+        probability at least tol_pattern, or 'silence') and 'nib' (array of
+        probabilities of NIB values 0 to max_nib)
+    '''
+
+    expressed = types < mp.BEAT_XS
+    n_expressed = max(expressed.sum(), 1)
+    t_expressed = times[expressed]
+
+    values, probabilities = mp.nib_probabilities(mp.nib_values(types))
+    nib = np.zeros(max_nib+1)
+    np.add.at(nib, np.minimum(values, max_nib), probabilities)
+    pattern = ','.join(str(x) for x in values[probabilities >= tol_pattern])
+
+    return {'beats': len(times),
+            'ectopic_fraction': (types==mp.BEAT_E).sum()/n_expressed,
+            'mean_rr': (t_expressed[-1]-t_expressed[0])/(len(t_expressed)-1)
+                       if len(t_expressed) > 1 else np.nan,
+            'nib_pattern': pattern if len(values) > 0 else 'silence',
+            'nib': nib}
+
+
+
+def simulate_point(args):
+    '''
+    Simulate and summarise (for the worker processes of sweep and ensemble)
+    Input:
+        args: tuple (kwargs of simulate_beats, whether to return the beats),
+            with the filename of the sinus schedule as sinus_times
+    Output:
+        summary (see summarise) with 'tburn', and 'times' and 'types' if requested
+    '''
+
+    kwargs, keep_beats = args
+    # Sinus schedules are passed as filenames and memory-mapped in each process
+    if kwargs.get('sinus_times') is not None:
+        kwargs = dict(kwargs, sinus_times=ss.load_schedule(kwargs['sinus_times']))
+    times, types, info = mp.simulate_beats(**kwargs)
+    summary = summarise(times, types)
+    summary['tburn'] = info['tburn']
+    if keep_beats:
+        summary['times'] = times
+        summary['types'] = types
+    return summary
+
+
+
+def map_points(list_args, workers=1):
+    # Run simulate_point over a list of arguments, in worker processes if workers > 1
+    if workers > 1:
+        from multiprocessing import Pool
+        with Pool(workers) as pool:
+            return pool.map(simulate_point, list_args, chunksize=max(len(list_args)//(4*workers), 1))
+    return [simulate_point(args) for args in list_args]
+
+
+
+def summary_table(dic_columns, list_summaries):
+    # Columns of parameters followed by the summaries
+    dic_table = dict(dic_columns)
+    for col in ['tburn', 'beats', 'ectopic_fraction', 'mean_rr', 'nib_pattern']:
+        dic_table[col] = np.array([x[col] for x in list_summaries])
+    dic_table['nib'] = np.array([x['nib'] for x in list_summaries]).reshape(-1, max_nib+1)
+    return dic_table
+
+
+
+def write_table(dic_table, path):
+    '''
+    Write a table of columns as .npz (arrays) or .csv (one column per NIB value)
+    '''
+
+    if path.endswith('.csv'):
+        cols = [col for col in dic_table if col!='nib']
+        nib = dic_table['nib']
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(cols + ['nib_{}'.format(k) for k in range(nib.shape[1])])
+            for i in range(len(nib)):
+                writer.writerow([dic_table[col][i] for col in cols] + list(nib[i]))
+    else:
+        np.savez_compressed(path, **dic_table)
+
+
+
+def cmd_run(args):
+    sinus_times = None if args.sinus_times is None else ss.load_schedule(args.sinus_times)
+    times, types, info = mp.simulate_beats(ts=args.ts, te=args.te, theta=args.theta,
+                                           tmax=args.tmax, tburn=args.tburn,
+                                           tburn_max=args.tburn_max, prc_tag=args.prc,
+                                           sinus_times=sinus_times)
+
+    if args.out.endswith('.csv'):
+        with open(args.out, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Time', 'Type'])
+            writer.writerows(zip(times, mp.beat_labels[types]))
+    else:
+        rr_times, rr_lengths, rr_types = mp.rr_intervals(times, types)
+        nib = mp.nib_values(types)
+        values, probabilities = mp.nib_probabilities(nib)
+        np.savez_compressed(args.out,
+                            times=times, types=types,
+                            rr_times=rr_times, rr_lengths=rr_lengths, rr_types=rr_types,
+                            nib=nib, nib_values=values, nib_probabilities=probabilities,
+                            tburn=info['tburn'],
+                            state=np.array([info['state']['phase'], info['state']['te_ratio'],
+                                            info['state']['sinus_type']]))
+
+
+
+def cmd_sweep(args):
+    ts, te, theta = np.meshgrid(parse_values(args.ts), parse_values(args.te),
+                                parse_values(args.theta), indexing='ij')
+    ts, te, theta = ts.ravel(), te.ravel(), theta.ravel()
+
+    list_args = [({'ts':ts[i], 'te':te[i], 'theta':theta[i], 'prc_tag':args.prc,
+                   'tmax':args.tmax, 'tburn':args.tburn, 'tburn_max':args.tburn_max,
+                   'sinus_times':args.sinus_times}, False)
+                 for i in range(len(ts))]
+    list_summaries = map_points(list_args, args.workers)
+
+    write_table(summary_table({'ts':ts, 'te':te, 'theta':theta}, list_summaries), args.out)
+
+
+
+def cmd_ensemble(args):
+    rng = np.random.default_rng(args.seed)
+    phase = rng.uniform(0, 1, args.n)
+    te_ratio = rng.uniform(*args.ratio_range, args.n)
+
+    list_args = [({'ts':args.ts, 'te':args.te, 'theta':args.theta, 'prc_tag':args.prc,
+                   'tmax':args.tmax, 'tburn':args.tburn, 'tburn_max':args.tburn_max,
+                   'sinus_times':args.sinus_times,
+                   'state0':{'phase':phase[i], 'te_ratio':te_ratio[i], 'sinus_type':mp.BEAT_S}},
+                  args.beats)
+                 for i in range(args.n)]
+    list_summaries = map_points(list_args, args.workers)
+
+    dic_table = summary_table({'member':np.arange(args.n), 'phase':phase, 'te_ratio':te_ratio},
+                              list_summaries)
+    if args.beats:
+        if args.out.endswith('.csv'):
+            sys.exit('--beats requires an .npz output')
+        # Beats of member i are times[offsets[i]:offsets[i+1]]
+        dic_table['times'] = np.concatenate([x['times'] for x in list_summaries])
+        dic_table['types'] = np.concatenate([x['types'] for x in list_summaries])
+        dic_table['offsets'] = np.concatenate(([0], np.cumsum([len(x['times']) for x in list_summaries])))
+    write_table(dic_table, args.out)
+
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description='Simulate modulated parasystole')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub, parameter_type):
+        sub.add_argument('--prc', default='pure', choices=sorted(mp.dic_prc),
+                         help='phase response curve')
+        sub.add_argument('--ts', type=parameter_type, default=parameter_type('1'),
+                         help='sinus period')
+        sub.add_argument('--te', type=parameter_type, default=parameter_type('1.8'),
+                         help='ectopic period')
+        sub.add_argument('--theta', type=parameter_type, default=parameter_type('0.2'),
+                         help='refractory period')
+        sub.add_argument('--tmax', type=float, default=1000,
+                         help='length of simulation after burn in')
+        sub.add_argument('--tburn', type=parse_tburn, default=100,
+                         help="burn in period, or 'auto'")
+        sub.add_argument('--tburn-max', type=float, default=500,
+                         help="maximum burn in period with --tburn auto")
+        sub.add_argument('--sinus-times',
+                         help='sinus schedule (.npy, see sinus_schedule.py) in place of a periodic sinus rhythm')
+        sub.add_argument('-o', '--out', required=True,
+                         help='output file (.npz or .csv)')
+
+    sub = subparsers.add_parser('run', help='single simulation')
+    add_common(sub, float)
+    sub.set_defaults(func=cmd_run)
+
+    sub = subparsers.add_parser('sweep', help='simulations over a grid of ts, te and theta')
+    # Parameters are parsed into arrays by cmd_sweep
+    add_common(sub, str)
+    sub.add_argument('--workers', type=int, default=1, help='number of processes')
+    sub.set_defaults(func=cmd_sweep)
+
+    sub = subparsers.add_parser('ensemble', help='simulations from random initial states')
+    add_common(sub, float)
+    sub.add_argument('--n', type=int, default=100, help='number of members')
+    sub.add_argument('--seed', type=int, default=0, help='seed of initial states')
+    sub.add_argument('--ratio-range', type=float, nargs=2, default=(0.7,1.3),
+                     help='range of initial te_mod/te')
+    sub.add_argument('--beats', action='store_true', help='write the beats of each member')
+    sub.add_argument('--workers', type=int, default=1, help='number of processes')
+    sub.set_defaults(func=cmd_ensemble)
+
+    return parser
+
+
+
+if __name__ == '__main__':
+    args = make_parser().parse_args()
+    args.func(args)
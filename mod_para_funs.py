@@ -8,13 +8,21 @@ Functions to
     - Simulate modulated parasytole according to Courtemanche et al. (1989)
     - Compute the NIB (number of intervening sinus beats)
     - Compute the intervals between each type of beat
+
+pandas is only imported by the functions that return dataframes, so the
+array functions (simulate_beats, nib_values, nib_probabilities,
+rr_intervals) can be used with numpy alone (see mod_para_cli.py).
     
 @author: tbury
 """
 
 
+import warnings
+from collections import Counter
+from functools import partial
+from statistics import NormalDist
+
 import numpy as np
-import pandas as pd
 
 # Import phase response curve functions
 import prc_functions as pf
@@ -28,99 +36,456 @@ dic_prc = {'a':pf.prc_a,'b':pf.prc_b,'c':pf.prc_c,'d':pf.prc_d,
            }
 
 
+# Integer codes for beat types (string labels are only used for display)
+BEAT_S = 0  # expressed sinus beat
+BEAT_E = 1  # expressed ectopic beat
+BEAT_XS = 2 # concealed sinus beat
+BEAT_XE = 3 # concealed ectopic beat
+beat_labels = np.array(['s','e','xs','xe'])
+
+# Integer codes for interval types between two expressed beats,
+# computed as 2*(first beat code) + (second beat code)
+RR_SS = 0 # NN interval
+RR_SE = 1 # NV interval
+RR_ES = 2 # VN interval
+RR_EE = 3 # VV interval
+rr_labels = np.array(['NN','NV','VN','VV'])
+
 
-def run_mod_para(ts=1, te=1.8, theta=0.2, tmax=1000, tburn=100, prc_tag='pure'):
+
+def simulate_beats(ts=1, te=1.8, theta=0.2, tmax=1000, tburn=100, prc_tag='pure',
+                   analytic=True, state0=None,
+                   tburn_max=500, burn_window=25, burn_alpha=0.01, burn_checks=2,
+                   burn_min_values=20, burn_window_max=100,
+                   sinus_times=None, prc_params=None):
     '''
-    Function to simulate modulated parasystole.
-    Notation of beat types
-    s: expressed sinus beat
-    e: expressed ectopic beat
-    xs: concealed sinus beat
-    xe: concealed ectopic beat
+    Array version of run_mod_para.
     
     Input:
-        ts: period of sinus rhythm
-        te: period of ectopic rhythm
-        theta: refractory period of the heart
-        tmax: time to run simulation up to
-        tburn: length of burn in period that is discarded (to remove transients)
-        prc: phase response curve from {'pure','a','b','c','d','e'} - see Courtemanche for functions
+        see run_mod_para
+        burn_window: length of the windows compared when tburn='auto'
+        burn_alpha: significance level of the test of whether the NIB
+            values of a window differ from those of the earlier windows
+            (see nib_windows_agree)
+        burn_checks: number of consecutive agreements required to end burn in
+        burn_min_values: windows are extended (by burn_window, up to
+            burn_window_max) until they hold this many NIB values
     Output:
-        df_beats: pandas dataframe of beats at each time
+        times: array of beat times (burn in removed and start time reset to zero)
+        types: int8 array of beat type codes (BEAT_S, BEAT_E, BEAT_XS, BEAT_XE)
+        info: dictionary with
+            'state': final state of the system (see final_state)
+            'tburn': length of burn in period used
     '''
     
+    # Sinus beats of the schedule up to the first at or after the end of the
+    # simulation (the maximum burn in if adaptive), relative to the first
+    if sinus_times is not None:
+        t_end = tmax + (tburn_max if tburn=='auto' else tburn)
+        sinus_times = schedule_window(sinus_times, t_end)
+        ts = float(sinus_times[1] - sinus_times[0]) if len(sinus_times) > 1 else ts
+    
+    # Pure parasystole has a closed form solution (see pure_para.py)
+    # (there are no transients, so no burn in is needed with tburn='auto')
+    if analytic and prc_tag=='pure' and state0 is None:
+        if sinus_times is not None:
+            check_schedule(sinus_times[-1], 0 if tburn=='auto' else tburn, tmax)
+        import pure_para
+        return pure_para.pure_beats(ts=ts, te=te, theta=theta, tmax=tmax,
+                                    tburn=0 if tburn=='auto' else tburn,
+                                    sinus_times=sinus_times)
     
-    # List of beats (tuple (time,beat_type))
-    list_beats = []
+    # Beat times and beat type codes
+    list_times = []
+    list_types = []
     
-    # Assign PRC curve
+    # Assign PRC curve (with its parameters changed if given)
     prc = dic_prc[prc_tag]
+    if prc_params:
+        prc = partial(prc, **prc_params)
     
     # Set base modulated time to be equal to te
     te_mod = te
     
     # Simulate beats
-    # Assume an expressed sinus beat at t=0
+    t_sinus = 0
+    
+    # Index of t_sinus in the schedule
+    if sinus_times is not None:
+        i_sinus = 0
+        n_sinus = len(sinus_times)
+    
+    # Warm start: sinus beat at t=0 with the ectopic focus at the phase
+    # and modulation given by state0
+    if state0 is not None:
+        list_times.append(t_sinus)
+        list_types.append(state0['sinus_type'])
+        te_mod = state0['te_ratio']*te
+        t_ectopic = -state0['phase']*te_mod
+    
+    # Otherwise assume an expressed sinus beat at t=0
     # and an ectopic beat at t= theta+(ts-theta)/2 (ensures it is expressed)
+    else:
+        list_times.append(t_sinus)
+        list_types.append(BEAT_S)
+        t_ectopic = theta + (ts-theta)/(2+0.01*np.pi)
+        list_times.append(t_ectopic)
+        list_types.append(BEAT_E)
     
-    t_sinus = 0
-    list_beats.append((t_sinus,'s'))
-    t_ectopic = theta + (ts-theta)/(2+0.01*np.pi)
-    list_beats.append((t_ectopic,'e'))
+    # Adaptive burn in: compare the NIB values of each window with those of
+    # the earlier windows pooled since the last disagreement, and end burn in
+    # once burn_checks consecutive windows agree with the pool (up to
+    # tburn_max). Agreement is a test that allows for sampling noise, and
+    # windows are extended until they hold burn_min_values NIB values (and
+    # the pool grows), so that the test has the power to see slow transients.
+    adaptive = (tburn=='auto')
+    if adaptive:
+        tburn = tburn_max
+        t_check = burn_window
+        # NIB counts of the current window and of the pool, and their start times
+        window = Counter()
+        t_window = 0
+        pool = None
+        t_pool = 0
+        n_agree = 0
+        # Number of 's' since the last 'e' (None until there is one)
+        nib_count = 0 if list_types[-1]==BEAT_E else None
     
     # Iterate system until sinus time t_sinus<tmax+tburn
     while t_sinus < tmax+tburn:
         
 
         # Obtain time of subsequent sinus beat
-        t_sinus_next = t_sinus + ts
+        if sinus_times is None:
+            t_sinus_next = t_sinus + ts
+        else:
+            # End of schedule
+            if i_sinus+1 >= n_sinus:
+                break
+            # (as a float, as arithmetic on numpy scalars is slower)
+            t_sinus_next = float(sinus_times[i_sinus+1])
         # Obtain projected time of subsequent ectopic beat (using PRC if last beat was expressed sinus)
-        if list_beats[-1][1] != 's':
+        if list_types[-1] != BEAT_S:
             t_ectopic_next = t_ectopic + te_mod
         else:
             # Compute phase of sinus beat in current ectopic cycle
             phi = (t_sinus - t_ectopic)/te_mod
             # Compute modulated ectopic period
-            te_mod = prc(phi)*te_mod
+            # (as a float, as arithmetic on numpy scalars is slower)
+            te_mod = float(prc(phi))*te_mod
             t_ectopic_next = t_ectopic + te_mod
          
             
         # If the next beat is a sinus beat
         if t_sinus_next < t_ectopic_next:
             # The sinus beat is concealed if preceded directly by expressed ectopic beat
-            if list_beats[-1][1] == 'e':
-                beat_type = 'xs'
+            if list_types[-1] == BEAT_E:
+                beat_type = BEAT_XS
             # Otherwise the beat takes place
-            else: beat_type = 's'
+            else: beat_type = BEAT_S
             # Update t_sinus
             t_sinus = t_sinus_next
+            if sinus_times is not None:
+                i_sinus += 1
             # Append beat list
-            list_beats.append((t_sinus,beat_type))
+            list_times.append(t_sinus)
+            list_types.append(beat_type)
+            
+            if adaptive:
+                if (beat_type==BEAT_S) & (nib_count is not None):
+                    nib_count += 1
+                # Extend the window if it holds too few NIB values
+                if (t_sinus >= t_check and sum(window.values()) < burn_min_values
+                        and t_check-t_window < burn_window_max and t_check < tburn_max):
+                    t_check += burn_window
+                # Compare the window that has just ended with the pool
+                elif t_sinus >= t_check:
+                    if pool is None:
+                        agree = False
+                    else:
+                        agree = nib_windows_agree(pool, window, burn_alpha,
+                                                  ratio=(t_window-t_pool)/(t_check-t_window))
+                    if agree:
+                        n_agree += 1
+                        pool.update(window)
+                    else:
+                        # Start a new pool (keeping the windows before it in burn in)
+                        n_agree = 0
+                        pool = window
+                        t_pool = t_window
+                        t_pool_first = t_check
+                    if n_agree >= burn_checks:
+                        # Keep the windows of the pool, except the first
+                        tburn = t_pool_first
+                        adaptive = False
+                    elif t_check >= tburn_max:
+                        adaptive = False
+                    else:
+                        window = Counter()
+                        t_window = t_check
+                        t_check += burn_window
             
             
         # If the next beat is an ectopic beat
         else:
             # The ectopic beat is concealed if occurs during refractory period of previous sinus beat
-            if (list_beats[-1][1] == 's') & (t_ectopic_next < list_beats[-1][0]+theta):
-                beat_type = 'xe'
+            if (list_types[-1] == BEAT_S) & (t_ectopic_next < list_times[-1]+theta):
+                beat_type = BEAT_XE
             # Otherwise beat takes place
-            else: beat_type = 'e'
+            else: beat_type = BEAT_E
             # Update t_ectopic
             t_ectopic = t_ectopic_next
             # Reset te_mod
             te_mod = te
             # Append beat list
-            list_beats.append((t_ectopic,beat_type))
+            list_times.append(t_ectopic)
+            list_types.append(beat_type)
             
-    # Put into a dataframe
-    dict_beats = {'Time': [tup[0] for tup in list_beats],
-                  'Type': [tup[1] for tup in list_beats]}
-    df_beats_temp = pd.DataFrame(dict_beats)
+            if adaptive & (beat_type==BEAT_E):
+                if nib_count is not None:
+                    window[nib_count] += 1
+                nib_count = 0
+            
+    # Schedule shorter than the simulation
+    if sinus_times is not None and t_sinus < tmax+tburn:
+        check_schedule(t_sinus, tburn, tmax)
+    
+    times = np.array(list_times, dtype=float)
+    types = np.array(list_types, dtype=np.int8)
+    
+    # State at the final (sinus) beat, before the PRC is applied for it
+    info = {'state': final_state(t_sinus, list_types[-1], t_ectopic, te_mod, te),
+            'tburn': tburn}
     
     # Remove burn-in period and reset start time to zero
-    df_beats=df_beats_temp[df_beats_temp['Time']>=tburn].copy()
-    df_beats['Time'] = df_beats['Time']-tburn
-    df_beats.reset_index(drop=True)
+    keep = times >= tburn
+    
+    return times[keep]-tburn, types[keep], info
+
+
+
+
+def schedule_window(sinus_times, t_end):
+    '''
+    Part of a sinus schedule used by a simulation up to time t_end: beats up
+    to the first at or after t_end (relative to the first beat), with times
+    relative to the first beat. Only this part is read if sinus_times is
+    memory-mapped.
+    
+    Input:
+        sinus_times: increasing array of sinus beat times
+        t_end: end time of simulation
+    Output:
+        array of sinus beat times starting at 0
+    '''
+    
+    t0 = float(sinus_times[0])
+    i_end = np.searchsorted(sinus_times, t0+t_end, side='left')
+    window = np.array(sinus_times[:i_end+1], dtype=float)
+    if t0 != 0:
+        window -= t0
+    
+    return window
+
+
+
+
+def check_schedule(t_end, tburn, tmax):
+    '''
+    Check the length of a sinus schedule that ends before the end of a
+    simulation: raise an error if it ends during burn in (no beats would be
+    returned), and otherwise warn that the simulation ends early.
+    
+    Input:
+        t_end: time of the last sinus beat of the schedule (relative to the first)
+        tburn: length of burn in period
+        tmax: time the simulation should run up to after burn in
+    '''
+    
+    if t_end <= tburn:
+        raise ValueError('Sinus schedule ends at {:.1f} s, before the end of burn in ({:.1f} s)'.format(
+            t_end, tburn))
+    if t_end < tmax+tburn:
+        warnings.warn('Sinus schedule ends at {:.1f} s, so the simulation stops after {:.1f} s of {:.1f} s'.format(
+            t_end, t_end-tburn, tmax), stacklevel=3)
+
+
+
+
+def final_state(t_sinus, sinus_type, t_ectopic, te_mod, te):
+    '''
+    State of the system at a sinus beat, from which a simulation can be
+    continued (warm start) with simulate_beats(state0=state).
+    
+    Input:
+        t_sinus: time of the sinus beat
+        sinus_type: beat type code of the sinus beat (BEAT_S or BEAT_XS)
+        t_ectopic: time of the last ectopic beat (expressed or concealed)
+        te_mod: current modulated ectopic period
+        te: ectopic period
+    Output:
+        state: dictionary with
+            'phase': phase of the sinus beat in the current ectopic cycle
+            'te_ratio': te_mod/te
+            'sinus_type': beat type code of the sinus beat
+    '''
+    
+    state = {'phase': float((t_sinus-t_ectopic)/te_mod),
+             'te_ratio': float(te_mod/te),
+             'sinus_type': int(sinus_type)}
+    
+    return state
+
+
+
+
+def nearest_state(dic_states, prc_tag, ts, te, theta, max_dist=np.inf):
+    '''
+    Find the final state of the previously computed parameter set closest to
+    (ts, te, theta) with the same PRC.
+    
+    Input:
+        dic_states: dictionary mapping (prc_tag, ts, te, theta) to a state
+        prc_tag, ts, te, theta: parameters of the new simulation
+        max_dist: maximum (Euclidean) distance in (ts, te, theta)
+    Output:
+        state: final state of the nearest parameter set, or None if there is
+            none within max_dist
+    '''
+    
+    # Copy of items, as states may be added by other threads
+    items = [(key, state) for key, state in list(dic_states.items()) if key[0]==prc_tag]
+    if len(items)==0:
+        return None
+    
+    params = np.array([key[1:] for key, state in items])
+    dist = np.sqrt(((params-np.array([ts, te, theta]))**2).sum(axis=1))
+    i = np.argmin(dist)
+    if dist[i] > max_dist:
+        return None
+    
+    return items[i][1]
+
+
+
+
+def nib_distance(counts_1, counts_2):
+    '''
+    Total variation distance between two distributions of NIB values
+    (0 if identical, 1 if disjoint).
+    
+    Input:
+        counts_1, counts_2: dictionaries (e.g. Counter) mapping NIB values
+            to their counts or probabilities
+    Output:
+        dist: distance in [0,1]
+    '''
+    
+    n_1 = sum(counts_1.values())
+    n_2 = sum(counts_2.values())
+    # Distributions with no ectopic beats agree only with each other
+    if (n_1==0) | (n_2==0):
+        return float((n_1>0) | (n_2>0))
+    
+    keys = set(counts_1.keys()) | set(counts_2.keys())
+    dist = 0.5*sum(abs(counts_1.get(k,0)/n_1 - counts_2.get(k,0)/n_2) for k in keys)
+    
+    return dist
+
+
+
+
+def nib_windows_agree(counts_1, counts_2, alpha=0.01, ratio=1):
+    '''
+    Test of whether two windows have the same NIB statistics. The count of
+    each NIB value is taken as Poisson, so given the total count n=a+b of a
+    value in the two windows, a is binomial with probability p=ratio/(1+ratio)
+    if the rates agree, and (a-n*p)**2/(n*p*(1-p)) summed over the values is
+    approximately chi-square with a degree of freedom per value (for windows
+    of the same length, (a-b)**2/(a+b)). This compares both the distribution
+    of NIB values and the rate of ectopic beats, and the threshold grows with
+    the noise of small counts.
+    
+    Input:
+        counts_1, counts_2: dictionaries (e.g. Counter) mapping NIB values
+            to their counts in each window
+        alpha: significance level
+        ratio: length of window 1 over length of window 2
+    Output:
+        True if the windows agree (no significant difference)
+    '''
+    
+    p = ratio/(1+ratio)
+    keys = set(counts_1.keys()) | set(counts_2.keys())
+    stat = 0
+    df = 0
+    for k in keys:
+        a = counts_1.get(k,0)
+        n = a + counts_2.get(k,0)
+        if n > 0:
+            stat += (a-n*p)**2/(n*p*(1-p))
+            df += 1
+    if df==0:
+        return True
+    
+    # Chi-square quantile (Wilson-Hilferty approximation)
+    z = NormalDist().inv_cdf(1-alpha)
+    threshold = df*(1 - 2/(9*df) + z*np.sqrt(2/(9*df)))**3
+    
+    return stat <= threshold
+
+
+
+
+def run_mod_para(ts=1, te=1.8, theta=0.2, tmax=1000, tburn=100, prc_tag='pure',
+                 analytic=True, state0=None, tburn_max=500, sinus_times=None,
+                 prc_params=None):
+    '''
+    Function to simulate modulated parasystole.
+    Notation of beat types (stored as integer codes, see beat_labels)
+    s (BEAT_S): expressed sinus beat
+    e (BEAT_E): expressed ectopic beat
+    xs (BEAT_XS): concealed sinus beat
+    xe (BEAT_XE): concealed ectopic beat
+    
+    Input:
+        ts: period of sinus rhythm
+        te: period of ectopic rhythm
+        theta: refractory period of the heart
+        tmax: time to run simulation up to
+        tburn: length of burn in period that is discarded (to remove transients).
+            If 'auto', burn in ends once the NIB values in consecutive windows agree.
+        tburn_max: maximum length of burn in period when tburn='auto'
+        prc: phase response curve from {'pure','a','b','c','d','e'} - see Courtemanche for functions
+        analytic: if True, the 'pure' PRC is solved analytically rather than simulated
+        state0: state to warm start from, e.g. df_beats.attrs['state'] of a previous
+            run (see final_state). If None, start from the default initial condition.
+        sinus_times: array of sinus beat times replacing the periodic sinus
+            rhythm (e.g. from sinus_schedule.py, memory-mapped with
+            load_schedule). Times are taken relative to the first, and ts is
+            replaced by the first sinus interval. Only the part up to
+            tmax+tburn is read. If the schedule ends before that, the
+            simulation ends early with a warning, or raises a ValueError if
+            it ends during burn in (see check_schedule).
+        prc_params: dictionary of parameters of the PRC to change from their
+            defaults (keyword arguments of the function in prc_functions.py,
+            e.g. {'C':0.05, 'theta':0.45} for prc 'a')
+    Output:
+        df_beats: pandas dataframe of beats at each time.
+            The attributes 'state' and 'tburn' give the final state and burn in used.
+    '''
+    
+    times, types, info = simulate_beats(ts=ts, te=te, theta=theta,
+                                        tmax=tmax, tburn=tburn, prc_tag=prc_tag,
+                                        analytic=analytic, state0=state0,
+                                        tburn_max=tburn_max, sinus_times=sinus_times,
+                                        prc_params=prc_params)
+    
+    import pandas as pd
+    
+    # Put into a dataframe
+    df_beats = pd.DataFrame({'Time': times, 'Type': types})
+    df_beats.attrs.update(info)
     
     # Return data frame of beats
     return df_beats
@@ -128,6 +493,79 @@ def run_mod_para(ts=1, te=1.8, theta=0.2, tmax=1000, tburn=100, prc_tag='pure'):
 
 
 
+def nib_values(types):
+    '''
+    Compute the sequence of NIB values from an array of beat type codes.
+    The NIB following the last ectopic beat counts expressed sinus beats
+    up to (but not including) the final beat.
+    
+    Input:
+        types: array of beat type codes
+    Output:
+        nib: array of NIB values, one per expressed ectopic beat
+    '''
+    
+    types = np.asarray(types)
+    
+    # Cumulative count of expressed sinus beats (cs[i] = number in types[:i])
+    cs = np.concatenate(([0], np.cumsum(types==BEAT_S)))
+    
+    # Count 's' between each 'e' and the next 'e' (or the final beat)
+    idx_e = np.flatnonzero(types==BEAT_E)
+    idx_end = np.append(idx_e[1:], len(types)-1)
+    nib = cs[idx_end] - cs[np.minimum(idx_e+1, idx_end)]
+    
+    return nib
+
+
+
+
+def nib_probabilities(list_nib):
+    '''
+    Distribution of NIB values as arrays (see nib_distribution)
+    
+    Input:
+        list_nib: sequence of NIB values (see nib_values)
+    Output:
+        values: NIB values in ascending order (empty if no ectopic beats)
+        probabilities: probability of each NIB value
+    '''
+    
+    list_nib = np.asarray(list_nib)
+    # Remove last element of list_nib if is less than the max nib as not relevant
+    if len(list_nib) > 0 and list_nib[-1]<list_nib.max():
+        list_nib = list_nib[:-1]
+    
+    values, counts = np.unique(list_nib, return_counts=True)
+    
+    return values, counts/max(len(list_nib), 1)
+
+
+
+
+def nib_distribution(list_nib):
+    '''
+    Function to compute the distribution of NIB values from the sequence of NIB values
+    
+    Input:
+        list_nib: sequence of NIB values (see nib_values)
+    Output:
+        df_nib: dataframe for NIB
+    '''
+    
+    import pandas as pd
+    
+    # If list_nib is empty (no ectopic beats)
+    if len(list_nib)==0:
+        return pd.DataFrame({'NIB':['silence'], 'Probability':[1.0]})
+    
+    values, probabilities = nib_probabilities(list_nib)
+    df_nib = pd.DataFrame({'NIB':values, 'Probability':probabilities})
+    
+    return df_nib
+
+
+
 
 def compute_nib(df_beats):
     '''
@@ -141,42 +579,38 @@ def compute_nib(df_beats):
         df_nib: dataframe for NIB
     '''
 
-        
-    list_type = df_beats['Type'].values
-    list_nib = []
-    i = 0
-    count = 0
-    while i < len(list_type):
-        if list_type[i]=='e':
-            i+=1
-            # Count the number of 's' occurences until next 'e'
-            while (list_type[i]!='e')&(i<len(list_type)-1):
-                if list_type[i]=='s':
-                    count+=1
-                    i+=1
-                else:
-                    i+=1
-            list_nib.append(count)
-            count = 0
-        else:
-            i+=1
+    list_nib = nib_values(df_beats['Type'].values)
     
-    # If list_nib is empty (no ectopic beats)
-    if len(list_nib)==0:
-        list_nib = ['silence']
-    # Remove last element of list_nib if is less than the max nib as not relevant
-    elif list_nib[-1]<max(list_nib):
-        list_nib = list_nib[:-1]
-        
-    # Collect and count occurences
-    series_nib = pd.Series(list_nib, name='NIB')
-    nib_counts = series_nib.value_counts(normalize=True)
-    df_nib = pd.DataFrame({'NIB':nib_counts.index, 'Probability':nib_counts.values})
+    return nib_distribution(list_nib)
+
+
+
+
+def rr_intervals(times, types):
+    '''
+    Compute the intervals between consecutive expressed beats.
     
-    # Sort df_nib so NIB is in ascendinig order
-    df_nib.sort_values('NIB', ascending=True, inplace=True)
+    Input:
+        times: array of beat times
+        types: array of beat type codes
+    Output:
+        rr_times: time of the second beat of each interval
+        rr_lengths: interval lengths
+        rr_types: interval type codes (RR_SS, RR_SE, RR_ES, RR_EE)
+    '''
     
-    return df_nib
+    types = np.asarray(types)
+    
+    # Select only expressed beats
+    express = types < BEAT_XS
+    times_express = np.asarray(times)[express]
+    types_express = types[express]
+    
+    rr_times = times_express[1:]
+    rr_lengths = np.diff(times_express)
+    rr_types = (2*types_express[:-1] + types_express[1:]).astype(np.int8)
+    
+    return rr_times, rr_lengths, rr_types
 
 
 
@@ -188,42 +622,18 @@ def compute_rr(df_beats):
         df_beats: dataframe for beat type at each time
     Output:
         df_rr: dataframe containing interval lengths and types
+            (types are codes RR_SS, RR_SE, RR_ES, RR_EE - see rr_labels)
     '''
 
-    # Select only expressed beats
-    df_beats_express = df_beats[df_beats['Type'].isin(['s','e'])]
-    
-    list_rr_times = []
-    list_rr_types = []
-    list_rr_lengths = []
-        
-        
-    # Loop through intervals
-    for i in range(len(df_beats_express)-1):
-        
-        df_temp = df_beats_express.iloc[i:i+2]
-    
-        # Compute RR interval type
-        beats = df_temp['Type'].values
-        rr_type = beats[0]+beats[1] # combining strings
-        # Append to list
-        list_rr_types.append(rr_type)
-        
-        # Compute RR interval length (in seconds)
-        rr_length = df_temp['Time'].iloc[1]-df_temp['Time'].iloc[0]
-        # Append to list
-        list_rr_lengths.append(rr_length)
-        
-        # Set the time value of the interval to be that of the second beat
-        rr_time = df_temp['Time'].iloc[1]
-        # Append to list
-        list_rr_times.append(rr_time)
-            
+    rr_times, rr_lengths, rr_types = rr_intervals(df_beats['Time'].values,
+                                                  df_beats['Type'].values)
             
+    import pandas as pd
+    
     # Construct a dataframe containing rr info 
-    dic_rr_info = {'Time (s)':list_rr_times, 
-                   'RR interval (s)':list_rr_lengths,
-                   'Type': list_rr_types}
+    dic_rr_info = {'Time (s)':rr_times, 
+                   'RR interval (s)':rr_lengths,
+                   'Type': rr_types}
     df_rr = pd.DataFrame(dic_rr_info)
     
     return df_rr
@@ -231,5 +641,74 @@ def compute_rr(df_beats):
 
 
 
+def rr_window(rr_times, rr_lengths, t0, t1, max_points=2000):
+    '''
+    Select the intervals in the time window [t0,t1] for plotting.
+    The window is found by binary search (rr_times must be sorted). If it holds
+    more than max_points intervals, it is split into max_points/2 equal time bins
+    and only the shortest and longest interval in each bin are kept.
+    
+    Input:
+        rr_times: time of each interval
+        rr_lengths: interval lengths
+        t0, t1: time window
+        max_points: maximum number of intervals returned
+    Output:
+        idx: indices of the selected intervals (in time order)
+    '''
+    
+    i0 = np.searchsorted(rr_times, t0, side='left')
+    i1 = np.searchsorted(rr_times, t1, side='right')
+    if i1-i0 <= max_points:
+        return np.arange(i0, i1)
+    
+    # Time bin of each interval
+    n_bins = max(max_points//2, 1)
+    bins = ((rr_times[i0:i1]-t0)/(t1-t0)*n_bins).astype(int).clip(0, n_bins-1)
+    
+    # Sort by bin and then length, and keep first and last of each bin
+    order = np.lexsort((rr_lengths[i0:i1], bins))
+    first = np.flatnonzero(np.diff(bins[order], prepend=-1))
+    last = np.append(first[1:]-1, len(order)-1)
+    idx = i0 + np.unique(np.concatenate((order[first], order[last])))
+    
+    return idx
+
 
 
+def poincare_density(rr_times, rr_lengths, rr_types, n_bins=100, rr_max=None):
+    '''
+    Density of the Poincare map (RR_n, RR_n+1) on an n_bins x n_bins grid, for
+    each type of interval RR_n. Only pairs of consecutive intervals are used
+    (in recordings, intervals next to skipped beats are missing).
+    
+    Input:
+        rr_times, rr_lengths, rr_types: intervals (see rr_intervals)
+        n_bins: number of bins on each axis
+        rr_max: upper end of the grid (intervals above go in the last bin).
+            Defaults to the longest interval rounded up.
+    Output:
+        counts: array (number of interval types, n_bins, n_bins) with
+            counts[k,j,i] the number of pairs with RR_n of type k, RR_n in
+            bin i and RR_n+1 in bin j
+        edges: bin edges
+    '''
+    
+    rr_times = np.asarray(rr_times)
+    rr_lengths = np.asarray(rr_lengths)
+    if rr_max is None:
+        rr_max = np.ceil(rr_lengths.max()+0.01) if len(rr_lengths) else 1
+    edges = np.linspace(0, rr_max, n_bins+1)
+    
+    # Consecutive intervals (RR_n+1 ends RR_n+1 after RR_n)
+    consecutive = np.isclose(np.diff(rr_times), rr_lengths[1:])
+    x = rr_lengths[:-1][consecutive]
+    y = rr_lengths[1:][consecutive]
+    k = np.asarray(rr_types)[:-1][consecutive].astype(int)
+    
+    i = np.clip((x/rr_max*n_bins).astype(int), 0, n_bins-1)
+    j = np.clip((y/rr_max*n_bins).astype(int), 0, n_bins-1)
+    counts = np.bincount((k*n_bins + j)*n_bins + i,
+                         minlength=len(rr_labels)*n_bins*n_bins)
+    
+    return counts.reshape(len(rr_labels), n_bins, n_bins), edges
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Simulate modulated parasystole with one sinus rhythm and K ectopic foci.
+
+Each focus has its own period, PRC and concealment rules. The next beat of
+each focus is kept in a priority queue (heap), so finding the next beat
+costs O(log K). When an expressed sinus beat modulates a focus, the focus
+is pushed again with its new time and its old entry is discarded when it
+reaches the top of the heap. Only foci with a PRC other than 'pure' are
+modulated, so pure foci cost nothing per sinus beat.
+
+An ectopic beat is concealed if it occurs within the refractory period
+(theta of its focus) of the last expressed beat, whether that beat was a
+sinus beat or an ectopic beat of another focus, so of two nearly coincident
+beats of different foci only the first is expressed. A focus is not made
+refractory by its own beats, as in run_mod_para.
+
+With a single focus the rules are the same as run_mod_para and the output
+is identical.
+
+@author: tbury
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+
+
+
+def run_multi_foci(ts=1, foci=({'te':1.8, 'prc_tag':'pure'},), theta=0.2,
+                   tmax=1000, tburn=100):
+    '''
+    Simulate a sinus rhythm with several ectopic foci.
+
+    Input:
+        ts: period of sinus rhythm
+        foci: list of dictionaries, one per focus, with keys
+            'te': period of the focus
+            'prc_tag': PRC of the focus (default 'pure')
+            'theta': refractory period after an expressed beat (sinus or of
+                another focus) during which beats of this focus are concealed
+                (default theta)
+            'conceal_sinus': whether an expressed beat of this focus conceals
+                the following sinus beat (default True)
+            't0': time of the first beat of the focus. The default for the
+                first focus is as in run_mod_para (and this beat is always
+                expressed). Other foci default to a shift of k*te/K from it.
+        theta: default refractory period
+        tmax: time to run simulation up to
+        tburn: length of burn in period that is discarded
+    Output:
+        df_beats: dataframe of beats with columns 'Time', 'Type' (beat type code)
+            and 'Focus' (index of the focus, -1 for sinus beats)
+    '''
+
+    K = len(foci)
+    te = np.array([focus['te'] for focus in foci], dtype=float)
+    prcs = [mp.dic_prc[focus.get('prc_tag','pure')] for focus in foci]
+    modulated = [k for k in range(K) if foci[k].get('prc_tag','pure')!='pure']
+    thetas = [focus.get('theta', theta) for focus in foci]
+    conceal_sinus = [focus.get('conceal_sinus', True) for focus in foci]
+
+    # Beat times, types and foci
+    list_times = []
+    list_types = []
+    list_foci = []
+
+    # Modulated period, time of last beat and version of heap entry for each focus
+    te_mod = te.copy()
+    t_last = np.zeros(K)
+    version = np.zeros(K, dtype=int)
+    heap = []
+
+    # Expressed sinus beat at t=0 and expressed beat of the first focus
+    # at the same time as in run_mod_para
+    t_sinus = 0
+    list_times.append(t_sinus)
+    list_types.append(mp.BEAT_S)
+    list_foci.append(-1)
+
+    # Time and focus of the last expressed beat (focus -1 for sinus), and
+    # whether the next sinus beat is concealed by an expressed ectopic beat
+    t_expressed = t_sinus
+    k_expressed = -1
+    conceal_next = False
+
+    t_first = theta + (ts-theta)/(2+0.01*np.pi)
+    for k in range(K):
+        t0 = foci[k].get('t0', t_first + k*te[k]/K)
+        if k==0:
+            list_times.append(t0)
+            list_types.append(mp.BEAT_E)
+            list_foci.append(0)
+            t_expressed, k_expressed = t0, 0
+            conceal_next = conceal_sinus[0]
+            t_last[k] = t0
+            heapq.heappush(heap, (t0+te_mod[k], k, version[k]))
+        else:
+            # Beat at t0 is scheduled and follows the rules like any other
+            # (t_last is set so that the PRC phase is measured from t0-te)
+            t_last[k] = t0-te[k]
+            heapq.heappush(heap, (t0, k, version[k]))
+
+    # Iterate system until sinus time t_sinus<tmax+tburn
+    while t_sinus < tmax+tburn:
+
+        t_sinus_next = t_sinus + ts
+
+        # Discard outdated heap entries
+        while heap[0][2] != version[heap[0][1]]:
+            heapq.heappop(heap)
+        t_ectopic_next, k, _ = heap[0]
+
+        # If the next beat is a sinus beat
+        if t_sinus_next < t_ectopic_next:
+            # The sinus beat is concealed if it is the first since an expressed
+            # ectopic beat of a focus that conceals sinus beats (concealed
+            # beats of other foci in between do not change this)
+            if conceal_next:
+                beat_type = mp.BEAT_XS
+            else:
+                beat_type = mp.BEAT_S
+            conceal_next = False
+            t_sinus = t_sinus_next
+            list_times.append(t_sinus)
+            list_types.append(beat_type)
+            list_foci.append(-1)
+
+            # Expressed sinus beats modulate the period of each focus
+            if beat_type==mp.BEAT_S:
+                t_expressed, k_expressed = t_sinus, -1
+                for j in modulated:
+                    phi = (t_sinus - t_last[j])/te_mod[j]
+                    te_mod[j] = prcs[j](phi)*te_mod[j]
+                    version[j] += 1
+                    heapq.heappush(heap, (t_last[j]+te_mod[j], j, version[j]))
+
+        # If the next beat is an ectopic beat
+        else:
+            heapq.heappop(heap)
+            # Concealed if it occurs during refractory period of the last
+            # expressed beat (sinus or of another focus)
+            if (k_expressed!=k) and (t_ectopic_next < t_expressed+thetas[k]):
+                beat_type = mp.BEAT_XE
+            else:
+                beat_type = mp.BEAT_E
+                t_expressed, k_expressed = t_ectopic_next, k
+                conceal_next = conceal_sinus[k]
+            list_times.append(t_ectopic_next)
+            list_types.append(beat_type)
+            list_foci.append(k)
+
+            # Reset modulated period and schedule next beat
+            t_last[k] = t_ectopic_next
+            te_mod[k] = te[k]
+            version[k] += 1
+            heapq.heappush(heap, (t_ectopic_next+te_mod[k], k, version[k]))
+
+    times = np.array(list_times, dtype=float)
+
+    # Put into a dataframe, removing burn-in period and resetting start time to zero
+    keep = times >= tburn
+    df_beats = pd.DataFrame({'Time': times[keep]-tburn,
+                             'Type': np.array(list_types, dtype=np.int8)[keep],
+                             'Focus': np.array(list_foci, dtype=np.int16)[keep]})
+
+    return df_beats
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Functions to build a map of the dominant NIB pattern over (te/ts, theta/ts)
+for a given PRC. The map starts from a coarse grid and recursively refines
+(quadtree-style) only the cells whose corners disagree, so that simulations
+are concentrated at the boundaries between patterns.
+
+The model is invariant under rescaling of time, so simulations are run with
+ts=1 and the map applies to any ts via the ratios te/ts and theta/ts.
+
+Run as a script to build and save maps for the PRCs used in the app.
+
+@author: tbury
+"""
+
+import os
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+
+
+# Default location of saved maps
+map_dir = 'nib_maps'
+
+# Maps loaded before, keyed by filename, with the modification time of the file
+dic_maps = {}
+
+# Ranges of te/ts and theta/ts reachable with the sliders of the app
+# (ts in [0.4,1.2], te in [1,4], theta in [0.1,0.6])
+app_ratio_range = (1/1.2, 4/0.4)
+app_theta_range = (0.1/1.2, 0.6/0.4)
+
+
+
+def nib_pattern(df_nib, tol=0.01):
+    '''
+    Label for a NIB distribution given by the NIB values that occur
+    with probability of at least tol, e.g. '1,4,6' or 'silence'.
+
+    Input:
+        df_nib: dataframe for NIB (see compute_nib)
+        tol: minimum probability for a NIB value to be part of the pattern
+    Output:
+        pattern: string label
+    '''
+
+    nib = df_nib[df_nib['Probability']>=tol]['NIB']
+    pattern = ','.join(str(x) for x in nib)
+
+    return pattern
+
+
+
+def map_point(args):
+    '''
+    Simulate at a single point of the map and return its NIB pattern.
+    Input:
+        args: tuple (prc_tag, te/ts, theta/ts, tmax, tburn, tol)
+    Output:
+        pattern: string label
+    '''
+
+    prc_tag, ratio, theta_ratio, tmax, tburn, tol = args
+    df_beats = mp.run_mod_para(ts=1, te=ratio, theta=theta_ratio,
+                               tmax=tmax, tburn=tburn, prc_tag=prc_tag)
+
+    return nib_pattern(mp.compute_nib(df_beats), tol=tol)
+
+
+
+def compute_nib_map(prc_tag='pure',
+                    ratio_range=app_ratio_range,
+                    theta_range=app_theta_range,
+                    n_coarse=(36,12),
+                    max_depth=3,
+                    tmax=1000,
+                    tburn=100,
+                    tol=0.01,
+                    n_workers=1):
+    '''
+    Compute the map of NIB patterns using adaptive refinement.
+
+    Corners of each cell are simulated. A cell is split into four
+    if its corners have different patterns, until max_depth is reached.
+    Points live on an integer lattice at the finest resolution, so that
+    corners shared between cells are only simulated once.
+
+    Input:
+        prc_tag: PRC function used in the simulations
+        ratio_range: range of te/ts
+        theta_range: range of theta/ts
+        n_coarse: number of cells (te/ts, theta/ts) in the coarse grid
+        max_depth: number of refinement levels
+        tmax, tburn: simulation parameters (see run_mod_para)
+        tol: minimum probability for a NIB value to be part of a pattern
+        n_workers: number of processes used to simulate each level
+    Output:
+        df_map: dataframe of tiles with their NIB pattern.
+            The attributes 'n_sims' and 'n_uniform' give the number of simulations
+            used and the number a uniform grid at the finest resolution would need.
+    '''
+
+    nx, ny = n_coarse
+    L = 2**max_depth
+    dx = (ratio_range[1]-ratio_range[0])/(nx*L)
+    dy = (theta_range[1]-theta_range[0])/(ny*L)
+
+    # Patterns at lattice points (i,j)
+    dic_points = {}
+
+    def evaluate(points):
+        list_args = [(prc_tag, ratio_range[0]+i*dx, theta_range[0]+j*dy, tmax, tburn, tol)
+                     for (i,j) in points]
+        if n_workers > 1:
+            with Pool(n_workers) as pool:
+                patterns = pool.map(map_point, list_args)
+        else:
+            patterns = [map_point(args) for args in list_args]
+        dic_points.update(zip(points, patterns))
+
+    # Cells are (i,j,size) with (i,j) the lower-left corner in lattice units
+    cells = [(i*L, j*L, L) for i in range(nx) for j in range(ny)]
+    list_tiles = []
+
+    while cells:
+
+        # Simulate all new corners at this level together
+        corners = {(i+a, j+b) for (i,j,s) in cells for a in (0,s) for b in (0,s)}
+        evaluate(sorted(corners - dic_points.keys()))
+
+        cells_next = []
+        for (i,j,s) in cells:
+            labels = [dic_points[(i+a, j+b)] for a in (0,s) for b in (0,s)]
+            # Tile is complete if corners agree or at finest resolution
+            if len(set(labels))==1 or s==1:
+                pattern = Counter(labels).most_common(1)[0][0]
+                list_tiles.append((i, j, s, pattern))
+            # Otherwise split into four
+            else:
+                h = s//2
+                cells_next += [(i,j,h), (i+h,j,h), (i,j+h,h), (i+h,j+h,h)]
+        cells = cells_next
+
+    # Dataframe of tiles
+    arr_tiles = np.array([tile[:3] for tile in list_tiles])
+    df_map = pd.DataFrame({
+        'te/ts min': ratio_range[0] + arr_tiles[:,0]*dx,
+        'te/ts max': ratio_range[0] + (arr_tiles[:,0]+arr_tiles[:,2])*dx,
+        'theta/ts min': theta_range[0] + arr_tiles[:,1]*dy,
+        'theta/ts max': theta_range[0] + (arr_tiles[:,1]+arr_tiles[:,2])*dy,
+        'Pattern': [tile[3] for tile in list_tiles]})
+
+    df_map.attrs['n_sims'] = len(dic_points)
+    df_map.attrs['n_uniform'] = (nx*L+1)*(ny*L+1)
+
+    return df_map
+
+
+
+def save_nib_map(df_map, prc_tag, path=map_dir):
+    '''
+    Save map of NIB patterns to path/nib_map_<prc_tag>.csv
+    '''
+    os.makedirs(path, exist_ok=True)
+    df_map.to_csv(os.path.join(path, 'nib_map_{}.csv'.format(prc_tag)), index=False)
+
+
+
+def load_nib_map(prc_tag, path=map_dir):
+    '''
+    Load map of NIB patterns for prc_tag.
+    Returns None if the map has not been computed.
+    Maps are kept in memory after the first load (and read again if the
+    file changes), so the dataframe returned must not be modified.
+    '''
+    filename = os.path.join(path, 'nib_map_{}.csv'.format(prc_tag))
+    try:
+        mtime = os.path.getmtime(filename)
+    except OSError:
+        return None
+    if filename in dic_maps and dic_maps[filename][0]==mtime:
+        return dic_maps[filename][1]
+    # Keep patterns as strings (e.g. '2' rather than 2)
+    df_map = pd.read_csv(filename, dtype={'Pattern':str})
+    dic_maps[filename] = (mtime, df_map)
+    return df_map
+
+
+
+
+if __name__ == '__main__':
+
+    from construct_figures import nib_map_plot
+
+    # PRCs used in the app
+    prcTags = ['pure','a','b','c','d','e']
+
+    for prc_tag in prcTags:
+        t0 = time.time()
+        df_map = compute_nib_map(prc_tag=prc_tag, n_workers=os.cpu_count())
+        save_nib_map(df_map, prc_tag)
+        fig = nib_map_plot(df_map)
+        fig.write_html(os.path.join(map_dir, 'nib_map_{}.html'.format(prc_tag)))
+        print('PRC {}: {} simulations ({} for uniform grid) in {:.1f}s'.format(
+            prc_tag, df_map.attrs['n_sims'], df_map.attrs['n_uniform'], time.time()-t0))
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Functions to detect rhythm patterns in long beat sequences.
+
+Two kinds of episode are found, both in time linear in the number of beats
+(all loops are over pattern lengths, not beats):
+    - ectopic runs: consecutive expressed ectopic beats (couplets and longer
+      runs), from the run-length encoding of the expressed beat types
+    - NIB motifs: stretches where the sequence of NIB values repeats with
+      period p (for each p up to max_period, by comparing the sequence with
+      itself shifted by p and run-length encoding the matches). A repeated
+      NIB of 1 is bigeminy, of 2 trigeminy and of 3 quadrigeminy.
+An episode of a motif of p values is only reported if the motif does not
+itself repeat with a shorter period (e.g. (1,1) is reported as bigeminy).
+
+@author: tbury
+"""
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+
+
+# Names of motifs of a single repeated NIB value
+dic_motif_names = {1:'Bigeminy', 2:'Trigeminy', 3:'Quadrigeminy'}
+
+
+
+def run_length_encode(x):
+    '''
+    Run-length encoding of a sequence
+    Input:
+        x: array
+    Output:
+        values: value of each run
+        starts: index of the start of each run
+        lengths: length of each run
+    '''
+
+    x = np.asarray(x)
+    if len(x)==0:
+        return x[:0], np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    starts = np.concatenate(([0], np.flatnonzero(x[1:]!=x[:-1])+1))
+    lengths = np.diff(np.append(starts, len(x)))
+
+    return x[starts], starts, lengths
+
+
+
+def smallest_period(motif):
+    '''
+    Smallest p such that the motif is a repeat of its first p values
+    '''
+    n = len(motif)
+    for p in range(1, n):
+        if n % p==0 and all(motif[i]==motif[i % p] for i in range(n)):
+            return p
+    return n
+
+
+
+def min_rotation(motif):
+    '''
+    Rotation of a motif that is smallest in lexicographic order
+    (so that episodes of the same motif starting at different phases match)
+    '''
+    return min(tuple(motif[i:]) + tuple(motif[:i]) for i in range(len(motif)))
+
+
+
+def ectopic_runs(times, types, min_run=2):
+    '''
+    Runs of at least min_run consecutive expressed ectopic beats
+    Input:
+        times, types: arrays of beat times and type codes
+        min_run: minimum number of beats in a run
+    Output:
+        list of episode dictionaries (see episode_table)
+    '''
+
+    expressed = (types==mp.BEAT_S) | (types==mp.BEAT_E)
+    t = times[expressed]
+    values, starts, lengths = run_length_encode(types[expressed])
+
+    list_episodes = []
+    for start, length in zip(starts[(values==mp.BEAT_E) & (lengths>=min_run)],
+                             lengths[(values==mp.BEAT_E) & (lengths>=min_run)]):
+        list_episodes.append({'Pattern': 'Couplet' if length==2 else 'Ectopic run',
+                              'Motif': 'e'*int(length),
+                              'Start (s)': t[start],
+                              'End (s)': t[start+length-1],
+                              'Cycles': 1})
+
+    return list_episodes
+
+
+
+def nib_motifs(times, types, max_period=6, min_repeats=3):
+    '''
+    Episodes where the sequence of NIB values repeats with a period of up to
+    max_period values, for at least min_repeats cycles. Overlapping or
+    adjacent episodes of the same motif are merged into one.
+    Input:
+        times, types: arrays of beat times and type codes
+        max_period: longest motif (number of NIB values)
+        min_repeats: minimum number of repeats of the motif
+    Output:
+        list of episode dictionaries (see episode_table)
+    '''
+
+    # Complete NIB values (between consecutive expressed ectopic beats),
+    # NIB k runs from ectopic beat k to ectopic beat k+1
+    t_e = times[types==mp.BEAT_E]
+    nib = mp.nib_values(types)[:-1]
+    n = len(nib)
+
+    # Index of the first and last ectopic beat of each episode, by motif
+    dic_spans = {}
+    for p in range(1, max_period+1):
+        if n < p*min_repeats:
+            break
+        # Runs of matches between the sequence and itself shifted by p
+        values, starts, lengths = run_length_encode(nib[p:]==nib[:-p])
+        keep = values & (lengths+p >= p*min_repeats)
+        for start, length in zip(starts[keep], lengths[keep]):
+            motif = tuple(int(x) for x in nib[start:start+p])
+            # Shorter period, or consecutive ectopic beats (found by ectopic_runs)
+            if smallest_period(motif) < p or motif==(0,):
+                continue
+            dic_spans.setdefault(min_rotation(motif), []).append((start, start+length+p))
+
+    # Merge overlapping or adjacent episodes of the same motif (e.g. either
+    # side of a single value that breaks the repeats)
+    list_episodes = []
+    for motif, list_spans in dic_spans.items():
+        p = len(motif)
+        if p==1 and motif[0] in dic_motif_names:
+            pattern = dic_motif_names[motif[0]]
+        else:
+            pattern = 'NIB motif'
+        list_merged = []
+        for start, end in sorted(list_spans):
+            if list_merged and start <= list_merged[-1][1]:
+                list_merged[-1][1] = max(list_merged[-1][1], end)
+            else:
+                list_merged.append([start, end])
+        for start, end in list_merged:
+            list_episodes.append({'Pattern': pattern,
+                                  'Motif': '-'.join(str(x) for x in motif),
+                                  'Start (s)': t_e[start],
+                                  'End (s)': t_e[end],
+                                  'Cycles': (end-start) // p})
+
+    return list_episodes
+
+
+
+def episode_table(df_beats, max_period=6, min_repeats=3, min_run=2):
+    '''
+    Table of rhythm pattern episodes
+    Input:
+        df_beats: dataframe of beats (see run_mod_para)
+        max_period, min_repeats: see nib_motifs
+        min_run: see ectopic_runs
+    Output:
+        df_episodes: dataframe with a row for each episode, sorted by start time
+            'Pattern': 'Bigeminy', 'Trigeminy', 'Quadrigeminy', 'NIB motif',
+                'Couplet' or 'Ectopic run'
+            'Motif': repeated NIB values (e.g. '1-4-6'), or 'ee...' for runs
+            'Start (s)', 'End (s)', 'Duration (s)': time span
+            'Cycles': number of repeats of the motif
+    '''
+
+    times = df_beats['Time'].to_numpy()
+    types = df_beats['Type'].to_numpy()
+
+    list_episodes = (nib_motifs(times, types, max_period=max_period, min_repeats=min_repeats)
+                     + ectopic_runs(times, types, min_run=min_run))
+    # (with numeric columns when there are no episodes)
+    df_episodes = pd.DataFrame(list_episodes,
+                               columns=['Pattern','Motif','Start (s)','End (s)','Cycles'])
+    df_episodes = df_episodes.astype({'Start (s)':float, 'End (s)':float, 'Cycles':int})
+    df_episodes.insert(4, 'Duration (s)', df_episodes['End (s)']-df_episodes['Start (s)'])
+    df_episodes = df_episodes.sort_values('Start (s)', ignore_index=True)
+
+    return df_episodes
@@ -24,7 +24,6 @@ are taken from Figure 10.
 
 
 import numpy as np
-import pandas as pd
 
 
 def prc_sawtooth(phi, 
@@ -39,7 +38,7 @@ def prc_sawtooth(phi,
 
     Parameters
     ----------
-    phi : float
+    phi : float or array
         phase of the activation within the ectopic cycle.
         equal to x(mod te)/te, where x is the time at which
         the ectopic focus is reached with a signal (from ventricles)
@@ -61,22 +60,19 @@ def prc_sawtooth(phi,
     '''
 
     # If noise included, perturb phi_c
+    # (independently for each value of phi)
     if noise:
-        phi_c = phi_c+np.random.normal(loc=0,scale=noise)
-        phi_c = min(phi_c,1)
-        phi_c = max(phi_c,0)
+        phi_c = phi_c+np.random.normal(loc=0,scale=noise,size=np.shape(phi))
+        phi_c = np.clip(phi_c,0,1)
     
     # Find y_c, the y value for when phi = phi_c
     y_c = 1 - (1-phi_c)*dPRC  
     
     # If the phase of the activation is less than the critical phase
     # then there is no modulation (simplification)
-    if phi < phi_c:
-        y = 1
-    else:
-        y = y_c + dPRC*(phi-phi_c)
+    y = np.where(phi < phi_c, 1, y_c + dPRC*(phi-phi_c))
     
-    return y
+    return y[()]
 
 
 
@@ -95,7 +91,7 @@ def prc_sawtooth_double(phi,
 
     Parameters
     ----------
-    phi : float
+    phi : float or array
         phase of the activation within the ectopic cycle.
         equal to x(mod te)/te, where x is the time at which
         the ectopic focus is reached with a signal (from ventricles)
@@ -120,19 +116,16 @@ def prc_sawtooth_double(phi,
     '''
 
     # If noise included, perturb phi_c
+    # (independently for each value of phi)
     if noise:
-        phi_c = phi_c+np.random.normal(loc=0,scale=noise)
-        phi_c = min(phi_c,1)
-        phi_c = max(phi_c,0)
+        phi_c = phi_c+np.random.normal(loc=0,scale=noise,size=np.shape(phi))
+        phi_c = np.clip(phi_c,0,1)
     
     # For phi less than phi_c, there is elongation of ectopic period
-    if phi < phi_c:
-        y = 1 + dPRC_pre*phi
     # For phi greater than phi_c, there is shortening of ectopic period
-    else:
-        y = 1 - (1-phi)*dPRC_post
+    y = np.where(phi < phi_c, 1 + dPRC_pre*phi, 1 - (1-phi)*dPRC_post)
     
-    return y
+    return y[()]
 
 
 
@@ -140,24 +133,24 @@ def prc_sawtooth_double(phi,
 # Approximate PRC functions used in Moe et al. (1973)
 #–--------------
 
-def prc_moe_1(phi):
+def prc_moe_1(phi, phi_c=0.6, dPRC_post=0.2/0.4, dPRC_pre=0.2/0.6):
     return prc_sawtooth_double(phi,
-                               phi_c=0.6,
-                               dPRC_post = 0.2/0.4,
-                               dPRC_pre = 0.2/0.6)
+                               phi_c=phi_c,
+                               dPRC_post=dPRC_post,
+                               dPRC_pre=dPRC_pre)
 
-def prc_moe_2(phi):
+def prc_moe_2(phi, phi_c=0.55, dPRC_post=0.2/0.45, dPRC_pre=0.2/0.55):
     return prc_sawtooth_double(phi,
-                               phi_c=0.55,
-                               dPRC_post = 0.2/0.45,
-                               dPRC_pre = 0.2/0.55)
+                               phi_c=phi_c,
+                               dPRC_post=dPRC_post,
+                               dPRC_pre=dPRC_pre)
 
 
-def prc_moe_3(phi):
+def prc_moe_3(phi, phi_c=0.5, dPRC_post=0.25/0.5, dPRC_pre=0.25/0.5):
     return prc_sawtooth_double(phi,
-                               phi_c=0.5,
-                               dPRC_post = 0.25/0.5,
-                               dPRC_pre = 0.25/0.5)
+                               phi_c=phi_c,
+                               dPRC_post=dPRC_post,
+                               dPRC_pre=dPRC_pre)
 
 
 
@@ -165,191 +158,157 @@ def prc_moe_3(phi):
 
 
 
-def prc_a(phi):
+def prc_a(phi, C=0.04, phi_max=0.25, sigma=0.12, S=0.1, theta=0.4, N=10):
      '''
      Phase response curve A given in Courtemanche 1989
-         Input: phase of sinus beat in ectopic cycle
+         Input: phase of sinus beat in ectopic cycle, and parameters
+             of the curve (defaults are the values of Courtemanche 1989)
          Output: T/t_E normalised perturbed cycle length
      '''
-     # Parameters
-     C = 0.04
-     phi_max = 0.25
-     sigma = 0.12
-     S = 0.1
-     theta = 0.4
-     N=10
      
      out = 1 + C*np.exp(-(phi-phi_max)**2/(sigma**2)) + \
                  S*(phi-1)*(phi**N)/(phi**N+theta**N)
      return out
  
 
-def prc_b(phi):
+def prc_b(phi, C=0.05, phi_max=0.4, sigma=0.12, S=0.5, theta=0.6, N=10):
      '''
      Phase response curve B given in Courtemanche 1989
-         Input: phase of sinus beat in ectopic cycle
+         Input: phase of sinus beat in ectopic cycle, and parameters
+             of the curve (defaults are the values of Courtemanche 1989)
          Output: T/t_E normalised perturbed cycle length
      '''
-     # Parameters
-     C = 0.05
-     phi_max = 0.4
-     sigma = 0.12
-     S = 0.5
-     theta = 0.6
-     N=10
      
      out = 1 + C*np.exp(-(phi-phi_max)**2/(sigma**2)) + \
                  S*(phi-1)*(phi**N)/(phi**N+theta**N)
      return out
 
 
-def prc_c(phi):
+def prc_c(phi, C=0.1, phi_max=0.3, sigma=0.08, S=0.85, theta=0.4, N=40):
      '''
      Phase response curve C given in Courtemanche 1989
-         Input: phase of sinus beat in ectopic cycle
+         Input: phase of sinus beat in ectopic cycle, and parameters
+             of the curve (defaults are the values of Courtemanche 1989)
          Output: T/t_E normalised perturbed cycle length
      '''
-     # Parameters
-     C = 0.1
-     phi_max = 0.3
-     sigma = 0.08
-     S = 0.85
-     theta = 0.4
-     N=40
      
      out = 1 + C*np.exp(-(phi-phi_max)**2/(sigma**2)) + \
                  S*(phi-1)*(phi**N)/(phi**N+theta**N)
      return out
 
 
-def prc_d(phi):
+def prc_d(phi, C=0.215, phi_max=0.35, sigma=0.057, S=0.92, theta=0.38, N=22.74):
      '''
      Phase response curve D given in Courtemanche 1989
-         Input: phase of sinus beat in ectopic cycle
+         Input: phase of sinus beat in ectopic cycle, and parameters
+             of the curve (defaults are the values of Courtemanche 1989)
          Output: T/t_E normalised perturbed cycle length
      '''
-     # Parameters
-     C = 0.215
-     phi_max = 0.35
-     sigma = 0.057
-     S = 0.92
-     theta = 0.38
-     N=22.74
      
      out = 1 + C*np.exp(-(phi-phi_max)**2/(sigma**2)) + \
                  S*(phi-1)*(phi**N)/(phi**N+theta**N)
      return out
 
 
-def prc_e(phi):
+def prc_e(phi, A=0.35, S=1, N_1=10, theta_1=0.36, N_2=40, theta_2=0.6):
      '''
      Phase response curve E (discontinuous) given in Courtemanche 1989
-         Input: phase of sinus beat in ectopic cycle
+         Input: phase of sinus beat in ectopic cycle, and parameters
+             of the curve (defaults are the values of Courtemanche 1989)
          Output: T/t_E normalised perturbed cycle length
      '''
-     # Parameters
-     A = 0.35
-     S = 1
-     N_1 = 10
-     theta_1 = 0.36
-     N_2 = 40
-     theta_2 = 0.6
      
-     if phi < 0.6:
-         out = 1 + A*phi**N_1/(phi**N_1+theta_1**N_1)
-     else:
-         out = 1 + S*(phi-1)* phi**N_2/(phi**N_2 + theta_2**N_2)
-     return out
+     out = np.where(phi < 0.6,
+                    1 + A*phi**N_1/(phi**N_1+theta_1**N_1),
+                    1 + S*(phi-1)* phi**N_2/(phi**N_2 + theta_2**N_2))
+     return out[()]
  
     
     
 # Pure parasystole (sinus beat has no influence on ectopic period)
 def prc_pure(phi):
-    out = 1
-    return out
+    out = np.ones(np.shape(phi))
+    return out[()]
     
 
 
 # Note that the PRCs defined in Schulte consider DeltaT/te
 # To get T/te, we need just add 1 to the output.
+# All PRC functions accept arrays of phases (used by attractor_funs), and
+# their parameters can be changed by keyword (prc_params in run_mod_para),
+# also as arrays of the same shape as phi (used by sensitivity.py).
     
 def prc_schulte_a(phi):
-    if phi<0.5:
-        out = 0
-        
-    elif 0.5<=phi<=0.75:
-        x1 = 0.5
-        x2 = 0.75
-        y1 = 0
-        y2 = -0.076
-        m = (y2-y1)/(x2-x1)
-        out = m*(phi-x1)+y1
-        
-    else:
-        x1 = 0.75
-        x2 = 1
-        y1 = -0.076
-        y2 = 0
-        m = (y2-y1)/(x2-x1)
-        out = m*(phi-x1)+y1 
+    x1 = 0.5
+    x2 = 0.75
+    y1 = 0
+    y2 = -0.076
+    m = (y2-y1)/(x2-x1)
+    out_2 = m*(phi-x1)+y1
+    
+    x1 = 0.75
+    x2 = 1
+    y1 = -0.076
+    y2 = 0
+    m = (y2-y1)/(x2-x1)
+    out_3 = m*(phi-x1)+y1 
+    
+    out = np.where(phi<0.5, 0, np.where(phi<=0.75, out_2, out_3))
              
-    return out + 1
+    return (out + 1)[()]
     
 
     
 
 
 def prc_schulte_b(phi):
-    if phi<0.1:
-        x1 = 0
-        x2 = 0.1
-        y1 = 0
-        y2 = -0.6
-        m = (y2-y1)/(x2-x1)
-        out = m*(phi-x1)+y1
-        
-    else:
-        x1 = 0.1
-        x2 = 1
-        y1 = -0.6
-        y2 = 0
-        m = (y2-y1)/(x2-x1)
-        out = m*(phi-x1)+y1
-        
+    x1 = 0
+    x2 = 0.1
+    y1 = 0
+    y2 = -0.6
+    m = (y2-y1)/(x2-x1)
+    out_1 = m*(phi-x1)+y1
+    
+    x1 = 0.1
+    x2 = 1
+    y1 = -0.6
+    y2 = 0
+    m = (y2-y1)/(x2-x1)
+    out_2 = m*(phi-x1)+y1
+    
+    out = np.where(phi<0.1, out_1, out_2)
              
-    return out + 1
+    return (out + 1)[()]
     
     
 
 
 
 def prc_schulte_c(phi):
-    if phi<0.3:
-        x1 = 0
-        x2 = 0.3
-        y1 = 0
-        y2 = 0.3
-        m = (y2-y1)/(x2-x1)
-        out = m*(phi-x1)+y1
-        
-    elif 0.3<=phi<=0.4:
-        x1 = 0.3
-        x2 = 0.4
-        y1 = 0.3
-        y2 = -0.1
-        m = (y2-y1)/(x2-x1)
-        out = m*(phi-x1)+y1
+    x1 = 0
+    x2 = 0.3
+    y1 = 0
+    y2 = 0.3
+    m = (y2-y1)/(x2-x1)
+    out_1 = m*(phi-x1)+y1
     
-    else:
-        x1 = 0.4
-        x2 = 1
-        y1 = -0.1
-        y2 = 0
-        m = (y2-y1)/(x2-x1)
-        out = m*(phi-x1)+y1
-        
+    x1 = 0.3
+    x2 = 0.4
+    y1 = 0.3
+    y2 = -0.1
+    m = (y2-y1)/(x2-x1)
+    out_2 = m*(phi-x1)+y1
+    
+    x1 = 0.4
+    x2 = 1
+    y1 = -0.1
+    y2 = 0
+    m = (y2-y1)/(x2-x1)
+    out_3 = m*(phi-x1)+y1
+    
+    out = np.where(phi<0.3, out_1, np.where(phi<=0.4, out_2, out_3))
         
-    return out + 1   
+    return (out + 1)[()]
     
 
     
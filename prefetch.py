@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Speculative prefetch of results the user is likely to ask for next.
+
+After each simulation in the app, the neighbouring parameters (one slider
+step up and down for ts, te and theta) and the other PRCs at the current
+parameters are simulated in a background process pool and put in the
+session store, so that the next interaction is usually served from the store.
+
+Prefetching must not slow down the simulations the user is waiting for:
+    - worker processes run at the lowest priority (nice 19)
+    - only one job per worker is in the pool at a time, and jobs that have
+      not started are dropped when the same session asks for new ones
+    - jobs are only started while the CPU time used by prefetching in the
+      last `window` seconds is below cpu_budget*window
+
+@author: tbury
+"""
+
+import os
+import time
+import atexit
+import threading
+import multiprocessing
+from collections import deque
+
+import numpy as np
+
+import mod_para_funs as mp
+
+
+# Worker processes are started by a fork server rather than forked from the
+# app, as forking a process with other threads running (e.g. the threaded
+# server) can deadlock on locks they hold. The fork server only preloads the
+# simulation, not the app.
+mp_context = multiprocessing.get_context('forkserver')
+mp_context.set_forkserver_preload(['mod_para_funs'])
+
+
+
+def neighbour_params(prc, ts, te, theta, prc_tags, bounds, step=0.01):
+    '''
+    Parameters likely to be chosen next: one step up and down on each slider,
+    and the other PRCs at the current parameters.
+    Input:
+        prc, ts, te, theta: current parameters
+        prc_tags: PRCs in the dropdown
+        bounds: dictionary with range of 'ts', 'te' and 'theta'
+        step: slider step
+    Output:
+        list of (prc, ts, te, theta), most likely first
+    '''
+
+    list_params = []
+    for sign in [1,-1]:
+        for i, name in enumerate(['ts','te','theta']):
+            x = [ts, te, theta]
+            x[i] = float(np.round(x[i] + sign*step, 2))
+            if bounds[name][0] <= x[i] <= bounds[name][1]:
+                list_params.append((prc, *x))
+    list_params += [(x, ts, te, theta) for x in prc_tags if x!=prc]
+
+    return list_params
+
+
+
+def low_priority():
+    '''
+    Initializer of prefetch workers
+    '''
+    os.nice(19)
+
+
+
+def prefetch_job(args):
+    '''
+    Simulate in a prefetch worker.
+    Input:
+        args: tuple (prc, ts, te, theta, state0, sim_kwargs)
+    Output:
+        (df_beats, df_rr, df_nib), CPU time used
+    '''
+
+    prc, ts, te, theta, state0, sim_kwargs = args
+    t0 = time.process_time()
+    df_beats = mp.run_mod_para(ts=ts, te=te, theta=theta, prc_tag=prc,
+                               state0=state0, **sim_kwargs)
+    data = (df_beats, mp.compute_rr(df_beats), mp.compute_nib(df_beats))
+
+    return data, time.process_time()-t0
+
+
+
+class Prefetcher:
+    '''
+    Background simulation of likely next parameters into a SessionStore.
+    '''
+
+    def __init__(self, store, sim_kwargs, n_workers=1, cpu_budget=0.5, window=10,
+                 on_result=None):
+        '''
+        Input:
+            store: SessionStore that results are put in
+            sim_kwargs: arguments of run_mod_para other than the parameters
+                (e.g. tmax, tburn, tburn_max)
+            n_workers: number of worker processes
+            cpu_budget: average number of cores prefetching may use
+            window: time over which CPU use is averaged (s)
+            on_result: function called with (params, df_beats) for each result
+                (e.g. to keep the final state for warm starts)
+        '''
+
+        self.store = store
+        self.sim_kwargs = sim_kwargs
+        self.n_workers = n_workers
+        self.cpu_budget = cpu_budget
+        self.window = window
+        self.on_result = on_result
+
+        self.pool = None
+        self.queue = deque() # jobs waiting (session, params, state0)
+        self.running = set() # (session, params) of jobs in the pool
+        self.cpu_used = deque() # (time finished, CPU time) of recent jobs
+        self.timer = None
+        self.lock = threading.Lock()
+
+
+    def submit(self, session, list_params, state_fun=None):
+        '''
+        Queue parameters to prefetch for a session, replacing the jobs of
+        this session that have not started. Parameters already in the store
+        or running are skipped.
+        Input:
+            session: session id
+            list_params: list of (prc, ts, te, theta), most likely first
+            state_fun: function of params giving state0 for a warm start
+        '''
+
+        with self.lock:
+            self.queue = deque(job for job in self.queue if job[0]!=session)
+            for params in list_params:
+                if (self.store.find(session, params) is None and
+                        (session, params) not in self.running):
+                    state0 = state_fun(params) if state_fun is not None else None
+                    self.queue.append((session, params, state0))
+            self._dispatch()
+
+
+    def close(self):
+        with self.lock:
+            self.queue.clear()
+            if self.timer is not None:
+                self.timer.cancel()
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool = None
+
+
+    def _dispatch(self):
+        # Start queued jobs while workers are free and within the CPU budget
+        t_now = time.monotonic()
+        while self.cpu_used and self.cpu_used[0][0] < t_now-self.window:
+            self.cpu_used.popleft()
+
+        while self.queue and len(self.running) < self.n_workers:
+            if sum(x[1] for x in self.cpu_used) >= self.cpu_budget*self.window:
+                # Try again once the oldest job leaves the window
+                if self.timer is None:
+                    delay = self.cpu_used[0][0] + self.window - t_now
+                    self.timer = threading.Timer(delay, self._retry)
+                    self.timer.daemon = True
+                    self.timer.start()
+                return
+
+            if self.pool is None:
+                self.pool = mp_context.Pool(self.n_workers, initializer=low_priority)
+                atexit.register(self.close)
+
+            session, params, state0 = self.queue.popleft()
+            if self.store.find(session, params) is not None:
+                continue
+            self.running.add((session, params))
+            self.pool.apply_async(prefetch_job, ((*params, state0, self.sim_kwargs),),
+                                  callback=lambda result, job=(session, params): self._done(job, result),
+                                  error_callback=lambda error, job=(session, params): self._done(job, None))
+
+
+    def _retry(self):
+        with self.lock:
+            self.timer = None
+            self._dispatch()
+
+
+    def _done(self, job, result):
+        # Store result and start the next job
+        session, params = job
+        if result is not None:
+            data, cpu_time = result
+            if self.store.find(session, params) is None:
+                self.store.put(session, params, data)
+            if self.on_result is not None:
+                self.on_result(params, data[0])
+        else:
+            cpu_time = 0
+
+        with self.lock:
+            self.running.discard(job)
+            self.cpu_used.append((time.monotonic(), cpu_time))
+            self._dispatch()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Analytic solution of pure parasystole (prc_pure), where the ectopic rhythm
+is strictly periodic and unaffected by sinus beats (Glass et al. (1989)).
+
+Sinus beats occur at multiples of ts (or at the times of a sinus schedule,
+see sinus_schedule.py) and ectopic beats at t_e0 + k*te, so every beat time
+is known in advance and the sinus cycle of each ectopic beat is found by
+binary search (searchsorted) over the sinus times. Whether a beat is
+expressed follows from the position of each ectopic beat within its sinus
+cycle:
+    - an ectopic beat is concealed if it falls within theta of an expressed
+      sinus beat, i.e. y < theta where y is the time since the last sinus beat
+    - the sinus beat following an expressed ectopic beat is concealed
+If the sinus beat preceding ectopic beat k is the first one after ectopic
+beat k-1, it is concealed exactly when beat k-1 is expressed, so beat k
+has the same fate as beat k-1 whenever y < theta. All other ectopic beats
+are determined by y alone, and the sequence is resolved by a forward fill.
+
+Times are accumulated in the same order as run_mod_para, so the output
+matches the simulation exactly and can be used as an oracle for it.
+
+@author: tbury
+"""
+
+import numpy as np
+
+import mod_para_funs as mp
+
+
+
+def pure_ectopic_sequence(ts=1, te=1.8, theta=0.2, tmax=1000, tburn=100, sinus_times=None):
+    '''
+    Compute the sinus and ectopic beats for pure parasystole, with the same
+    initial condition and stopping time as run_mod_para.
+
+    Input:
+        see run_mod_para (with sinus_times, ts is the first sinus interval)
+    Output:
+        t_sinus: array of sinus beat times
+        t_ectopic: array of ectopic beat times
+        cycle: index of the sinus cycle each ectopic beat falls in
+        express: boolean array, True for expressed ectopic beats
+    '''
+
+    # Sinus times (cumulative sum matches repeated addition in run_mod_para)
+    # The simulation stops at the first sinus beat at or after tmax+tburn
+    T = tmax+tburn
+    if sinus_times is None:
+        n_sinus = max(int(T/ts), 0) + 3
+        t_sinus = np.cumsum(np.concatenate(([0.], np.full(n_sinus-1, float(ts)))))
+        t_sinus = t_sinus[:np.searchsorted(t_sinus, T, side='left')+1]
+    else:
+        t_sinus = mp.schedule_window(sinus_times, T)
+        ts = t_sinus[1] - t_sinus[0] if len(t_sinus) > 1 else ts
+
+    # Ectopic times up to the final sinus beat
+    t_ectopic_0 = theta + (ts-theta)/(2+0.01*np.pi)
+    n_ectopic = max(int((t_sinus[-1]-t_ectopic_0)/te), 0) + 3
+    t_ectopic = np.cumsum(np.concatenate(([t_ectopic_0], np.full(n_ectopic-1, float(te)))))
+    t_ectopic = t_ectopic[:max(np.searchsorted(t_ectopic, t_sinus[-1], side='right'), 1)]
+
+    # Sinus cycle of each ectopic beat (ties are resolved in favour of the ectopic beat).
+    # The initial ectopic beat always follows the initial sinus beat.
+    cycle = np.searchsorted(t_sinus, t_ectopic, side='left') - 1
+    cycle[0] = 0
+
+    # Number of sinus beats since the previous ectopic beat
+    n_between = np.diff(cycle)
+    # Ectopic beats falling in the refractory period of the preceding sinus beat
+    refractory = t_ectopic[1:] < t_sinus[cycle[1:]] + theta
+
+    # Beats whose fate is determined by their own timing
+    determined = np.concatenate(([True], (n_between!=1) | ~refractory))
+    value = np.concatenate(([True], (n_between==0) | ~refractory))
+
+    # Remaining beats copy the fate of the previous ectopic beat
+    idx = np.where(determined, np.arange(len(t_ectopic)), 0)
+    express = value[np.maximum.accumulate(idx)]
+
+    return t_sinus, t_ectopic, cycle, express
+
+
+
+
+def pure_beats(ts=1, te=1.8, theta=0.2, tmax=1000, tburn=100, sinus_times=None):
+    '''
+    Analytic replacement for simulate_beats with prc_tag='pure'.
+
+    Input:
+        see run_mod_para
+    Output:
+        times: array of beat times (burn in removed and start time reset to zero)
+        types: int8 array of beat type codes
+        info: dictionary with the final state and burn in used (see simulate_beats)
+    '''
+
+    t_sinus, t_ectopic, cycle, express = pure_ectopic_sequence(
+        ts=ts, te=te, theta=theta, tmax=tmax, tburn=tburn, sinus_times=sinus_times)
+
+    # A sinus beat is concealed if the last beat of the previous cycle is an expressed ectopic
+    j = np.arange(1, len(t_sinus))
+    idx_last = np.searchsorted(cycle, j-1, side='right') - 1
+    valid = idx_last >= 0
+    conceal = np.zeros(len(j), dtype=bool)
+    conceal[valid] = (cycle[idx_last[valid]]==j[valid]-1) & express[idx_last[valid]]
+
+    types_sinus = np.concatenate(([mp.BEAT_S], np.where(conceal, mp.BEAT_XS, mp.BEAT_S)))
+    types_ectopic = np.where(express, mp.BEAT_E, mp.BEAT_XE)
+
+    # Order beats by sinus cycle, with the sinus beat first in each cycle
+    times = np.concatenate((t_sinus, t_ectopic))
+    types = np.concatenate((types_sinus, types_ectopic)).astype(np.int8)
+    order = np.lexsort((times,
+                        np.concatenate((np.zeros(len(t_sinus)), np.ones(len(t_ectopic)))),
+                        np.concatenate((np.arange(len(t_sinus)), cycle))))
+    times = times[order]
+    types = types[order]
+
+    info = {'state': mp.final_state(t_sinus[-1], types_sinus[-1], t_ectopic[-1], te, te),
+            'tburn': tburn}
+
+    # Remove burn-in period and reset start time to zero
+    keep = times >= tburn
+
+    return times[keep]-tburn, types[keep], info
+
+
+
+
+def check_simulation(ts=1, te=1.8, theta=0.2, tmax=1000, tburn=100):
+    '''
+    Compare the simulation of pure parasystole in run_mod_para with the
+    analytic solution.
+
+    Input:
+        see run_mod_para
+    Output:
+        True if beat times and types agree
+    '''
+
+    times_sim, types_sim, info = mp.simulate_beats(ts=ts, te=te, theta=theta,
+                                                   tmax=tmax, tburn=tburn,
+                                                   prc_tag='pure', analytic=False)
+    times, types, info = pure_beats(ts=ts, te=te, theta=theta, tmax=tmax, tburn=tburn)
+
+    return (len(times)==len(times_sim)) and \
+        np.array_equal(types, types_sim) and np.allclose(times, times_sim)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Server-side store of simulation results for the dash app.
+
+Callbacks are stateless, so results are kept here and only an opaque key
+is passed to the browser (in a dcc.Store). Views derived from a simulation
+(zooming the time series, exports) look up the results by key instead of
+re-simulating.
+
+Each entry belongs to a session. Entries are evicted when
+    - they have not been used for max_idle seconds
+    - their session holds more than max_session_bytes (least recently used first)
+    - the store holds more than max_bytes (least recently used first)
+The store is shared between the threads of the server, so access is locked.
+
+@author: tbury
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+
+def data_nbytes(data):
+    '''
+    Memory used by a tuple of dataframes and arrays (bytes)
+    '''
+    nbytes = 0
+    for x in data:
+        if isinstance(x, pd.DataFrame):
+            nbytes += int(x.memory_usage(deep=True).sum())
+        elif isinstance(x, np.ndarray):
+            nbytes += x.nbytes
+    return nbytes
+
+
+
+class SessionStore:
+    '''
+    Results of simulations for each session, bounded in memory and idle time.
+    '''
+
+    def __init__(self, max_bytes=500e6, max_session_bytes=100e6, max_idle=1800):
+        '''
+        Input:
+            max_bytes: memory budget of the whole store (bytes)
+            max_session_bytes: memory budget of each session (bytes)
+            max_idle: entries not used for this long are evicted (s)
+        '''
+
+        self.max_bytes = max_bytes
+        self.max_session_bytes = max_session_bytes
+        self.max_idle = max_idle
+
+        # Entries in order of last use (oldest first)
+        self.entries = OrderedDict()
+        # Key of each (session, params)
+        self.index = {}
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+
+    def put(self, session, params, data, key=None):
+        '''
+        Store results.
+        Input:
+            session: session id
+            params: parameters of the simulation (hashable), used by find
+            data: tuple of results (dataframes or arrays)
+            key: key to store under (new key if None)
+        Output:
+            key
+        '''
+
+        if key is None:
+            key = uuid.uuid4().hex
+        nbytes = data_nbytes(data)
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = {'session':session, 'params':params, 'data':data,
+                                 'nbytes':nbytes, 't_access':time.monotonic()}
+            self.index[(session, params)] = key
+            self.nbytes += nbytes
+            self._evict(keep=key)
+
+        return key
+
+
+    def get(self, key):
+        '''
+        Results stored under key (None if absent or evicted)
+        '''
+
+        with self.lock:
+            self._evict()
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            entry['t_access'] = time.monotonic()
+            self.entries.move_to_end(key)
+            return entry['data']
+
+
+    def find(self, session, params):
+        '''
+        Key of stored results for these parameters in this session (None if absent)
+        '''
+
+        with self.lock:
+            key = self.index.get((session, params))
+            return key if key in self.entries else None
+
+
+    def session_params(self, session):
+        '''
+        Parameters of the results stored for a session
+        '''
+
+        with self.lock:
+            return [entry['params'] for entry in self.entries.values()
+                    if entry['session']==session]
+
+
+    def stats(self):
+        '''
+        Number of entries, number of sessions and memory used (bytes)
+        '''
+
+        with self.lock:
+            n_sessions = len(set(entry['session'] for entry in self.entries.values()))
+            return len(self.entries), n_sessions, self.nbytes
+
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.nbytes -= entry['nbytes']
+        if self.index.get((entry['session'], entry['params']))==key:
+            del self.index[(entry['session'], entry['params'])]
+
+
+    def _evict(self, keep=None):
+        # Idle entries (the oldest are first, so stop at the first recent one)
+        t_now = time.monotonic()
+        for key in list(self.entries):
+            if t_now - self.entries[key]['t_access'] <= self.max_idle:
+                break
+            if key!=keep:
+                self._remove(key)
+
+        # Sessions over budget
+        session_bytes = {}
+        for entry in self.entries.values():
+            session_bytes[entry['session']] = session_bytes.get(entry['session'],0) + entry['nbytes']
+        for key in list(self.entries):
+            session = self.entries[key]['session']
+            if session_bytes[session] > self.max_session_bytes and key!=keep:
+                session_bytes[session] -= self.entries[key]['nbytes']
+                self._remove(key)
+
+        # Store over budget
+        for key in list(self.entries):
+            if self.nbytes <= self.max_bytes:
+                break
+            if key!=keep:
+                self._remove(key)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Functions to load recorded RR intervals (e.g. Holter exports) and compute
+the same NIB and interval statistics as for simulations.
+
+Files are read in chunks, and each row is a beat with the RR interval
+preceding it and a label. Labels are mapped onto the model's beat types
+(all recorded beats are expressed, so normal beats are 's' and ventricular
+beats are 'e'). Beats with other labels are skipped: they do not count
+towards the NIB and the intervals on either side of them are not used.
+Rows with a missing or invalid RR interval (NaN, infinite or negative) are
+skipped in the same way, and do not advance the beat times.
+
+Statistics are updated chunk by chunk in bounded memory:
+    - counts of NIB values
+    - histograms of the interval lengths of each type and of the
+      inter-ectopic intervals (bins of width bin_width)
+Beats and intervals are only kept for the first tmax_keep seconds, which
+is what the time series panel of the app shows.
+
+Usage:
+    python rr_data.py <filename>   (writes the grid plot to <filename>.html)
+
+@author: tbury
+"""
+
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+
+
+# Labels of beats in recordings
+dic_labels = {'N':mp.BEAT_S, 'V':mp.BEAT_E}
+
+
+
+def read_rr_chunks(filename, rr_col='RR', label_col='Label', unit='ms',
+                   chunksize=100000, **kwargs):
+    '''
+    Read RR intervals and beat labels from a CSV or text file in chunks.
+    Input:
+        filename: path to file
+        rr_col: column of RR intervals
+        label_col: column of beat labels
+        unit: unit of RR intervals ('ms' or 's')
+        chunksize: number of rows per chunk
+        kwargs: passed to pd.read_csv (e.g. sep='\\s+' for text files)
+    Output:
+        generator of (rr, labels) arrays, with rr in seconds
+    '''
+
+    scale = 0.001 if unit=='ms' else 1
+    reader = pd.read_csv(filename, usecols=[rr_col, label_col],
+                         dtype={label_col:str}, chunksize=chunksize, **kwargs)
+    for chunk in reader:
+        yield chunk[rr_col].to_numpy(dtype=float)*scale, chunk[label_col].to_numpy()
+
+
+
+class RRStats:
+    '''
+    Incremental NIB and interval statistics of a recording.
+    Call update for each chunk and then output to get the dataframes.
+    '''
+
+    def __init__(self, dic_labels=dic_labels, bin_width=0.01, interval_max=50,
+                 tmax_keep=3600):
+        '''
+        Input:
+            dic_labels: dictionary mapping labels to beat type codes
+            bin_width: width of histogram bins (s)
+            interval_max: intervals longer than this go in the last bin (s)
+            tmax_keep: beats and intervals are kept up to this time (s)
+        '''
+
+        self.dic_labels = dic_labels
+        self.bin_width = bin_width
+        self.n_bins = int(np.ceil(interval_max/bin_width))
+        self.tmax_keep = tmax_keep
+
+        # Histograms of interval types (rows RR_SS,...,RR_EE) and inter-ectopic intervals
+        self.hist_rr = np.zeros((len(mp.rr_labels), self.n_bins), dtype=np.int64)
+        self.hist_ee = np.zeros(self.n_bins, dtype=np.int64)
+        self.nib_counts = Counter()
+
+        # State carried between chunks
+        self.t = 0
+        self.last_type = -1
+        self.t_last_ectopic = None
+        self.nib_count = None
+
+        # Beats and intervals kept for display
+        self.list_beats = []
+        self.list_rr = []
+
+
+    def bins(self, x):
+        return np.minimum((x/self.bin_width).astype(int), self.n_bins-1)
+
+
+    def update(self, rr, labels):
+        '''
+        Update statistics with a chunk of RR intervals (s) and beat labels
+        '''
+
+        # Map labels to beat types (-1 for other labels, and for rows
+        # without a valid interval, which do not advance the time)
+        types = np.full(len(labels), -1, dtype=np.int8)
+        for label, code in self.dic_labels.items():
+            types[labels==label] = code
+        with np.errstate(invalid='ignore'):
+            ok = np.isfinite(rr) & (rr >= 0)
+        types[~ok] = -1
+        rr = np.where(ok, rr, 0)
+        times = self.t + np.cumsum(rr)
+
+        # Intervals between consecutive beats that are both labelled
+        types_prev = np.concatenate(([self.last_type], types[:-1]))
+        valid = (types_prev>=0) & (types>=0)
+        rr_types = (2*types_prev[valid] + types[valid]).astype(np.int8)
+        rr_lengths = rr[valid]
+        self.hist_rr += np.bincount(rr_types.astype(int)*self.n_bins + self.bins(rr_lengths),
+                                    minlength=self.hist_rr.size).reshape(self.hist_rr.shape)
+
+        # NIB values (number of 's' between consecutive 'e')
+        known = types>=0
+        types_known = types[known]
+        cs = np.concatenate(([0], np.cumsum(types_known==mp.BEAT_S)))
+        idx_e = np.flatnonzero(types_known==mp.BEAT_E)
+        if len(idx_e):
+            list_nib = cs[idx_e[1:]] - cs[idx_e[:-1]+1]
+            if self.nib_count is not None:
+                list_nib = np.concatenate(([self.nib_count + cs[idx_e[0]]], list_nib))
+            self.nib_counts.update(dict(zip(*np.unique(list_nib, return_counts=True))))
+            self.nib_count = cs[-1] - cs[idx_e[-1]+1]
+        elif self.nib_count is not None:
+            self.nib_count += cs[-1]
+
+        # Inter-ectopic intervals
+        t_ectopic = times[types==mp.BEAT_E]
+        if self.t_last_ectopic is not None:
+            t_ectopic = np.concatenate(([self.t_last_ectopic], t_ectopic))
+        self.hist_ee += np.bincount(self.bins(np.diff(t_ectopic)), minlength=self.n_bins)
+        if len(t_ectopic):
+            self.t_last_ectopic = t_ectopic[-1]
+
+        # Keep beats and intervals for display
+        if self.t < self.tmax_keep:
+            keep = known & (times<self.tmax_keep)
+            self.list_beats.append((times[keep], types[keep]))
+            keep = times[valid]<self.tmax_keep
+            self.list_rr.append((times[valid][keep], rr_lengths[keep], rr_types[keep]))
+
+        self.t = times[-1] if len(times) else self.t
+        self.last_type = types[-1] if len(types) else self.last_type
+
+
+    def output(self):
+        '''
+        Dataframes of the recording in the same form as for simulations
+        Output:
+            df_beats: beats up to tmax_keep (see run_mod_para)
+            df_rr: intervals up to tmax_keep (see compute_rr)
+            df_nib: NIB distribution of the whole recording (see compute_nib)
+            df_hist: histograms of the whole recording, with a row for each bin
+                'Interval (s)' (bin centre) and the counts of each interval
+                type (columns rr_labels) and of inter-ectopic intervals
+                (column 'Inter-ectopic')
+        '''
+
+        times = np.concatenate([x[0] for x in self.list_beats] + [np.zeros(0)])
+        types = np.concatenate([x[1] for x in self.list_beats] + [np.zeros(0, dtype=np.int8)])
+        df_beats = pd.DataFrame({'Time':times, 'Type':types})
+
+        df_rr = pd.DataFrame({
+            'Time (s)': np.concatenate([x[0] for x in self.list_rr] + [np.zeros(0)]),
+            'RR interval (s)': np.concatenate([x[1] for x in self.list_rr] + [np.zeros(0)]),
+            'Type': np.concatenate([x[2] for x in self.list_rr] + [np.zeros(0, dtype=np.int8)])})
+
+        # NIB distribution (in the same form as compute_nib)
+        if len(self.nib_counts)==0:
+            df_nib = pd.DataFrame({'NIB':['silence'], 'Probability':[1.0]})
+        else:
+            nib = np.array(sorted(self.nib_counts.keys()))
+            counts = np.array([self.nib_counts[x] for x in nib])
+            df_nib = pd.DataFrame({'NIB':nib, 'Probability':counts/counts.sum()})
+
+        df_hist = pd.DataFrame(self.hist_rr.T, columns=mp.rr_labels)
+        df_hist['Inter-ectopic'] = self.hist_ee
+        df_hist.insert(0, 'Interval (s)', (np.arange(self.n_bins)+0.5)*self.bin_width)
+        df_hist = df_hist[df_hist.iloc[:,1:].sum(axis=1)>0].reset_index(drop=True)
+
+        return df_beats, df_rr, df_nib, df_hist
+
+
+
+def load_rr_recording(filename, dic_labels=dic_labels, tmax_keep=3600,
+                      bin_width=0.01, **kwargs):
+    '''
+    Stream a recording through RRStats.
+    Input:
+        filename: path to file
+        dic_labels, tmax_keep, bin_width: see RRStats
+        kwargs: passed to read_rr_chunks
+    Output:
+        df_beats, df_rr, df_nib, df_hist (see RRStats.output)
+    '''
+
+    stats = RRStats(dic_labels=dic_labels, bin_width=bin_width, tmax_keep=tmax_keep)
+    for rr, labels in read_rr_chunks(filename, **kwargs):
+        stats.update(rr, labels)
+
+    return stats.output()
+
+
+
+
+if __name__ == '__main__':
+
+    from construct_figures import mp_grid_plot
+
+    filename = sys.argv[1]
+    df_beats, df_rr, df_nib, df_hist = load_rr_recording(filename)
+    fig = mp_grid_plot(df_beats=df_beats, df_rr=df_rr, df_nib=df_nib,
+                       tmax_plot=200, df_hist=df_hist)
+    fig.write_html(filename + '.html')
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Global sensitivity analysis of NIB statistics and ectopic burden to ts, te,
+theta and the parameters of the PRC, with Sobol indices:
+    - S1 (first order): fraction of the variance of an output explained by
+      a parameter alone
+    - ST (total): fraction of the variance involving a parameter, including
+      its interactions with the others
+
+Indices are estimated from the design of Saltelli et al. (2010): two
+matrices A and B of N parameter sets from a Sobol sequence (quasi-random,
+with the direction numbers of Joe and Kuo (2008)), and for each parameter i
+the matrix AB_i (A with column i from B). The N(d+2) simulations are shared
+by all d parameters and all outputs, and by the convergence diagnostics,
+which take the first N/8, N/4, N/2 and N rows (a Sobol sequence is evenly
+spread at each power of 2), and bootstrap confidence intervals, which
+resample rows.
+
+Simulations are run in batches of lanes with attractor_funs.simulate_batch
+(each lane has its own parameters), and batches are shared between
+processes. The cost per simulation is reported in the attributes of the
+table of indices.
+
+Run as a script for an analysis of PRC 'a'.
+
+@author: tbury
+"""
+
+import os
+import time
+import inspect
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+import attractor_funs as af
+
+
+# Sobol sequence: primitive polynomials (with the leading and constant
+# terms as bits) and initial direction numbers of each dimension
+# (Joe and Kuo 2008). The first dimension is the van der Corput sequence.
+sobol_poly = [1, 3, 7, 11, 13, 19, 25, 37, 41, 47, 55, 59, 61, 67, 91, 97,
+              103, 109, 115, 131, 137, 143, 145, 157]
+sobol_m = [[1], [1], [1,3], [1,3,1], [1,1,1], [1,1,3,3], [1,3,5,13],
+           [1,1,5,5,17], [1,1,5,5,5], [1,1,7,11,19], [1,1,5,1,1],
+           [1,1,1,3,11], [1,3,5,5,31], [1,3,3,9,7,49], [1,1,1,15,21,21],
+           [1,3,1,13,27,49], [1,1,1,15,7,5], [1,3,1,15,13,25],
+           [1,1,5,5,19,61], [1,3,7,11,23,15,103], [1,3,7,13,13,15,69],
+           [1,1,3,13,7,35,63], [1,3,5,9,1,25,53], [1,3,1,13,9,35,107]]
+sobol_bits = 32
+
+# PRC parameters that are phases or slopes, kept in [0,1]
+unit_params = ['phi_c', 'dPRC', 'dPRC_post', 'dPRC_pre']
+
+
+
+def sobol_directions(d):
+    '''
+    Direction numbers of the first d dimensions of the Sobol sequence
+    Output:
+        V: uint64 array (d, sobol_bits), with V[j,k] the direction number
+            of bit k of dimension j (scaled by 2**sobol_bits)
+    '''
+
+    if d > len(sobol_poly):
+        raise ValueError('Sobol sequence only has {} dimensions'.format(len(sobol_poly)))
+
+    V = np.zeros((d, sobol_bits), dtype=np.uint64)
+    for j in range(d):
+        if j==0:
+            v = [1 << (sobol_bits-1-k) for k in range(sobol_bits)]
+        else:
+            poly = sobol_poly[j]
+            s = poly.bit_length() - 1
+            v = [m << (sobol_bits-1-k) for k, m in enumerate(sobol_m[j])]
+            for k in range(s, sobol_bits):
+                x = v[k-s] ^ (v[k-s] >> s)
+                for i in range(1, s):
+                    if (poly >> (s-i)) & 1:
+                        x ^= v[k-i]
+                v.append(x)
+        V[j] = v
+    return V
+
+
+
+def sobol_points(n, d):
+    '''
+    First n points of the d dimensional Sobol sequence (unscrambled,
+    starting at the origin), from the Gray code of each index
+    Output:
+        array (n, d) of points in [0,1)
+    '''
+
+    V = sobol_directions(d)
+    i = np.arange(n, dtype=np.uint64)
+    gray = i ^ (i >> np.uint64(1))
+    x = np.zeros((n, d), dtype=np.uint64)
+    for k in range(sobol_bits):
+        bit = ((gray >> np.uint64(k)) & np.uint64(1)).astype(bool)
+        x[bit] ^= V[:,k]
+    return x/2.0**sobol_bits
+
+
+
+def default_bounds(prc_tag, ts=1, te=1.8, theta=0.2, rel=0.2):
+    '''
+    Ranges of the parameters: ts, te, theta and the parameters of the PRC
+    (named 'prc_' followed by the keyword in prc_functions.py), each within
+    rel of its value (the default of the PRC functions for PRC parameters)
+    Output:
+        bounds: dictionary mapping parameter names to (low, high)
+    '''
+
+    nominal = {'ts': ts, 'te': te, 'theta': theta}
+    sig = inspect.signature(mp.dic_prc[prc_tag])
+    for name, p in sig.parameters.items():
+        if p.default is not inspect.Parameter.empty and name!='noise':
+            nominal['prc_'+name] = p.default
+
+    bounds = {}
+    for name, x in nominal.items():
+        low, high = sorted((x*(1-rel), x*(1+rel)))
+        if name[4:] in unit_params:
+            low, high = max(low, 0), min(high, 1)
+        bounds[name] = (low, high)
+    return bounds
+
+
+
+def saltelli_sample(bounds, n):
+    '''
+    Parameter sets of the Saltelli design
+    Input:
+        bounds: see default_bounds
+        n: number of rows of A and B (a power of 2)
+    Output:
+        X: array (n*(d+2), d) of parameter sets, with rows A, B, AB_1, ..., AB_d
+    '''
+
+    d = len(bounds)
+    low, high = np.array(list(bounds.values()), dtype=float).T
+    points = low + sobol_points(n, 2*d).reshape(n, 2, d)*(high-low)
+    A, B = points[:,0], points[:,1]
+    AB = np.repeat(A[None], d, axis=0)
+    for i in range(d):
+        AB[i,:,i] = B[:,i]
+    return np.concatenate([A, B] + list(AB))
+
+
+
+def nib_outputs(nib_counts, rr_counts):
+    '''
+    Outputs of the analysis from the counts of simulate_batch
+    Output:
+        dictionary of arrays with a value for each simulation
+            'Ectopic fraction': fraction of intervals ending in an ectopic beat
+            'P(NIB=1)': probability of NIB value 1 (bigeminy)
+            'NIB entropy (bits)': entropy of the distribution of NIB values,
+                with no ectopic beats as a separate value
+    '''
+
+    n_rr = np.maximum(rr_counts.sum(axis=1), 1)
+    silent = nib_counts.sum(axis=1)==0
+    p_nib = np.column_stack((nib_counts, silent)).astype(float)
+    p_nib /= p_nib.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = -np.where(p_nib > 0, p_nib*np.log2(p_nib), 0).sum(axis=1)
+
+    return {'Ectopic fraction': (rr_counts[:,mp.RR_SE]+rr_counts[:,mp.RR_EE])/n_rr,
+            'P(NIB=1)': p_nib[:,1],
+            'NIB entropy (bits)': entropy}
+
+
+
+def evaluate_chunk(args):
+    '''
+    Simulate a chunk of parameter sets as one batch (for the worker processes)
+    Input:
+        args: tuple (prc_tag, names, X, tmax, tburn, max_nib) with X an array
+            (number of sets, number of parameters)
+    Output:
+        outputs: array (number of sets, number of outputs) (see nib_outputs)
+        cpu: CPU time of the chunk (s)
+    '''
+
+    prc_tag, names, X, tmax, tburn, max_nib = args
+    t0 = time.process_time()
+    cols = dict(zip(names, X.T))
+    prc_params = {name[4:]: x for name, x in cols.items() if name.startswith('prc_')}
+    nib_counts, rr_counts, rr_sums = af.simulate_batch(cols['ts'], cols['te'], cols['theta'], prc_tag,
+                                                       tmax=tmax, tburn=tburn, max_nib=max_nib,
+                                                       prc_params=prc_params)
+    outputs = np.column_stack(list(nib_outputs(nib_counts, rr_counts).values()))
+    return outputs, time.process_time()-t0
+
+
+
+def sobol_indices(Y, n, d):
+    '''
+    First order (Saltelli et al. 2010) and total (Jansen 1999) indices
+    Input:
+        Y: array (n*(d+2),) of an output over the rows of saltelli_sample
+        n, d: size of the design
+    Output:
+        S1, ST: arrays of indices of each parameter (NaN if the output is constant)
+    '''
+
+    Y = Y.reshape(d+2, n)
+    fA, fB, fAB = Y[0], Y[1], Y[2:]
+    var = np.var(np.concatenate((fA, fB)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        S1 = np.mean(fB*(fAB-fA), axis=1)/var
+        ST = 0.5*np.mean((fA-fAB)**2, axis=1)/var
+    if var==0:
+        S1[:] = np.nan
+        ST[:] = np.nan
+    return S1, ST
+
+
+
+def sobol_analysis(prc_tag='a', bounds=None, n=256, tmax=500, tburn=200, max_nib=20,
+                   n_boot=200, conf=0.95, seed=0, chunk=512, n_workers=1):
+    '''
+    Sobol indices of the outputs of nib_outputs
+    Input:
+        prc_tag: PRC function (see run_mod_para)
+        bounds: ranges of the parameters (see default_bounds), by default
+            default_bounds(prc_tag)
+        n: number of rows of the Saltelli design (rounded up to a power of 2),
+            using n*(d+2) simulations for d parameters
+        tmax, tburn, max_nib: see attractor_funs.simulate_batch (simulations
+            start from the default initial condition of run_mod_para)
+        n_boot: number of bootstrap resamples
+        conf: level of confidence intervals
+        seed: seed of bootstrap resamples
+        chunk: number of simulations per batch
+        n_workers: number of processes
+    Output:
+        df_indices: dataframe with a row for each output and parameter with
+            columns 'Output', 'Parameter', 'S1', 'S1 conf', 'ST', 'ST conf'
+            (conf is the half width of the bootstrap confidence interval).
+            The attributes give the cost: 'n_sims', 'wall' and 'cpu' (s),
+            and 'wall_per_sim' and 'cpu_per_sim' (ms).
+        df_convergence: dataframe of indices from the first N rows of the
+            design, with columns 'Output', 'Parameter', 'N', 'S1', 'ST'
+    '''
+
+    bounds = default_bounds(prc_tag) if bounds is None else bounds
+    names = list(bounds)
+    d = len(names)
+    n = 1 << max(int(np.ceil(np.log2(n))), 3)
+    X = saltelli_sample(bounds, n)
+
+    # Simulate in chunks (in worker processes if n_workers > 1)
+    t0 = time.perf_counter()
+    list_args = [(prc_tag, names, X[i:i+chunk], tmax, tburn, max_nib)
+                 for i in range(0, len(X), chunk)]
+    if n_workers > 1:
+        with Pool(n_workers) as pool:
+            results = pool.map(evaluate_chunk, list_args)
+    else:
+        results = [evaluate_chunk(args) for args in list_args]
+    wall = time.perf_counter() - t0
+    cpu = sum(r[1] for r in results)
+    Y = np.concatenate([r[0] for r in results])
+    output_names = list(nib_outputs(np.zeros((0, max_nib+1)), np.zeros((0, 4))))
+
+    rng = np.random.default_rng(seed)
+    list_rows = []
+    list_conv = []
+    for k, output in enumerate(output_names):
+        Yk = Y[:,k].reshape(d+2, n)
+        S1, ST = sobol_indices(Yk.ravel(), n, d)
+
+        # Bootstrap (the same rows of A, B and AB_i are resampled together)
+        boot = [sobol_indices(Yk[:, rng.integers(0, n, n)].ravel(), n, d)
+                for _ in range(n_boot)]
+        boot = np.array(boot)
+        with np.errstate(invalid='ignore'):
+            half = 0.5*(np.nanquantile(boot, 0.5+conf/2, axis=0)
+                        - np.nanquantile(boot, 0.5-conf/2, axis=0)) if n_boot else np.full((2, d), np.nan)
+
+        for i, name in enumerate(names):
+            list_rows.append({'Output': output, 'Parameter': name,
+                              'S1': S1[i], 'S1 conf': half[0,i],
+                              'ST': ST[i], 'ST conf': half[1,i]})
+
+        # Convergence over nested prefixes of the design
+        for m in [n//8, n//4, n//2, n]:
+            S1_m, ST_m = sobol_indices(Yk[:, :m].ravel(), m, d)
+            for i, name in enumerate(names):
+                list_conv.append({'Output': output, 'Parameter': name,
+                                  'N': m, 'S1': S1_m[i], 'ST': ST_m[i]})
+
+    df_indices = pd.DataFrame(list_rows)
+    df_indices.attrs.update({'n_sims': len(X), 'wall': wall, 'cpu': cpu,
+                             'wall_per_sim': 1000*wall/len(X),
+                             'cpu_per_sim': 1000*cpu/len(X)})
+    df_convergence = pd.DataFrame(list_conv)
+
+    return df_indices, df_convergence
+
+
+
+if __name__ == '__main__':
+
+    df_indices, df_convergence = sobol_analysis(prc_tag='a', n=256, n_workers=os.cpu_count())
+
+    pd.set_option('display.width', 120)
+    print(df_indices.round(3).to_string(index=False))
+    print()
+    print(df_convergence.pivot_table(index=['Output','Parameter'], columns='N',
+                                     values='ST').round(3))
+    print()
+    print('{n_sims} simulations in {wall:.1f}s (CPU {cpu:.1f}s): '
+          '{wall_per_sim:.2f} ms per simulation ({cpu_per_sim:.2f} ms CPU)'.format(**df_indices.attrs))
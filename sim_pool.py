@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Run simulations for the dash app in a pool of worker processes.
+
+The simulation is CPU bound and holds the GIL, so when it runs in a
+request thread it stalls every other request on that server process. In
+production mode the app sends simulation and analysis to a process pool
+instead, and request threads only wait for the result (without holding
+the GIL), so they stay free for I/O and throughput scales with the number
+of workers.
+
+Results come back through shared memory rather than as pickled dataframes:
+the worker writes the arrays of beats and intervals into one shared memory
+block and returns its name and layout. The app maps the block and uses
+the arrays in place (no copy), and removes its name at once: the memory
+stays mapped until the last array using it is garbage collected, and is
+freed even if the app crashes. Only small objects (attributes and NIB
+distribution) are pickled. Blocks are registered with the resource tracker
+of the app (shared by the worker processes), which frees any that the app
+never maps when it exits.
+
+Several simulations (e.g. the configurations of the comparison view) are
+submitted together with simulate_batch and run in parallel, so they take
+about as long as the slowest of them.
+
+Usage (production):
+    MP_SERVE_MODE=production gunicorn --workers 1 --threads 8 app:server
+or
+    MP_SERVE_MODE=production python app.py
+
+@author: tbury
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+
+
+# Workers are started by a fork server: forking the app itself, while its
+# request threads run, can leave a lock held in the child and deadlock it.
+# Only the simulation is preloaded (not the app).
+mp_context = multiprocessing.get_context('forkserver')
+mp_context.set_forkserver_preload(['mod_para_funs'])
+
+
+
+def pack_arrays(dic_arrays):
+    '''
+    Copy arrays into a new shared memory block.
+    Input:
+        dic_arrays: dictionary of arrays
+    Output:
+        name of the block
+        layout: list of (key, dtype, shape, offset)
+    '''
+
+    layout = []
+    offset = 0
+    for key, x in dic_arrays.items():
+        # Align each array to 8 bytes
+        offset = -(-offset//8)*8
+        layout.append((key, x.dtype.str, x.shape, offset))
+        offset += x.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset,1))
+    for (key, dtype, shape, offset) in layout:
+        x = dic_arrays[key]
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = x
+    name = shm.name
+    shm.close()
+
+    return name, layout
+
+
+
+class MappedBlock(shared_memory.SharedMemory):
+    '''
+    Shared memory block whose arrays outlive it: the mapping is only
+    closed once no array uses it
+    '''
+
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            # Arrays still use the mapping, which is closed when they are freed
+            pass
+
+
+
+def unpack_arrays(name, layout):
+    '''
+    Arrays of a shared memory block, as views of the block (not copied).
+    The name of the block is removed, so the memory is freed once the
+    arrays are garbage collected.
+    Output:
+        dictionary of arrays
+    '''
+
+    shm = MappedBlock(name=name)
+    try:
+        buf = memoryview(shm.buf)
+        dic_arrays = {key: np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+                      for (key, dtype, shape, offset) in layout}
+    finally:
+        shm.unlink()
+        shm.close()
+
+    return dic_arrays
+
+
+
+def simulate_job(args):
+    '''
+    Simulate and analyse in a worker process.
+    Input:
+        args: tuple (prc, ts, te, theta, state0, sim_kwargs)
+    Output:
+        name and layout of shared memory block with the arrays of beats and
+        intervals, attributes of df_beats, df_nib
+    '''
+
+    prc, ts, te, theta, state0, sim_kwargs = args
+    times, types, info = mp.simulate_beats(ts=ts, te=te, theta=theta, prc_tag=prc,
+                                           state0=state0, **sim_kwargs)
+    rr_times, rr_lengths, rr_types = mp.rr_intervals(times, types)
+    df_nib = mp.nib_distribution(mp.nib_values(types))
+
+    name, layout = pack_arrays({'times':times, 'types':types, 'rr_times':rr_times,
+                                'rr_lengths':rr_lengths, 'rr_types':rr_types})
+
+    return name, layout, info, df_nib
+
+
+
+class SimPool:
+    '''
+    Pool of processes simulating for the app.
+    '''
+
+    def __init__(self, sim_kwargs, n_workers=None):
+        '''
+        Input:
+            sim_kwargs: arguments of simulate_beats other than the parameters
+                (e.g. tmax, tburn, tburn_max)
+            n_workers: number of worker processes (number of cores if None)
+        '''
+
+        self.sim_kwargs = sim_kwargs
+        self.n_workers = n_workers or os.cpu_count()
+        self.executor = None
+        # Request threads start the pool on first use, so only one of them may
+        self.lock = threading.Lock()
+
+
+    def simulate(self, prc, ts, te, theta, state0=None):
+        '''
+        Simulate in a worker process and wait for the result.
+        Output:
+            df_beats, df_rr, df_nib (as run_mod_para, compute_rr and compute_nib)
+        '''
+
+        return self.simulate_batch([(prc, ts, te, theta, state0)])[0]
+
+
+    def simulate_batch(self, list_jobs):
+        '''
+        Simulate several parameter sets at once (one worker process each,
+        as available) and wait for all results.
+        Input:
+            list_jobs: list of (prc, ts, te, theta, state0)
+        Output:
+            list of (df_beats, df_rr, df_nib), in the order of list_jobs
+        '''
+
+        # Start the pool on first use (not at import, which would fork every
+        # process that imports the app)
+        with self.lock:
+            if self.executor is None:
+                # Workers share the resource tracker if it runs before the fork server starts
+                resource_tracker.ensure_running()
+                self.executor = ProcessPoolExecutor(self.n_workers, mp_context=mp_context)
+
+        futures = [self.executor.submit(simulate_job, job + (self.sim_kwargs,))
+                   for job in list_jobs]
+        list_results = []
+        try:
+            for future in futures:
+                list_results.append(self.collect(future))
+        finally:
+            # If a job failed, free the blocks of the jobs after it
+            for future in futures[len(list_results)+1:]:
+                self.discard(future)
+        return list_results
+
+
+    def collect(self, future):
+        # Results of a job as dataframes
+        name, layout, info, df_nib = future.result()
+        dic_arrays = unpack_arrays(name, layout)
+
+        df_beats = pd.DataFrame({'Time': dic_arrays['times'], 'Type': dic_arrays['types']},
+                                copy=False)
+        df_beats.attrs.update(info)
+        df_rr = pd.DataFrame({'Time (s)': dic_arrays['rr_times'],
+                              'RR interval (s)': dic_arrays['rr_lengths'],
+                              'Type': dic_arrays['rr_types']}, copy=False)
+
+        return df_beats, df_rr, df_nib
+
+
+    def discard(self, future):
+        # Cancel a job, or free the shared memory block of its result
+        if future.cancel():
+            return
+        try:
+            name, layout = future.result()[:2]
+        except Exception:
+            return
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close()
+        shm.unlink()
+
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Sinus beat schedules: arrays of sinus beat times with heart rate
+variability, to drive simulations in place of a periodic sinus rhythm
+(sinus_times in run_mod_para and simulate_beats).
+
+Schedules are
+    - synthetic: intervals with a spectrum made of an LF and an HF peak
+      (Gaussian in frequency, as in McSharry et al. (2003)), random phases,
+      and a given SDNN
+    - taken from recordings: times of normal beats (from chunks of
+      rr_data.read_rr_chunks), where the sinus beats hidden by other beats
+      are filled in at even spacing
+Schedules are saved as .npy files and loaded memory-mapped, so simulations
+only read the part they use.
+
+Only numpy is imported (see mod_para_cli.py).
+
+@author: tbury
+"""
+
+import numpy as np
+
+
+# Spectrum of synthetic intervals (Hz)
+f_lf = 0.1 # centre of LF peak
+f_hf = 0.25 # centre of HF peak
+sd_lf = 0.01 # width of LF peak
+sd_hf = 0.01 # width of HF peak
+
+
+
+def synthetic_schedule(n_beats, ts=1, sdnn=0.05, lf_hf=1, seed=None):
+    '''
+    Synthetic sinus schedule with heart rate variability
+    Input:
+        n_beats: number of sinus beats
+        ts: mean sinus period (s)
+        sdnn: standard deviation of sinus intervals (s)
+        lf_hf: ratio of power in the LF peak to power in the HF peak
+        seed: seed of random phases
+    Output:
+        sinus_times: array of sinus beat times, starting at 0
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    # Spectrum over beat number (frequencies in Hz are cycles per beat / ts)
+    f = np.fft.rfftfreq(n_beats)/ts
+    power = (lf_hf/sd_lf*np.exp(-(f-f_lf)**2/(2*sd_lf**2))
+             + 1/sd_hf*np.exp(-(f-f_hf)**2/(2*sd_hf**2)))
+    coeffs = np.sqrt(power)*np.exp(2j*np.pi*rng.uniform(size=len(f)))
+    coeffs[0] = 0
+    x = np.fft.irfft(coeffs, n_beats)
+
+    # Scale to sdnn (intervals are kept positive)
+    rr = ts + sdnn*x/max(x.std(), 1e-300)
+    rr = np.maximum(rr, 0.1*ts)
+
+    return np.concatenate(([0.], np.cumsum(rr[:-1])))
+
+
+
+def recorded_schedule(chunks, normal_labels=('N',)):
+    '''
+    Sinus schedule from a recording: times of normal beats, with sinus beats
+    filled in where they are hidden by other beats (a gap between normal
+    beats of k normal intervals, rounded, gets k-1 evenly spaced beats, where
+    the normal interval is the median of intervals between consecutive
+    normal beats in the chunk)
+    Input:
+        chunks: iterable of (rr, labels) arrays (see rr_data.read_rr_chunks)
+        normal_labels: labels of normal (sinus) beats
+    Output:
+        sinus_times: array of sinus beat times, starting at the first normal beat
+    '''
+
+    list_times = []
+    t = 0
+    t_last = None
+    last_normal = False
+    for rr, labels in chunks:
+        times = t + np.cumsum(rr)
+        t = times[-1] if len(times) else t
+        normal = np.isin(labels, normal_labels)
+        # Normal intervals (between consecutive normal beats)
+        consecutive = normal & np.concatenate(([last_normal], normal[:-1]))
+        last_normal = normal[-1] if len(normal) else last_normal
+        t_normal = times[normal]
+        if t_last is not None:
+            t_normal = np.concatenate(([t_last], t_normal))
+        if len(t_normal) < 2:
+            t_last = t_normal[-1] if len(t_normal) else t_last
+            continue
+
+        # Number of sinus intervals in each gap
+        gaps = np.diff(t_normal)
+        rr_normal = np.median(rr[consecutive]) if consecutive.any() else np.median(gaps)
+        k = np.maximum(np.rint(gaps/rr_normal), 1).astype(int)
+
+        # Beats of each gap at even spacing (the last is the next normal beat)
+        i = np.repeat(np.arange(len(gaps)), k)
+        j = np.arange(len(i)) - np.repeat(np.cumsum(k)-k, k) + 1
+        list_times.append(t_normal[i] + gaps[i]*j/k[i])
+        if t_last is None:
+            list_times.insert(0, t_normal[:1])
+        t_last = t_normal[-1]
+
+    sinus_times = np.concatenate(list_times) if list_times else np.zeros(0)
+
+    return sinus_times - (sinus_times[0] if len(sinus_times) else 0)
+
+
+
+def save_schedule(filename, sinus_times):
+    np.save(filename, np.asarray(sinus_times, dtype=float))
+
+
+
+def load_schedule(filename):
+    '''
+    Memory-mapped sinus schedule (only the parts used are read)
+    '''
+    return np.load(filename, mmap_mode='r')
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Crash-resumable parameter sweeps over (ts, te, theta, prc_tag).
+
+A sweep is described by a manifest (JSON) listing the parameter values.
+The parameter sets are split into shards in a deterministic order, so any
+worker can compute any shard. Each shard is written to a temporary file
+and renamed into place, so a shard file exists only once it is complete.
+Workers claim a shard by creating a lock file (which fails if it already
+exists), so several processes, on one machine or on several machines
+sharing a filesystem, can work through the same sweep. Restarting a
+worker skips the shards that are already done.
+
+A worker refreshes the time of its lock while it runs a shard, so only the
+locks of crashed workers become stale (older than lock_timeout). A stale
+lock is taken over by renaming it (atomic, so only one worker can succeed),
+and a worker only writes a shard if it still holds the lock.
+
+Usage:
+    python sweep_jobs.py make <sweep_dir> [--force]
+        (write manifest with default values; --force replaces an existing one)
+    python sweep_jobs.py run <sweep_dir>     (start a worker; run several at once)
+    python sweep_jobs.py collect <sweep_dir> (combine completed shards)
+
+@author: tbury
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import itertools
+import threading
+
+import numpy as np
+import pandas as pd
+
+import mod_para_funs as mp
+from continuation import sweep_summary
+
+
+# Time after which a lock is considered stale (worker has crashed)
+lock_timeout = 3600
+# Time between refreshes of the locks of running shards
+lock_heartbeat = 60
+
+
+
+def make_manifest(sweep_dir,
+                  ts_vals=(1,),
+                  te_vals=tuple(np.round(np.arange(1,4.001,0.01),2)),
+                  theta_vals=tuple(np.round(np.arange(0.1,0.601,0.05),2)),
+                  prc_tags=('pure','a','b','c','d','e'),
+                  shard_size=100,
+                  tmax=1000,
+                  tburn=100,
+                  force=False):
+    '''
+    Write the manifest of a sweep to sweep_dir/manifest.json
+    Input:
+        sweep_dir: directory of the sweep (created if necessary)
+        ts_vals, te_vals, theta_vals, prc_tags: values of each parameter
+        shard_size: number of parameter sets per shard
+        tmax, tburn: simulation parameters (see run_mod_para)
+        force: if True, replace the manifest of an existing sweep and delete
+            its shards and locks (otherwise FileExistsError is raised, as its
+            shards would no longer match)
+    Output:
+        manifest: dictionary written to file
+    '''
+
+    filename = os.path.join(sweep_dir, 'manifest.json')
+    if os.path.exists(filename) and not force:
+        raise FileExistsError('{} already has a manifest'.format(sweep_dir))
+
+    list_params = param_sets({'ts_vals':ts_vals, 'te_vals':te_vals,
+                              'theta_vals':theta_vals, 'prc_tags':prc_tags})
+    manifest = {'ts_vals': [float(x) for x in ts_vals],
+                'te_vals': [float(x) for x in te_vals],
+                'theta_vals': [float(x) for x in theta_vals],
+                'prc_tags': list(prc_tags),
+                'shard_size': shard_size,
+                'n_shards': int(np.ceil(len(list_params)/shard_size)),
+                'tmax': tmax,
+                'tburn': tburn}
+
+    # Shards of a replaced manifest belong to another parameter grid. The
+    # directory is renamed first, so that workers of the old sweep lose their
+    # locks (and don't write) and no shard of it is seen as done.
+    shard_dir = os.path.join(sweep_dir, 'shards')
+    if os.path.exists(filename) and os.path.exists(shard_dir):
+        shard_dir_old = '{}.old.{}'.format(shard_dir, uuid.uuid4().hex)
+        os.rename(shard_dir, shard_dir_old)
+        shutil.rmtree(shard_dir_old, ignore_errors=True)
+
+    os.makedirs(shard_dir, exist_ok=True)
+    write_atomic(filename, json.dumps(manifest, indent=1))
+
+    return manifest
+
+
+
+def load_manifest(sweep_dir):
+    '''
+    Load the manifest of a sweep
+    '''
+    with open(os.path.join(sweep_dir, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    return manifest
+
+
+
+def param_sets(manifest):
+    '''
+    List of parameter sets (prc_tag, ts, te, theta) in a deterministic order
+    '''
+    return list(itertools.product(manifest['prc_tags'], manifest['ts_vals'],
+                                  manifest['te_vals'], manifest['theta_vals']))
+
+
+
+def shard_params(manifest, shard):
+    '''
+    Parameter sets belonging to a shard
+    '''
+    size = manifest['shard_size']
+    return param_sets(manifest)[shard*size:(shard+1)*size]
+
+
+
+def write_atomic(filename, text):
+    '''
+    Write text to a temporary file and rename it to filename,
+    so that filename is either absent or complete.
+    '''
+    filename_tmp = '{}.tmp.{}.{}'.format(filename, socket.gethostname(), os.getpid())
+    with open(filename_tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(filename_tmp, filename)
+
+
+
+def shard_file(sweep_dir, shard):
+    return os.path.join(sweep_dir, 'shards', 'shard_{:05d}.csv'.format(shard))
+
+
+
+def lock_file(sweep_dir, shard):
+    return shard_file(sweep_dir, shard) + '.lock'
+
+
+
+def lock_owner(filename_lock):
+    # Token written in a lock file (None if absent)
+    try:
+        with open(filename_lock, 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+
+def claim_shard(sweep_dir, shard):
+    '''
+    Try to claim a shard by creating its lock file.
+    Locks older than lock_timeout are assumed to belong to a crashed worker
+    and are taken over.
+    Output:
+        token written in the lock if the shard was claimed, else None
+    '''
+
+    filename_lock = lock_file(sweep_dir, shard)
+    token = '{} {} {}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+
+    for attempt in range(2):
+        # Creating the file fails if another worker holds the lock
+        try:
+            fd = os.open(filename_lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'w') as f:
+                f.write(token + '\n')
+            return token
+
+        # Take over a stale lock by renaming it: only one worker can rename
+        # a given file, and the lock renamed may have been replaced since its
+        # age was checked, so it is checked again after the rename
+        try:
+            if time.time() - os.path.getmtime(filename_lock) <= lock_timeout:
+                return None
+            filename_stale = '{}.stale.{}'.format(filename_lock, uuid.uuid4().hex)
+            os.rename(filename_lock, filename_stale)
+        except FileNotFoundError:
+            continue
+        stale = time.time() - os.path.getmtime(filename_stale) > lock_timeout
+        if not stale:
+            # A live lock: put it back (unless there is already a new one)
+            try:
+                os.link(filename_stale, filename_lock)
+            except FileExistsError:
+                pass
+        os.remove(filename_stale)
+        if not stale:
+            return None
+
+    return None
+
+
+
+def holds_lock(sweep_dir, shard, token):
+    return lock_owner(lock_file(sweep_dir, shard))==token
+
+
+
+def keep_lock(sweep_dir, shard, token, stop):
+    '''
+    Refresh the time of a lock every lock_heartbeat seconds until stop
+    (threading.Event) is set, so it does not become stale while the shard runs
+    '''
+    while not stop.wait(lock_heartbeat):
+        if holds_lock(sweep_dir, shard, token):
+            try:
+                os.utime(lock_file(sweep_dir, shard))
+            except FileNotFoundError:
+                pass
+
+
+
+def release_shard(sweep_dir, shard, token):
+    # Remove the lock (only if it is still ours)
+    if holds_lock(sweep_dir, shard, token):
+        try:
+            os.remove(lock_file(sweep_dir, shard))
+        except FileNotFoundError:
+            pass
+
+
+
+def run_shard(manifest, shard):
+    '''
+    Simulate all parameter sets in a shard
+    Output:
+        df_shard: dataframe of parameters and summary statistics (see sweep_summary)
+    '''
+
+    list_rows = []
+    for (prc_tag, ts, te, theta) in shard_params(manifest, shard):
+        df_beats = mp.run_mod_para(ts=ts, te=te, theta=theta, prc_tag=prc_tag,
+                                   tmax=manifest['tmax'], tburn=manifest['tburn'])
+        list_rows.append({'prc_tag':prc_tag, 'ts':ts, 'te':te, 'theta':theta,
+                          **sweep_summary(df_beats),
+                          'Burn in': df_beats.attrs['tburn']})
+
+    return pd.DataFrame(list_rows)
+
+
+
+def run_worker(sweep_dir):
+    '''
+    Work through the shards of a sweep that are neither done nor claimed
+    by another worker.
+    Output:
+        number of shards computed by this worker
+    '''
+
+    manifest = load_manifest(sweep_dir)
+    n_done = 0
+
+    for shard in range(manifest['n_shards']):
+        if os.path.exists(shard_file(sweep_dir, shard)):
+            continue
+        token = claim_shard(sweep_dir, shard)
+        if token is None:
+            continue
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=keep_lock, args=(sweep_dir, shard, token, stop),
+                                     daemon=True)
+        heartbeat.start()
+        try:
+            # Check again in case the shard was completed after we listed it
+            if not os.path.exists(shard_file(sweep_dir, shard)):
+                df_shard = run_shard(manifest, shard)
+                # Only write if the lock was not taken over
+                if holds_lock(sweep_dir, shard, token):
+                    write_atomic(shard_file(sweep_dir, shard), df_shard.to_csv(index=False))
+                    n_done += 1
+        finally:
+            stop.set()
+            heartbeat.join()
+            release_shard(sweep_dir, shard, token)
+
+    return n_done
+
+
+
+def sweep_progress(sweep_dir):
+    '''
+    Number of completed shards and total number of shards
+    '''
+    manifest = load_manifest(sweep_dir)
+    n_complete = sum(os.path.exists(shard_file(sweep_dir, shard))
+                     for shard in range(manifest['n_shards']))
+    return n_complete, manifest['n_shards']
+
+
+
+def collect_results(sweep_dir):
+    '''
+    Combine completed shards into a single dataframe
+    '''
+    manifest = load_manifest(sweep_dir)
+    list_df = [pd.read_csv(shard_file(sweep_dir, shard), dtype={'Pattern':str})
+               for shard in range(manifest['n_shards'])
+               if os.path.exists(shard_file(sweep_dir, shard))]
+    if len(list_df)==0:
+        return pd.DataFrame()
+    return pd.concat(list_df, ignore_index=True)
+
+
+
+
+if __name__ == '__main__':
+
+    command, sweep_dir = sys.argv[1], sys.argv[2]
+
+    if command=='make':
+        try:
+            manifest = make_manifest(sweep_dir, force='--force' in sys.argv[3:])
+        except FileExistsError as e:
+            sys.exit('{}. Use --force to replace it.'.format(e))
+        print('Sweep with {} shards written to {}'.format(manifest['n_shards'], sweep_dir))
+
+    elif command=='run':
+        t0 = time.time()
+        n_done = run_worker(sweep_dir)
+        n_complete, n_shards = sweep_progress(sweep_dir)
+        print('Computed {} shards in {:.1f}s. {}/{} shards complete.'.format(
+            n_done, time.time()-t0, n_complete, n_shards))
+
+    elif command=='collect':
+        df_results = collect_results(sweep_dir)
+        df_results.to_csv(os.path.join(sweep_dir, 'results.csv'), index=False)
+        print('{} parameter sets collected'.format(len(df_results)))